@@ -1,5 +1,6 @@
 # src/root_agent.py - Complete Fixed Version
 from google.adk.agents import Agent
+from functools import partial
 import sys
 import os
 
@@ -12,51 +13,45 @@ def adaptive_investment_function(query: str) -> str:
     """
     try:
         # Import agents within the function to avoid field restrictions
-        from agents.stock_screener_final import StockScreeningAgent
-        from agents.style_theme_agent import StyleThemeAgent  
-        from agents.portfolio_risk_agent import PortfolioRiskAgent
+        from agents.registry import get_agent
+        from utils.fundamentals_cache import get_fundamentals_cache
+        from utils.router import get_router
         
-        # Determine which agents to use based on query
-        query_lower = query.lower()
+        # Determine which agents are needed, with the orchestrator's keyword table
+        agents_needed = get_router().agents(query, 'orchestrator')
+        use_stock_agent = 'stock_screener' in agents_needed
+        use_style_agent = 'style_theme' in agents_needed
+        use_risk_agent = 'portfolio_risk' in agents_needed
         
-        # Keywords for each agent
-        stock_keywords = ['find', 'screen', 'stocks', 'companies', 'search', 'filter', 'dividend', 'pe', 'price', 'nasdaq', 'tech']
-        style_keywords = ['style', 'theme', 'growth', 'value', 'momentum', 'ai', 'ev', 'fintech', 'classify']
-        risk_keywords = ['risk', 'attribution', 'portfolio', 'stress', 'factor', 'concentration', 'scenario']
-        
-        # Determine which agents are needed
-        use_stock_agent = any(keyword in query_lower for keyword in stock_keywords)
-        use_style_agent = any(keyword in query_lower for keyword in style_keywords)
-        use_risk_agent = any(keyword in query_lower for keyword in risk_keywords)
-        
-        # Execute based on agent needs
-        if use_stock_agent and use_style_agent and use_risk_agent:
-            # Full platform analysis
-            return comprehensive_analysis(query)
-        elif use_stock_agent and use_style_agent:
-            # Stock screening + style analysis
-            return stock_and_style_analysis(query)
-        elif use_stock_agent and use_risk_agent:
-            # Stock screening + risk analysis
-            return stock_and_risk_analysis(query)
-        elif use_style_agent and use_risk_agent:
-            # Style + risk analysis
-            return style_and_risk_analysis(query)
-        elif use_stock_agent:
-            # Stock screening only
-            agent = StockScreeningAgent()
-            return format_response("Stock Screening", agent.run(query))
-        elif use_style_agent:
-            # Style analysis only
-            agent = StyleThemeAgent()
-            return format_response("Style & Theme Classification", agent.run(query))
-        elif use_risk_agent:
-            # Risk analysis only
-            agent = PortfolioRiskAgent()
-            return format_response("Portfolio Risk Analysis", agent.run(query))
-        else:
-            # Default to comprehensive analysis
-            return comprehensive_analysis(query)
+        # Agents share one fundamentals snapshot, so each symbol is fetched once per query
+        with get_fundamentals_cache().request_scope():
+            if use_stock_agent and use_style_agent and use_risk_agent:
+                # Full platform analysis
+                return comprehensive_analysis(query)
+            elif use_stock_agent and use_style_agent:
+                # Stock screening + style analysis
+                return stock_and_style_analysis(query)
+            elif use_stock_agent and use_risk_agent:
+                # Stock screening + risk analysis
+                return stock_and_risk_analysis(query)
+            elif use_style_agent and use_risk_agent:
+                # Style + risk analysis
+                return style_and_risk_analysis(query)
+            elif use_stock_agent:
+                # Stock screening only
+                agent = get_agent('stock_screener')
+                return format_response("Stock Screening", agent.run(query))
+            elif use_style_agent:
+                # Style analysis only
+                agent = get_agent('style_theme')
+                return format_response("Style & Theme Classification", agent.run(query))
+            elif use_risk_agent:
+                # Risk analysis only
+                agent = get_agent('portfolio_risk')
+                return format_response("Portfolio Risk Analysis", agent.run(query))
+            else:
+                # Default to comprehensive analysis
+                return comprehensive_analysis(query)
             
     except Exception as e:
         return f"""# ⚠️ Adaptive Trading Intelligence Platform
@@ -87,14 +82,18 @@ def format_response(title: str, content: str) -> str:
 def stock_and_style_analysis(query: str) -> str:
     """Combine stock screening and style analysis"""
     try:
-        from agents.stock_screener_final import StockScreeningAgent
-        from agents.style_theme_agent import StyleThemeAgent
+        from agents.registry import get_agent
+        from utils.fanout import fan_out, result_text
         
-        stock_agent = StockScreeningAgent()
-        style_agent = StyleThemeAgent()
+        stock_agent = get_agent('stock_screener')
+        style_agent = get_agent('style_theme')
         
-        stock_result = stock_agent.run(query)
-        style_result = style_agent.run(query)
+        results = fan_out({
+            'stock': partial(stock_agent.run, query),
+            'style': partial(style_agent.run, query)
+        })
+        stock_result = result_text(results['stock'])
+        style_result = result_text(results['style'])
         
         return f"""# 🎯 Adaptive Trading Intelligence Platform
 
@@ -122,14 +121,18 @@ def stock_and_style_analysis(query: str) -> str:
 def stock_and_risk_analysis(query: str) -> str:
     """Combine stock screening and risk analysis"""
     try:
-        from agents.stock_screener_final import StockScreeningAgent
-        from agents.portfolio_risk_agent import PortfolioRiskAgent
+        from agents.registry import get_agent
+        from utils.fanout import fan_out, result_text
         
-        stock_agent = StockScreeningAgent()
-        risk_agent = PortfolioRiskAgent()
+        stock_agent = get_agent('stock_screener')
+        risk_agent = get_agent('portfolio_risk')
         
-        stock_result = stock_agent.run(query)
-        risk_result = risk_agent.run(query)
+        results = fan_out({
+            'stock': partial(stock_agent.run, query),
+            'risk': partial(risk_agent.run, query)
+        })
+        stock_result = result_text(results['stock'])
+        risk_result = result_text(results['risk'])
         
         return f"""# 🎯 Adaptive Trading Intelligence Platform
 
@@ -157,14 +160,18 @@ def stock_and_risk_analysis(query: str) -> str:
 def style_and_risk_analysis(query: str) -> str:
     """Combine style and risk analysis"""
     try:
-        from agents.style_theme_agent import StyleThemeAgent
-        from agents.portfolio_risk_agent import PortfolioRiskAgent
+        from agents.registry import get_agent
+        from utils.fanout import fan_out, result_text
         
-        style_agent = StyleThemeAgent()
-        risk_agent = PortfolioRiskAgent()
+        style_agent = get_agent('style_theme')
+        risk_agent = get_agent('portfolio_risk')
         
-        style_result = style_agent.run(query)
-        risk_result = risk_agent.run(query)
+        results = fan_out({
+            'style': partial(style_agent.run, query),
+            'risk': partial(risk_agent.run, query)
+        })
+        style_result = result_text(results['style'])
+        risk_result = result_text(results['risk'])
         
         return f"""# 🎯 Adaptive Trading Intelligence Platform
 
@@ -192,19 +199,23 @@ def style_and_risk_analysis(query: str) -> str:
 def comprehensive_analysis(query: str) -> str:
     """Full platform analysis using all agents"""
     try:
-        from agents.stock_screener_final import StockScreeningAgent
-        from agents.style_theme_agent import StyleThemeAgent
-        from agents.portfolio_risk_agent import PortfolioRiskAgent
+        from agents.registry import get_agent
+        from utils.fanout import fan_out, result_text
         
-        # Initialize all agents
-        stock_agent = StockScreeningAgent()
-        style_agent = StyleThemeAgent()
-        risk_agent = PortfolioRiskAgent()
+        # Shared agents, built once per process
+        stock_agent = get_agent('stock_screener')
+        style_agent = get_agent('style_theme')
+        risk_agent = get_agent('portfolio_risk')
         
-        # Get results from all agents
-        stock_result = stock_agent.run(query)
-        style_result = style_agent.run(query)
-        risk_result = risk_agent.run(query)
+        # Get results from all agents concurrently
+        results = fan_out({
+            'stock': partial(stock_agent.run, query),
+            'style': partial(style_agent.run, query),
+            'risk': partial(risk_agent.run, query)
+        })
+        stock_result = result_text(results['stock'])
+        style_result = result_text(results['style'])
+        risk_result = result_text(results['risk'])
         
         return f"""# 🎯 Adaptive Trading Intelligence Platform
 ## Complete Multi-Agent Investment Analysis
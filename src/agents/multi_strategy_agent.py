@@ -1,23 +1,48 @@
 # src/agents/multi_strategy_agent.py - FIXED VERSION
 from google.adk.agents import Agent
-import yfinance as yf
-import pandas as pd
 import numpy as np
 import sys
 import os
-from typing import Dict, List, Tuple, Set
+import threading
+from contextvars import ContextVar
+from typing import Dict, List, NamedTuple, Optional, Tuple, Set
 from datetime import datetime, timedelta
 
 # Add src to path so we can import our utilities
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from agents.registry import get_analyzer
+from utils.rate_limit import agent_scope
+from utils.router import get_router
+from utils.tracing import span
+from utils.universe import get_universe
+from utils.holdings_ingest import get_holdings_store
+from utils.holdings_matrix import HoldingsMatrix
+
+# Largest number of managers shown in the correlation matrix (by AUM)
+MAX_MATRIX_MANAGERS = 10
+
+# Managers listed under each overlapping holding
+MAX_LISTED_HOLDERS = 10
+
+
+class HoldingsState(NamedTuple):
+    """Manager metadata and the matching weight matrix of one holdings version"""
+    version: int
+    portfolios: Dict[str, Dict]
+    matrix: HoldingsMatrix
+
+
+# Holdings state pinned for the analysis running in this context
+_request_holdings: ContextVar[Optional[HoldingsState]] = ContextVar('multi_strategy_holdings', default=None)
 
 def multi_strategy_analysis_function(query: str) -> str:
     """
     Function that performs multi-strategy portfolio monitoring and analysis
     """
     try:
-        analyzer = MultiStrategyAnalyzer()
-        return analyzer.perform_analysis(query)
+        analyzer = get_analyzer('multi_strategy')
+        with agent_scope('multi_strategy'), span('agent', agent='multi_strategy'):
+            return analyzer.perform_analysis(query)
     except Exception as e:
         return f"Error in multi-strategy analysis: {str(e)}"
 
@@ -25,75 +50,43 @@ class MultiStrategyAnalyzer:
     """Helper class for multi-strategy portfolio monitoring without ADK field restrictions"""
     
     def __init__(self):
-        # Institutional investment managers with different strategies
-        self.institutional_portfolios = {
-            'growth_manager_a': {
-                'name': 'TechGrowth Capital',
-                'strategy': 'Technology Growth',
-                'aum': 2500000000,  # $2.5B AUM
-                'holdings': {
-                    'NVDA': 0.18, 'AAPL': 0.15, 'MSFT': 0.13, 'GOOGL': 0.12, 'META': 0.10,
-                    'AMZN': 0.08, 'TSLA': 0.07, 'AMD': 0.06, 'CRM': 0.05, 'ADBE': 0.04,
-                    'NFLX': 0.02
-                }
-            },
-            'growth_manager_b': {
-                'name': 'Innovation Partners',
-                'strategy': 'Innovation Growth',
-                'aum': 1800000000,  # $1.8B AUM
-                'holdings': {
-                    'MSFT': 0.16, 'GOOGL': 0.14, 'NVDA': 0.12, 'META': 0.11, 'AAPL': 0.10,
-                    'AMZN': 0.09, 'ADBE': 0.07, 'CRM': 0.06, 'SNOW': 0.05, 'PLTR': 0.04,
-                    'DDOG': 0.03, 'NET': 0.03
-                }
-            },
-            'value_manager_a': {
-                'name': 'Berkshire-Style Value',
-                'strategy': 'Deep Value',
-                'aum': 3200000000,  # $3.2B AUM
-                'holdings': {
-                    'BRK-B': 0.20, 'JPM': 0.15, 'JNJ': 0.12, 'PG': 0.10, 'KO': 0.08,
-                    'WMT': 0.07, 'HD': 0.06, 'VZ': 0.05, 'PFE': 0.05, 'MRK': 0.05,
-                    'BAC': 0.04, 'WFC': 0.03
-                }
-            },
-            'balanced_manager': {
-                'name': 'Diversified Alpha',
-                'strategy': 'Balanced Growth',
-                'aum': 4500000000,  # $4.5B AUM
-                'holdings': {
-                    'AAPL': 0.10, 'MSFT': 0.09, 'GOOGL': 0.08, 'BRK-B': 0.07, 'JPM': 0.06,
-                    'JNJ': 0.06, 'NVDA': 0.06, 'META': 0.05, 'PG': 0.05, 'HD': 0.05,
-                    'WMT': 0.05, 'V': 0.04, 'MA': 0.04, 'UNH': 0.04, 'AMZN': 0.04,
-                    'TSLA': 0.03, 'DIS': 0.03, 'KO': 0.03, 'PFE': 0.03, 'MRK': 0.03,
-                    'CVX': 0.02, 'XOM': 0.02
-                }
-            },
-            'momentum_manager': {
-                'name': 'Trend Followers',
-                'strategy': 'Momentum',
-                'aum': 1200000000,  # $1.2B AUM
-                'holdings': {
-                    'NVDA': 0.25, 'AMD': 0.15, 'TSLA': 0.12, 'COIN': 0.08, 'RBLX': 0.07,
-                    'SHOP': 0.06, 'SQ': 0.05, 'SNOW': 0.05, 'NET': 0.04, 'DDOG': 0.04,
-                    'PLTR': 0.04, 'ROKU': 0.03, 'ZM': 0.02
-                }
-            }
-        }
+        # Institutional investment managers, ingested from holdings files (HOLDINGS_DIR)
+        self.holdings_store = get_holdings_store()
+        self._holdings: Optional[HoldingsState] = None
+        self._holdings_lock = threading.Lock()
+        self.refresh_holdings()
         
         # Sector classifications for analysis
-        self.sector_mapping = {
-            'Technology': ['AAPL', 'MSFT', 'NVDA', 'GOOGL', 'META', 'AMZN', 'ADBE', 'CRM', 'ORCL', 'INTC', 'AMD'],
-            'Healthcare': ['JNJ', 'PFE', 'MRK', 'UNH', 'ABBV', 'TMO', 'ABT', 'CVS', 'AMGN', 'MDT'],
-            'Financials': ['BRK-B', 'JPM', 'V', 'MA', 'BAC', 'WFC', 'GS', 'MS', 'AXP', 'SCHW'],
-            'Consumer': ['HD', 'WMT', 'MCD', 'NKE', 'SBUX', 'TGT', 'LOW', 'COST', 'TJX', 'DG'],
-            'Energy': ['XOM', 'CVX', 'COP', 'SLB', 'EOG', 'MPC', 'VLO', 'PSX', 'OXY', 'PXD'],
-            'Communication': ['DIS', 'NFLX', 'CMCSA', 'VZ', 'T', 'TMUS', 'CHTR'],
-            'Other': ['KO', 'PG', 'TSLA', 'COIN', 'RBLX', 'SHOP', 'SQ', 'SNOW', 'NET', 'DDOG', 'PLTR', 'ROKU', 'ZM']
-        }
+        self.universe = get_universe()
+        self.sector_mapping = self.universe.allocation_sectors
+
+    def refresh_holdings(self) -> HoldingsState:
+        """Re-ingest changed holdings files; a new state is published only if something changed"""
+        with self._holdings_lock:
+            self.holdings_store.reload()
+            if self._holdings is None or self.holdings_store.version != self._holdings.version:
+                # Managers x securities weights; every platform aggregate is computed from it
+                self._holdings = HoldingsState(*self.holdings_store.snapshot())
+            return self._holdings
+
+    @property
+    def institutional_portfolios(self) -> Dict[str, Dict]:
+        return (_request_holdings.get() or self._holdings).portfolios
+
+    @property
+    def holdings_matrix(self) -> HoldingsMatrix:
+        return (_request_holdings.get() or self._holdings).matrix
 
     def perform_analysis(self, query: str) -> str:
         """Perform multi-strategy analysis based on query type"""
+        # Every step of this analysis reads the same holdings, even if another request reloads them
+        token = _request_holdings.set(self.refresh_holdings())
+        try:
+            return self._dispatch(query)
+        finally:
+            _request_holdings.reset(token)
+
+    def _dispatch(self, query: str) -> str:
         try:
             query_lower = query.lower()
             
@@ -118,35 +111,31 @@ class MultiStrategyAnalyzer:
         response = "# 🎭 Manager Overlap Analysis\n\n"
         response += "**Identifying redundant holdings across investment managers**\n\n"
         
-        # Find all unique holdings
-        all_holdings = set()
-        for manager_data in self.institutional_portfolios.values():
-            all_holdings.update(manager_data['holdings'].keys())
+        matrix = self.holdings_matrix
+        holder_counts = matrix.holder_counts()
+        dollar_holdings = matrix.dollar_holdings()
+        weight_sums = matrix.weight_sums()
         
-        # Analyze overlap for each stock
+        # Analyze overlap for each stock held by multiple managers
         overlap_analysis = {}
-        for stock in all_holdings:
+        for column in np.flatnonzero(holder_counts > 1):
+            stock = matrix.securities[column]
             managers_holding = []
-            total_weight = 0
-            
-            for manager_id, manager_data in self.institutional_portfolios.items():
-                if stock in manager_data['holdings']:
-                    weight = manager_data['holdings'][stock]
-                    managers_holding.append({
-                        'manager': manager_data['name'],
-                        'strategy': manager_data['strategy'],
-                        'weight': weight,
-                        'dollar_value': weight * manager_data['aum']
-                    })
-                    total_weight += weight
+            for row, weight in matrix.holders_of(stock):
+                manager_data = self.institutional_portfolios[matrix.managers[row]]
+                managers_holding.append({
+                    'manager': manager_data['name'],
+                    'strategy': manager_data['strategy'],
+                    'weight': weight,
+                    'dollar_value': weight * manager_data['aum']
+                })
             
-            if len(managers_holding) > 1:  # Only stocks held by multiple managers
-                overlap_analysis[stock] = {
-                    'managers': managers_holding,
-                    'overlap_count': len(managers_holding),
-                    'total_weight': total_weight,
-                    'total_value': sum(m['dollar_value'] for m in managers_holding)
-                }
+            overlap_analysis[stock] = {
+                'managers': managers_holding,
+                'overlap_count': int(holder_counts[column]),
+                'total_weight': float(weight_sums[column]),
+                'total_value': float(dollar_holdings[column])
+            }
         
         # Sort by overlap severity (number of managers + total value)
         sorted_overlaps = sorted(
@@ -160,8 +149,10 @@ class MultiStrategyAnalyzer:
             response += f"### {stock}\n"
             response += f"**Held by {data['overlap_count']} managers** | **Total Value: ${data['total_value']/1e9:.2f}B**\n\n"
             
-            for manager in data['managers']:
+            for manager in data['managers'][:MAX_LISTED_HOLDERS]:
                 response += f"• **{manager['manager']}**: {manager['weight']:.1%} (${manager['dollar_value']/1e6:.0f}M)\n"
+            if len(data['managers']) > MAX_LISTED_HOLDERS:
+                response += f"• *...and {len(data['managers']) - MAX_LISTED_HOLDERS} more managers*\n"
             
             response += f"• **Overlap Risk:** High concentration across {data['overlap_count']} strategies\n\n"
         
@@ -172,7 +163,7 @@ class MultiStrategyAnalyzer:
         response += "## 📊 Overlap Summary\n\n"
         response += f"• **Total Overlapping Holdings:** {total_overlapping_stocks} stocks\n"
         response += f"• **High Overlap (3+ managers):** {high_overlap_stocks} stocks\n"
-        response += f"• **Platform Total Holdings:** {len(all_holdings)} unique stocks\n"
+        response += f"• **Platform Total Holdings:** {len(matrix.securities)} unique stocks\n"
         
         return response
 
@@ -182,22 +173,8 @@ class MultiStrategyAnalyzer:
         response += "**Measuring how similarly different managers' portfolios are structured**\n\n"
         
         # Calculate portfolio correlations based on overlapping holdings
-        managers = list(self.institutional_portfolios.keys())
-        correlation_matrix = {}
-        
-        for manager1 in managers:
-            correlation_matrix[manager1] = {}
-            for manager2 in managers:
-                if manager1 == manager2:
-                    correlation_matrix[manager1][manager2] = 1.0
-                else:
-                    correlation = self.calculate_portfolio_correlation(manager1, manager2)
-                    correlation_matrix[manager1][manager2] = correlation
-        
-        # Display correlation matrix
-        response += "## Correlation Matrix\n\n"
-        response += "| Manager | Tech Growth | Innovation | Value | Balanced | Momentum |\n"
-        response += "|---------|-------------|------------|-------|----------|----------|\n"
+        managers = self.holdings_matrix.managers
+        correlation_matrix = self.holdings_matrix.overlap_similarity()
         
         manager_short_names = {
             'growth_manager_a': 'Tech Growth',
@@ -207,10 +184,19 @@ class MultiStrategyAnalyzer:
             'momentum_manager': 'Momentum'
         }
         
-        for manager1 in managers:
-            row = f"| {manager_short_names[manager1]} |"
-            for manager2 in managers:
-                corr = correlation_matrix[manager1][manager2]
+        # Display correlation matrix of the largest managers
+        shown = np.sort(np.argsort(-self.holdings_matrix.aum, kind='stable')[:MAX_MATRIX_MANAGERS])
+        labels = [manager_short_names.get(managers[i], self.institutional_portfolios[managers[i]]['name']) for i in shown]
+        
+        response += "## Correlation Matrix\n\n"
+        if len(managers) > len(shown):
+            response += f"*Largest {len(shown)} of {len(managers)} managers by AUM*\n\n"
+        response += "| Manager | " + " | ".join(labels) + " |\n"
+        response += "|---------|" + "|".join("-" * (len(label) + 2) for label in labels) + "|\n"
+        
+        for i, label in zip(shown, labels):
+            row = f"| {label} |"
+            for corr in correlation_matrix[i, shown]:
                 row += f" {corr:.2f} |"
             response += row + "\n"
         
@@ -220,16 +206,11 @@ class MultiStrategyAnalyzer:
         response += "## 🔗 Key Correlation Insights\n\n"
         
         # Find highest correlation pair (excluding self-correlation)
-        max_corr = 0
-        max_pair = None
-        
-        for manager1 in managers:
-            for manager2 in managers:
-                if manager1 != manager2:
-                    corr = correlation_matrix[manager1][manager2]
-                    if corr > max_corr:
-                        max_corr = corr
-                        max_pair = (manager1, manager2)
+        off_diagonal = ~np.eye(len(managers), dtype=bool)
+        cross_correlations = np.where(off_diagonal, correlation_matrix, 0.0)
+        i, j = np.unravel_index(np.argmax(cross_correlations), cross_correlations.shape)
+        max_corr = cross_correlations[i, j]
+        max_pair = (managers[i], managers[j]) if max_corr > 0 else None
         
         if max_pair:
             m1_data = self.institutional_portfolios[max_pair[0]]
@@ -237,10 +218,8 @@ class MultiStrategyAnalyzer:
             response += f"• **Highest Correlation:** {m1_data['name']} ↔ {m2_data['name']} ({max_corr:.2f})\n"
         
         # Calculate average correlation
-        all_correlations = [
-            correlation_matrix[m1][m2] for m1 in managers for m2 in managers if m1 != m2
-        ]
-        avg_correlation = np.mean(all_correlations) if all_correlations else 0
+        all_correlations = correlation_matrix[off_diagonal]
+        avg_correlation = all_correlations.mean() if all_correlations.size else 0
         
         response += f"• **Average Cross-Manager Correlation:** {avg_correlation:.2f}\n"
         
@@ -255,57 +234,28 @@ class MultiStrategyAnalyzer:
 
     def calculate_portfolio_correlation(self, manager1: str, manager2: str) -> float:
         """Calculate correlation between two portfolios based on overlapping holdings"""
-        portfolio1 = self.institutional_portfolios[manager1]['holdings']
-        portfolio2 = self.institutional_portfolios[manager2]['holdings']
-        
-        # Find common holdings
-        common_stocks = set(portfolio1.keys()) & set(portfolio2.keys())
-        
-        if len(common_stocks) < 2:
-            return 0.0  # Need at least 2 common holdings for meaningful correlation
-        
-        # Calculate overlap-based correlation
-        overlap_weight = sum(min(portfolio1.get(stock, 0), portfolio2.get(stock, 0)) for stock in common_stocks)
-        total_weight1 = sum(portfolio1.values())
-        total_weight2 = sum(portfolio2.values())
-        
-        # Normalized correlation score
-        correlation = overlap_weight / min(total_weight1, total_weight2)
-        return min(correlation, 1.0)
+        matrix = self.holdings_matrix
+        return float(matrix.overlap_similarity()[matrix.manager_row(manager1), matrix.manager_row(manager2)])
 
     def analyze_concentration_risk(self) -> str:
         """Analyze concentration risks across the multi-manager platform"""
         response = "# ⚠️ Multi-Manager Concentration Risk Analysis\n\n"
         
         # Aggregate holdings across all managers
-        aggregate_holdings = {}
-        total_aum = sum(manager['aum'] for manager in self.institutional_portfolios.values())
-        
-        for manager_data in self.institutional_portfolios.values():
-            for stock, weight in manager_data['holdings'].items():
-                dollar_amount = weight * manager_data['aum']
-                if stock in aggregate_holdings:
-                    aggregate_holdings[stock] += dollar_amount
-                else:
-                    aggregate_holdings[stock] = dollar_amount
-        
-        # Convert to percentages of total AUM
-        aggregate_percentages = {
-            stock: amount / total_aum for stock, amount in aggregate_holdings.items()
-        }
+        matrix = self.holdings_matrix
+        aggregate_holdings = matrix.dollar_holdings()
+        total_aum = matrix.aum.sum()
         
-        # Sort by concentration
-        sorted_concentrations = sorted(
-            aggregate_percentages.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )
+        # Convert to percentages of total AUM and sort by concentration
+        aggregate_percentages = aggregate_holdings / total_aum
+        order = np.argsort(-aggregate_percentages, kind='stable')
+        sorted_concentrations = [(matrix.securities[column], aggregate_percentages[column]) for column in order]
         
-        response += f"**Total Platform AUM:** ${total_aum/1e9:.1f}B across 5 managers\n\n"
+        response += f"**Total Platform AUM:** ${total_aum/1e9:.1f}B across {len(matrix.managers)} managers\n\n"
         
         response += "## Top Platform Concentrations\n\n"
         for i, (stock, percentage) in enumerate(sorted_concentrations[:10], 1):
-            dollar_value = aggregate_holdings[stock]
+            dollar_value = aggregate_holdings[matrix.security_column(stock)]
             response += f"{i}. **{stock}**: {percentage:.2%} (${dollar_value/1e9:.2f}B)\n"
         
         # Risk analysis
@@ -337,20 +287,23 @@ class MultiStrategyAnalyzer:
         response += "| Manager | Strategy | AUM | Holdings | Concentration |\n"
         response += "|---------|----------|-----|----------|---------------|\n"
         
-        for manager_id, manager_data in self.institutional_portfolios.items():
+        # Herfindahl concentration index and largest position per manager
+        concentrations = self.holdings_matrix.herfindahl()
+        max_positions = self.holdings_matrix.max_weights()
+        num_positions = self.holdings_matrix.position_counts()
+        
+        for row, (manager_id, manager_data) in enumerate(self.institutional_portfolios.items()):
             aum_billions = manager_data['aum'] / 1e9
-            num_holdings = len(manager_data['holdings'])
-            # Calculate Herfindahl concentration index
-            concentration = sum(weight**2 for weight in manager_data['holdings'].values())
+            num_holdings = num_positions[row]
+            concentration = concentrations[row]
             
             response += f"| {manager_data['name']} | {manager_data['strategy']} | ${aum_billions:.1f}B | {num_holdings} | {concentration:.3f} |\n"
         
         response += "\n## 🎯 Strategy Risk Profiles\n\n"
         
-        for manager_id, manager_data in self.institutional_portfolios.items():
-            holdings = manager_data['holdings']
-            concentration = sum(weight**2 for weight in holdings.values())
-            max_position = max(holdings.values()) if holdings else 0
+        for row, (manager_id, manager_data) in enumerate(self.institutional_portfolios.items()):
+            concentration = concentrations[row]
+            max_position = max_positions[row]
             
             response += f"### {manager_data['name']}\n"
             response += f"- **Strategy:** {manager_data['strategy']}\n"
@@ -364,20 +317,9 @@ class MultiStrategyAnalyzer:
         response = "# 🏢 Cross-Manager Sector Analysis\n\n"
         
         # Calculate platform-wide sector exposure
-        total_aum = sum(manager['aum'] for manager in self.institutional_portfolios.values())
-        platform_sector_exposure = {sector: 0.0 for sector in self.sector_mapping.keys()}
-        
-        for manager_data in self.institutional_portfolios.values():
-            for stock, weight in manager_data['holdings'].items():
-                # Find sector for this stock
-                stock_sector = 'Other'  # Default
-                for sector, stocks in self.sector_mapping.items():
-                    if stock in stocks:
-                        stock_sector = sector
-                        break
-                
-                dollar_amount = weight * manager_data['aum']
-                platform_sector_exposure[stock_sector] += dollar_amount / total_aum
+        total_aum = self.holdings_matrix.aum.sum()
+        sector_dollars = self.holdings_matrix.rollup(self.universe.allocation_sector_of, list(self.sector_mapping))
+        platform_sector_exposure = {sector: dollars / total_aum for sector, dollars in sector_dollars.items()}
         
         response += "## Platform-Wide Sector Exposure\n\n"
         
@@ -449,17 +391,8 @@ You provide professional institutional analysis for multi-manager platforms."""
 
     def run(self, query: str) -> str:
         """Main method for multi-strategy monitoring"""
-        # Comprehensive trigger words for multi-strategy analysis
-        trigger_words = [
-            'multi', 'manager', 'managers', 'strategy', 'strategies', 'portfolio', 'portfolios',
-            'overlap', 'redundant', 'correlation', 'correlated', 'concentration', 'risk',
-            'sector', 'allocation', 'diversification', 'performance', 'compare', 'comparison',
-            'institutional', 'platform', 'consolidated', 'oversight', 'monitor', 'monitoring',
-            'cross', 'across', 'multiple', 'different', 'various'
-        ]
-        
-        # If ANY trigger word is in the query, use the tool
-        if any(word in query.lower() for word in trigger_words):
+        # If ANY multi-strategy trigger word is in the query, use the tool
+        if get_router().matches(query, 'agent', 'multi_strategy'):
             return multi_strategy_analysis_function(query)
         
         # For non-multi-strategy queries, use parent's run method
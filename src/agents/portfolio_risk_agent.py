@@ -1,7 +1,5 @@
 # src/agents/portfolio_risk_agent_enhanced.py
 from google.adk.agents import Agent
-import yfinance as yf
-import pandas as pd
 import numpy as np
 import sys
 import os
@@ -11,14 +9,55 @@ import re
 
 # Add src to path so we can import our utilities
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.market_data import get_provider
+from utils.universe import get_universe
+from utils.risk_engine import analyze_portfolio
+from utils.monte_carlo import stress_test
+from agents.registry import get_analyzer
+from utils.rate_limit import agent_scope
+from utils.router import get_router
+from utils.tracing import span
+
+# Info fields read by single-stock risk analysis; none of them are live quotes
+RISK_INFO_FIELDS = [
+    'beta', 'debtToEquity', 'currentRatio', 'returnOnEquity', 'trailingPE',
+    'priceToBook', 'sector', 'revenueGrowth'
+]
+
+# Return-based risk settings for custom portfolios
+RISK_LOOKBACK = '1y'
+RISK_CONFIDENCE = 0.95
+RISK_SHRINKAGE = 'ledoit_wolf'
+
+# Monte Carlo stress settings: scenario shocks are factor returns over the horizon
+STRESS_HORIZON_DAYS = 21
+STRESS_PATHS = 20000
+# Paths per portfolio when stress results are one section of the overall
+# analysis; the full STRESS_PATHS run is kept for explicit stress queries
+OVERVIEW_STRESS_PATHS = 2000
+
+# Index ETFs standing in for market-wide factors in custom portfolio scenarios
+MARKET_FACTORS = {
+    'Market': ['SPY'],
+    'Technology': ['XLK'],
+    'Rates': ['TLT']
+}
+
+CUSTOM_STRESS_SCENARIOS = {
+    'Market Crash (-30%)': {'Market': -0.30},
+    'Tech Sector Correction': {'Technology': -0.20},
+    'Rising Interest Rates': {'Rates': -0.15},
+    'Recession Scenario': {'Market': -0.25}
+}
 
 def portfolio_risk_analysis_function(query: str) -> str:
     """
     Function that performs portfolio risk attribution analysis
     """
     try:
-        analyzer = PortfolioRiskAnalyzer()
-        return analyzer.perform_analysis(query)
+        analyzer = get_analyzer('portfolio_risk')
+        with agent_scope('portfolio_risk'), span('agent', agent='portfolio_risk'):
+            return analyzer.perform_analysis(query)
     except Exception as e:
         return f"Error in portfolio risk analysis: {str(e)}"
 
@@ -26,51 +65,13 @@ class PortfolioRiskAnalyzer:
     """Helper class for portfolio risk attribution without ADK field restrictions"""
     
     def __init__(self):
+        self.universe = get_universe()
+        
         # Predefined institutional portfolios for demo
-        self.sample_portfolios = {
-            'growth_portfolio': {
-                'NVDA': 0.15, 'AAPL': 0.12, 'MSFT': 0.11, 'GOOGL': 0.10, 'META': 0.08,
-                'AMZN': 0.07, 'TSLA': 0.06, 'AMD': 0.05, 'CRM': 0.04, 'ADBE': 0.04,
-                'NFLX': 0.03, 'SHOP': 0.03, 'SQ': 0.03, 'SNOW': 0.03, 'PLTR': 0.03,
-                'COIN': 0.02, 'RBLX': 0.02, 'ZM': 0.02, 'DDOG': 0.02, 'NET': 0.02
-            },
-            'value_portfolio': {
-                'BRK-B': 0.12, 'JPM': 0.10, 'JNJ': 0.08, 'PG': 0.07, 'KO': 0.06,
-                'WMT': 0.06, 'HD': 0.05, 'VZ': 0.05, 'PFE': 0.05, 'MRK': 0.05,
-                'BAC': 0.04, 'WFC': 0.04, 'XOM': 0.04, 'CVX': 0.04, 'T': 0.04,
-                'IBM': 0.03, 'GE': 0.03, 'F': 0.03, 'GM': 0.03, 'C': 0.03
-            },
-            'balanced_portfolio': {
-                'AAPL': 0.08, 'MSFT': 0.07, 'GOOGL': 0.06, 'BRK-B': 0.06, 'JPM': 0.05,
-                'JNJ': 0.05, 'NVDA': 0.05, 'META': 0.04, 'PG': 0.04, 'HD': 0.04,
-                'WMT': 0.04, 'V': 0.04, 'MA': 0.04, 'UNH': 0.04, 'AMZN': 0.03,
-                'TSLA': 0.03, 'DIS': 0.03, 'KO': 0.03, 'PFE': 0.03, 'MRK': 0.03
-            }
-        }
+        self.sample_portfolios = self.universe.model_portfolios
         
         # Factor definitions for attribution
-        self.factor_definitions = {
-            'Growth': {
-                'description': 'Companies with high revenue/earnings growth',
-                'stocks': ['NVDA', 'AAPL', 'MSFT', 'GOOGL', 'META', 'AMZN', 'TSLA'],
-                'weight': 1.0
-            },
-            'Value': {
-                'description': 'Companies trading at low valuations',
-                'stocks': ['BRK-B', 'JPM', 'WFC', 'BAC', 'XOM', 'CVX', 'IBM'],
-                'weight': 1.0
-            },
-            'Quality': {
-                'description': 'Companies with strong fundamentals',
-                'stocks': ['AAPL', 'MSFT', 'JNJ', 'PG', 'KO', 'HD', 'WMT'],
-                'weight': 1.0
-            },
-            'Momentum': {
-                'description': 'Companies with strong price momentum',
-                'stocks': ['NVDA', 'AMD', 'CRM', 'NET', 'DDOG', 'SHOP', 'SQ'],
-                'weight': 1.0
-            }
-        }
+        self.factor_definitions = self.universe.factors
 
     def perform_analysis(self, query: str) -> str:
         """Perform portfolio risk attribution analysis"""
@@ -115,15 +116,17 @@ class PortfolioRiskAnalyzer:
     def analyze_single_stock_risk(self, ticker: str, query: str) -> str:
         """Analyze risk factors for a single stock"""
         try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            
-            # Get price history for volatility calculation
-            hist = stock.history(period="1y")
+            # Fetch fundamentals and the 1-year return window for volatility together
+            fundamentals, windows = get_provider().fetch_fundamentals_with_windows([ticker], "1y", fields=RISK_INFO_FIELDS)
+            info = fundamentals[ticker]
+            window = windows[ticker]
+            if isinstance(info, Exception):
+                raise info
+            if isinstance(window, Exception):
+                raise window
             
             # Calculate risk metrics
-            daily_returns = hist['Close'].pct_change().dropna()
-            volatility = daily_returns.std() * np.sqrt(252)  # Annualized
+            volatility = window.volatility()  # Annualized std of daily returns
             
             # Beta (market risk)
             beta = info.get('beta', 1.0) or 1.0
@@ -202,13 +205,18 @@ class PortfolioRiskAnalyzer:
             response += f"• **Concentration Risk:** {portfolio_metrics['concentration_risk']:.3f}\n"
             response += f"• **Number of Holdings:** {portfolio_metrics['num_holdings']}\n"
             
+            # Return-based risk from the holdings' daily return covariance
+            response += self.format_return_based_risk(custom_portfolio)
+            
             # Individual stock contributions
             response += "\n## Individual Stock Risk Contributions\n"
             
-            for ticker in tickers[:5]:  # Limit to top 5 for brevity
+            fundamentals = get_provider().fetch_fundamentals(tickers[:5], fields=['beta', 'sector'])  # Limit to top 5 for brevity
+            
+            for ticker, info in fundamentals.items():
                 try:
-                    stock = yf.Ticker(ticker)
-                    info = stock.info
+                    if isinstance(info, Exception):
+                        raise info
                     beta = info.get('beta', 1.0) or 1.0
                     
                     response += f"• **{ticker}:** Beta {beta:.2f}, "
@@ -219,43 +227,70 @@ class PortfolioRiskAnalyzer:
             # Stress test results
             stress_results = self.stress_test_custom_portfolio(custom_portfolio)
             
-            response += "\n## Stress Test Scenarios\n"
-            for scenario, impact in stress_results.items():
+            response += f"\n## Stress Test Scenarios ({STRESS_PATHS:,} simulated {STRESS_HORIZON_DAYS}-day paths)\n"
+            for scenario, metrics in stress_results.items():
+                if 'error' in metrics:
+                    response += f"• **{scenario}:** Unavailable: {metrics['error']}\n"
+                    continue
+                impact = metrics['expected_return']
                 impact_color = "🟢" if impact > 0 else "🔴" if impact < -0.20 else "🟡"
-                response += f"• **{scenario}:** {impact_color} {impact:.1%}\n"
+                response += f"• **{scenario}:** {impact_color} {impact:+.1%} expected | "
+                response += f"{metrics['confidence']:.0%} VaR {metrics['var']:.1%} | CVaR {metrics['cvar']:.1%} | "
+                response += f"P(loss) {metrics['probability_of_loss']:.0%}\n"
             
             return response
             
         except Exception as e:
             return f"Error analyzing custom portfolio: {str(e)}"
 
+    def format_return_based_risk(self, portfolio: Dict[str, float]) -> str:
+        """Volatility, VaR/CVaR and risk contributions from historical returns"""
+        try:
+            risk = analyze_portfolio(portfolio, RISK_LOOKBACK, shrinkage=RISK_SHRINKAGE, confidence=RISK_CONFIDENCE)
+        except Exception as e:
+            return f"\n## Return-Based Risk\n• Unavailable: {str(e)}\n"
+        
+        response = f"\n## Return-Based Risk ({RISK_LOOKBACK} daily returns, {RISK_CONFIDENCE:.0%} confidence)\n"
+        response += f"• **Annualized Volatility:** {risk['annual_volatility']:.1%}\n"
+        response += f"• **1-Day VaR:** {risk['parametric_var']:.2%} parametric | {risk['historical_var']:.2%} historical\n"
+        response += f"• **1-Day CVaR (Expected Shortfall):** {risk['parametric_cvar']:.2%} parametric | {risk['historical_cvar']:.2%} historical\n"
+        if risk['missing']:
+            response += f"• **Excluded (insufficient history):** {', '.join(risk['missing'])}\n"
+        
+        response += "\n## Risk Contribution by Holding\n"
+        order = np.argsort(-risk['component_contribution'], kind='stable')
+        for i in order[:10]:
+            response += f"• **{risk['symbols'][i]}:** {risk['percent_contribution'][i]:.1%} of risk "
+            response += f"(weight {risk['weights'][i]:.1%}, marginal vol {risk['marginal_contribution'][i] * np.sqrt(252):.1%})\n"
+        return response
+
     def calculate_stock_factor_scores(self, ticker: str, info: Dict) -> Dict[str, float]:
         """Calculate factor scores for individual stock"""
         scores = {}
         
         # Growth factor
-        if ticker in self.factor_definitions['Growth']['stocks']:
+        if self.universe.has_factor(ticker, 'Growth'):
             scores['Growth'] = 0.9
         else:
             revenue_growth = info.get('revenueGrowth', 0) or 0
             scores['Growth'] = min(0.5 + revenue_growth, 1.0)
         
         # Value factor
-        if ticker in self.factor_definitions['Value']['stocks']:
+        if self.universe.has_factor(ticker, 'Value'):
             scores['Value'] = 0.9
         else:
             pe = info.get('trailingPE', 100) or 100
             scores['Value'] = max(0, 1 - (pe / 50))  # Lower PE = higher value score
         
         # Quality factor
-        if ticker in self.factor_definitions['Quality']['stocks']:
+        if self.universe.has_factor(ticker, 'Quality'):
             scores['Quality'] = 0.9
         else:
             roe = info.get('returnOnEquity', 0) or 0
             scores['Quality'] = min(roe * 5, 1.0)  # ROE of 20% = score of 1.0
         
         # Momentum factor
-        if ticker in self.factor_definitions['Momentum']['stocks']:
+        if self.universe.has_factor(ticker, 'Momentum'):
             scores['Momentum'] = 0.9
         else:
             scores['Momentum'] = 0.5  # Default medium momentum
@@ -300,29 +335,17 @@ class PortfolioRiskAnalyzer:
         
         return rationale_text
 
-    def stress_test_custom_portfolio(self, portfolio: Dict[str, float]) -> Dict[str, float]:
-        """Run stress tests on custom portfolio"""
-        scenarios = {
-            'Market Crash (-30%)': -0.30,
-            'Tech Sector Correction': -0.20,
-            'Rising Interest Rates': -0.15,
-            'Recession Scenario': -0.25
-        }
+    def stress_test_custom_portfolio(self, portfolio: Dict[str, float]) -> Dict[str, Dict]:
+        """Simulate the custom portfolio under each market scenario.
         
-        # Simplified stress test - would be more sophisticated in production
-        results = {}
-        for scenario, base_impact in scenarios.items():
-            # Adjust impact based on portfolio composition
-            tech_weight = sum(portfolio.get(ticker, 0) for ticker in ['AAPL', 'MSFT', 'NVDA', 'GOOGL', 'META', 'AMZN'])
-            
-            if 'Tech' in scenario:
-                impact = base_impact * (1 + tech_weight)
-            else:
-                impact = base_impact
-            
-            results[scenario] = impact
-        
-        return results
+        Holdings move with the shocked index through their return
+        covariance, so the loss depends on what is actually held.
+        """
+        return stress_test(
+            portfolio, CUSTOM_STRESS_SCENARIOS, MARKET_FACTORS, RISK_LOOKBACK,
+            horizon_days=STRESS_HORIZON_DAYS, paths=STRESS_PATHS,
+            confidence=RISK_CONFIDENCE, shrinkage=RISK_SHRINKAGE
+        )
 
     def portfolio_factor_attribution(self, query: str) -> str:
         """Perform factor attribution analysis on predefined portfolios"""
@@ -345,10 +368,10 @@ class PortfolioRiskAnalyzer:
             portfolio_metrics = {}
             
             # Calculate factor exposures
-            for factor_name, factor_data in self.factor_definitions.items():
+            for factor_name in self.factor_definitions:
                 exposure = 0
                 for stock, weight in holdings.items():
-                    if stock in factor_data['stocks']:
+                    if self.universe.has_factor(stock, factor_name):
                         exposure += weight
                 factor_exposures[factor_name] = exposure
             
@@ -372,8 +395,8 @@ class PortfolioRiskAnalyzer:
         """Calculate portfolio concentration using Herfindahl index"""
         return sum(weight**2 for weight in holdings.values())
 
-    def stress_test_analysis(self, query: str) -> str:
-        """Perform stress testing on portfolios"""
+    def stress_test_analysis(self, query: str, paths: int = STRESS_PATHS) -> str:
+        """Perform stress testing on portfolios with `paths` simulated paths each"""
         try:
             stress_scenarios = {
                 '2008_financial_crisis': {
@@ -407,25 +430,24 @@ class PortfolioRiskAnalyzer:
             
             stress_results = {}
             
+            # Factor impacts are the returns of each factor's basket over the horizon
+            scenarios = {name: data['factor_impacts'] for name, data in stress_scenarios.items()}
+            factor_baskets = {name: data['stocks'] for name, data in self.factor_definitions.items()}
+            
             for portfolio_name, holdings in self.sample_portfolios.items():
-                portfolio_stress = {}
-                portfolio_analysis = self.analyze_single_portfolio(portfolio_name, holdings)
+                simulated = stress_test(
+                    holdings, scenarios, factor_baskets, RISK_LOOKBACK,
+                    horizon_days=STRESS_HORIZON_DAYS, paths=paths,
+                    confidence=RISK_CONFIDENCE, shrinkage=RISK_SHRINKAGE
+                )
                 
+                portfolio_stress = {}
                 for scenario_name, scenario_data in stress_scenarios.items():
-                    portfolio_impact = 0
-                    
-                    for factor, exposure in portfolio_analysis.get('factor_exposures', {}).items():
-                        factor_impact = scenario_data['factor_impacts'].get(factor, 0)
-                        portfolio_impact += exposure * factor_impact
-                    
-                    portfolio_stress[scenario_name] = {
-                        'impact': portfolio_impact,
-                        'description': scenario_data['description']
-                    }
+                    portfolio_stress[scenario_name] = dict(simulated[scenario_name], description=scenario_data['description'])
                 
                 stress_results[portfolio_name] = portfolio_stress
             
-            return self.format_stress_test_results(stress_results, query)
+            return self.format_stress_test_results(stress_results, query, paths)
             
         except Exception as e:
             return f"Error in stress testing: {str(e)}"
@@ -447,7 +469,7 @@ class PortfolioRiskAnalyzer:
     def comprehensive_risk_analysis(self, query: str) -> str:
         """Perform comprehensive risk analysis"""
         attribution = self.portfolio_factor_attribution(query)
-        stress_test = self.stress_test_analysis(query)
+        stress_test = self.stress_test_analysis(query, paths=OVERVIEW_STRESS_PATHS)
         
         return f"""# 📊 Comprehensive Portfolio Risk Analysis
 
@@ -481,17 +503,23 @@ This analysis provides factor attribution, stress testing, and comparative metri
         
         return response
 
-    def format_stress_test_results(self, results: Dict, query: str) -> str:
+    def format_stress_test_results(self, results: Dict, query: str, paths: int = STRESS_PATHS) -> str:
         """Format stress test results"""
-        response = f"**⚠️ Portfolio Stress Test Analysis**\n\n"
+        response = f"**⚠️ Portfolio Stress Test Analysis**\n"
+        response += f"*{paths:,} simulated {STRESS_HORIZON_DAYS}-day paths per scenario, conditioned on the factor shocks*\n\n"
         
         for portfolio_name, stress_data in results.items():
             response += f"## {portfolio_name.replace('_', ' ').title()}\n"
             
             for scenario, data in stress_data.items():
-                impact_pct = data['impact'] * 100
+                if 'error' in data:
+                    response += f"• **{data['description']}:** Unavailable: {data['error']}\n"
+                    continue
+                impact_pct = data['expected_return'] * 100
                 impact_color = "🟢" if impact_pct > 0 else "🔴" if impact_pct < -20 else "🟡"
-                response += f"• **{data['description']}:** {impact_color} {impact_pct:+.1f}%\n"
+                response += f"• **{data['description']}:** {impact_color} {impact_pct:+.1f}% expected, "
+                response += f"{data['confidence']:.0%} VaR {data['var']:.1%}, CVaR {data['cvar']:.1%}, "
+                response += f"worst {data['worst_loss']:.1%}\n"
             
             response += "\n"
         
@@ -554,13 +582,11 @@ You deliver sophisticated risk intelligence for both individual securities and p
     def run(self, query: str) -> str:
         """Main method for portfolio risk attribution"""
         # Direct execution for risk-related queries
-        risk_keywords = ['risk', 'attribution', 'stress', 'portfolio', 'factor', 'concentration', 'scenario']
-        
         # Also check for ticker symbols
         ticker_pattern = r'\b[A-Z]{2,5}(?:[-\.][A-Z])?\b'
         has_tickers = bool(re.search(ticker_pattern, query))
         
-        if any(keyword in query.lower() for keyword in risk_keywords) or has_tickers:
+        if get_router().matches(query, 'agent', 'portfolio_risk') or has_tickers:
             return portfolio_risk_analysis_function(query)
         else:
             return super().run(query)
@@ -0,0 +1,132 @@
+# src/agents/registry.py - Process-wide agent, analyzer and orchestrator singletons
+import importlib
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Classes are referenced as "module:attribute" and imported on first use, so
+# agent modules can import the registry without a circular import
+AGENT_CLASSES = {
+    'stock_screener': 'agents.stock_screener_final:StockScreeningAgent',
+    'style_theme': 'agents.style_theme_agent:StyleThemeAgent',
+    'portfolio_risk': 'agents.portfolio_risk_agent:PortfolioRiskAgent',
+    'multi_strategy': 'agents.multi_strategy_agent:MultiStrategyAgent'
+}
+
+ANALYZER_CLASSES = {
+    'style_theme': 'agents.style_theme_agent:StyleThemeAnalyzer',
+    'portfolio_risk': 'agents.portfolio_risk_agent:PortfolioRiskAnalyzer',
+    'multi_strategy': 'agents.multi_strategy_agent:MultiStrategyAnalyzer'
+}
+
+ORCHESTRATOR_CLASS = 'multi_agent_orchestrator:InvestmentIntelligenceOrchestrator'
+
+# Heavy third-party modules whose first import would otherwise land on a request
+PRELOAD_MODULES = ['numpy', 'pandas', 'yfinance']
+
+# STARTUP_MODE values: 'eager' builds everything during warmup; 'lazy' only loads
+# the light data and leaves heavy imports and agents to the first request needing them
+STARTUP_MODES = ('eager', 'lazy')
+
+_instances: Dict[str, Any] = {}
+# Re-entrant: building the orchestrator builds the agents it wraps
+_instances_lock = threading.RLock()
+_warm = threading.Event()
+
+
+def get_agent(name: str):
+    """Return the shared ADK agent registered under `name`"""
+    if name not in AGENT_CLASSES:
+        raise KeyError(f"Unknown agent: {name}")
+    return _get_instance(AGENT_CLASSES[name])
+
+
+def get_analyzer(name: str):
+    """Return the shared analyzer behind the `name` agent's tool function"""
+    if name not in ANALYZER_CLASSES:
+        raise KeyError(f"Unknown analyzer: {name}")
+    return _get_instance(ANALYZER_CLASSES[name])
+
+
+def get_orchestrator():
+    """Return the shared multi-agent orchestrator"""
+    return _get_instance(ORCHESTRATOR_CLASS)
+
+
+def startup_mode() -> str:
+    """Warmup strategy from STARTUP_MODE ('eager' by default)"""
+    mode = os.environ.get('STARTUP_MODE', 'eager').lower() or 'eager'
+    if mode not in STARTUP_MODES:
+        raise ValueError(f"Unknown startup mode: {mode} (expected one of {', '.join(STARTUP_MODES)})")
+    return mode
+
+
+def warmup(mode: Optional[str] = None) -> Dict[str, float]:
+    """Build every singleton and preload data so the first request pays no setup cost.
+
+    Imports the heavy libraries, loads the symbol universe, maps the factor
+    snapshot, constructs all agents, analyzers and the orchestrator, compiles
+    the query parser and restores the last fundamentals cache snapshot.
+    In 'lazy' mode (see `startup_mode`) only the universe and the cache
+    snapshot are loaded; everything else is built by the first request that
+    needs it. Returns the seconds spent per step; `is_warm()` turns True
+    once it has finished.
+    """
+    from utils.fundamentals_cache import get_fundamentals_cache, snapshot_path
+    from utils.universe import get_universe
+
+    mode = mode or startup_mode()
+    timings = {}
+
+    if mode == 'eager':
+        start = time.perf_counter()
+        for module in PRELOAD_MODULES:
+            importlib.import_module(module)
+        timings['imports'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_universe()
+    if mode == 'eager':
+        from utils.factor_snapshot import get_factor_snapshot
+        get_factor_snapshot()
+    timings['universe'] = time.perf_counter() - start
+
+    if mode == 'eager':
+        start = time.perf_counter()
+        for name in AGENT_CLASSES:
+            get_agent(name)
+        for name in ANALYZER_CLASSES:
+            get_analyzer(name)
+        get_orchestrator()
+        importlib.import_module('utils.query_parser_fixed')
+        timings['agents'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    restored = get_fundamentals_cache().load_snapshot(snapshot_path())
+    timings['cache_snapshot'] = time.perf_counter() - start
+
+    _warm.set()
+    print(f"Warmup complete ({mode}): {restored} cached symbols restored, "
+          + ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items()))
+    return timings
+
+
+def is_warm() -> bool:
+    """True once `warmup()` has completed"""
+    return _warm.is_set()
+
+
+def _get_instance(target: str):
+    instance = _instances.get(target)
+    if instance is None:
+        with _instances_lock:
+            instance = _instances.get(target)
+            if instance is None:
+                module_name, attribute = target.split(':')
+                cls = getattr(importlib.import_module(module_name), attribute)
+                instance = _instances[target] = cls()
+    return instance
@@ -1,55 +1,122 @@
 from google.adk.agents import Agent
 from google.adk.tools import ToolContext
-import yfinance as yf
 import sys
 import os
-import re
+from typing import List
+
+import numpy as np
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from utils.query_parser_fixed import QueryParser
+from utils.query_parser_fixed import parse_query
+from utils.market_data import get_provider
+from utils.quote_stream import live_prices
+from utils.screening_engine import UniverseSnapshot, screen
+from utils.universe import get_universe
+from utils.rate_limit import agent_scope
+from utils.router import get_router
+from utils.tracing import span
+
+# .info fields the screener reads besides the price
+SCREEN_INFO_FIELDS = ['trailingPE', 'dividendYield', 'marketCap', 'sector']
 
 def screen_stocks_by_criteria(criteria: str) -> dict:
     """Screen stocks based on natural language criteria with WORKING FILTERS"""
     
-    parser = QueryParser()
-    parsed_criteria = parser.parse_query(criteria)
+    with span('parse'):
+        parsed_criteria = parse_query(criteria)
+    
+    # Choose stock universe based on query type
+    stock_symbols = get_universe().screen_symbols(parsed_criteria['universe'])
     
-    print(f"DEBUG: Parsed criteria = {parsed_criteria}")
+    results = fetch_screen_records(stock_symbols)
     
-    # Extract requested number of stocks
-    number_match = re.search(r'top (\d+)|show (\d+)|(\d+) stocks', criteria.lower())
-    requested_count = 8  # default
-    if number_match:
-        requested_count = int(number_match.group(1) or number_match.group(2) or number_match.group(3))
+    # Apply filters based on parsed criteria as vectorized column masks
+    with span('filter', stocks=len(results)) as stage:
+        snapshot = UniverseSnapshot(results)
+        
+        matches = screen(snapshot, parsed_criteria, parsed_criteria['sort_by'])
+        stage.set('matches', len(matches))
     
-    # Choose stock universe based on query type
-    if any(keyword in criteria.lower() for keyword in ['dividend', 'yield']):
-        stock_symbols = [
-            "AAPL", "MSFT", "JPM", "JNJ", "PFE", "UNH", "ABBV", "MRK", 
-            "CVX", "XOM", "KO", "PG", "HD", "WMT", "T", "VZ", 
-            "CMCSA", "BAC", "WFC", "GS", "V", "MA", "AXP", "COST", "MCD"
-        ]
-    elif any(keyword in criteria.lower() for keyword in ['tech', 'technology']):
-        stock_symbols = [
-            "AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "ORCL", "CRM", "ADBE",
-            "NFLX", "TSLA", "INTC", "AMD", "QCOM", "AVGO", "CSCO", "IBM"
-        ]
-    else:
-        stock_symbols = [
-            "AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "ORCL", "CRM", "ADBE",
-            "JPM", "BAC", "WFC", "GS", "BRK-B", "V", "MA", "AXP",
-            "JNJ", "PFE", "UNH", "ABBV", "MRK", "CVX", "XOM", "KO", "PG",
-            "HD", "NKE", "DIS", "MCD", "WMT", "COST", "TGT",
-            "T", "VZ", "CMCSA", "NFLX", "TSLA", "F", "GM",
-            "INTC", "AMD", "QCOM", "AVGO", "CSCO", "IBM", "HPQ"
-        ]
+    return screening_result(criteria, parsed_criteria, len(results), snapshot, matches)
+
+def screen_stocks_batch(queries: List[str]) -> List[dict]:
+    """Screen many natural language queries against one shared snapshot.
+    
+    The union of every query's universe is fetched once and loaded into a
+    single UniverseSnapshot; each query is then screened over its own
+    universe's rows. Results are in query order and match what
+    `screen_stocks_by_criteria` returns for each query alone; a query that
+    fails gets {"query", "error"} instead.
+    """
+    parsed = {}
+    with span('parse', queries=len(queries)):
+        for query in dict.fromkeys(queries):
+            try:
+                parsed[query] = parse_query(query)
+            except Exception as e:
+                parsed[query] = e
+    
+    universe = get_universe()
+    universes = {
+        criteria['universe']: universe.screen_symbols(criteria['universe'])
+        for criteria in parsed.values() if not isinstance(criteria, Exception)
+    }
+    union = list(dict.fromkeys(symbol for symbols in universes.values() for symbol in symbols))
+    
+    records = fetch_screen_records(union)
     
+    with span('filter', stocks=len(records), queries=len(parsed)) as stage:
+        snapshot = UniverseSnapshot(records)
+        row_of = {record['symbol']: row for row, record in enumerate(records)}
+        # Row indices of each universe, in the universe's own order (ties rank the same as a single screen)
+        universe_rows = {
+            name: np.array([row_of[symbol] for symbol in dict.fromkeys(symbols) if symbol in row_of], dtype=np.intp)
+            for name, symbols in universes.items()
+        }
+        
+        screened = {}
+        for query, criteria in parsed.items():
+            if isinstance(criteria, Exception):
+                screened[query] = {"query": query, "error": str(criteria)}
+                continue
+            try:
+                rows = universe_rows[criteria['universe']]
+                matches = screen(snapshot, criteria, criteria['sort_by'], rows=rows)
+                screened[query] = screening_result(query, criteria, len(rows), snapshot, matches)
+            except Exception as e:
+                screened[query] = {"query": query, "error": str(e)}
+        stage.set('matches', sum(result.get('results_count', 0) for result in screened.values()))
+    
+    return [screened[query] for query in queries]
+
+def fetch_screen_records(symbols: List[str]) -> List[dict]:
+    """Screening records for `symbols`, priced from the live quote board where it is fresh.
+    
+    Symbols with a streamed price only need their slower-moving fields to be
+    fresh, so their cached payloads are reused for much longer than the
+    quote TTL; the rest are fetched as before.
+    """
+    provider = get_provider()
+    live = live_prices(symbols)
+    if not live:
+        return stock_records(provider.fetch_fundamentals(symbols))
+    
+    fundamentals = provider.fetch_fundamentals([symbol for symbol in symbols if symbol in live], fields=SCREEN_INFO_FIELDS)
+    fundamentals.update(provider.fetch_fundamentals([symbol for symbol in symbols if symbol not in live]))
+    records = stock_records({symbol: fundamentals[symbol] for symbol in dict.fromkeys(symbols)})
+    for record in records:
+        if record['symbol'] in live:
+            record['price'] = live[record['symbol']]
+    return records
+
+def stock_records(fundamentals: dict) -> List[dict]:
+    """Screening records from `fetch_fundamentals` results; failed symbols are skipped"""
     results = []
     
-    for symbol in stock_symbols:
+    for symbol, info in fundamentals.items():
         try:
-            stock = yf.Ticker(symbol)
-            info = stock.info
+            if isinstance(info, Exception):
+                raise info
             
             current_price = info.get('currentPrice', 0)
             pe_ratio = info.get('trailingPE', 0)
@@ -73,115 +140,49 @@ def screen_stocks_by_criteria(criteria: str) -> dict:
             print(f"Error fetching data for {symbol}: {e}")
             continue
     
-    # Apply filters based on parsed criteria - COMPLETE FILTERING
-    filtered_results = []
-    for stock in results:
-        meets_criteria = True
-        
-        print(f"Checking {stock['symbol']}: ${stock['price']:.2f}, P/E: {stock['pe_ratio']:.2f}, Div: {stock['dividend_yield']:.2f}%")
-        
-        # Price filters - matches parser keys
-        if parsed_criteria.get('max_price') and stock['price'] and stock['price'] > 0:
-            if stock['price'] > parsed_criteria['max_price']:
-                print(f"  FILTERED OUT: Price ${stock['price']:.2f} > ${parsed_criteria['max_price']}")
-                meets_criteria = False
-        
-        if parsed_criteria.get('min_price') and stock['price'] and stock['price'] > 0:
-            if stock['price'] < parsed_criteria['min_price']:
-                print(f"  FILTERED OUT: Price ${stock['price']:.2f} < ${parsed_criteria['min_price']}")
-                meets_criteria = False
-        
-        # P/E filter
-        if parsed_criteria.get('max_pe') and stock['pe_ratio'] and stock['pe_ratio'] > 0:
-            if stock['pe_ratio'] > parsed_criteria['max_pe']:
-                print(f"  FILTERED OUT: P/E {stock['pe_ratio']:.2f} > {parsed_criteria['max_pe']}")
-                meets_criteria = False
-        
-        # Dividend filter
-        if parsed_criteria.get('min_dividend_yield') and stock['dividend_yield'] is not None:
-            if stock['dividend_yield'] < parsed_criteria['min_dividend_yield']:
-                print(f"  FILTERED OUT: Dividend {stock['dividend_yield']:.2f}% < {parsed_criteria['min_dividend_yield']}%")
-                meets_criteria = False
-        
-        # Sector filters
-        if parsed_criteria.get('tech'):
-            tech_sectors = ['Technology', 'Communication Services', 'Consumer Cyclical']
-            if not any(sector in stock['sector'] for sector in tech_sectors):
-                print(f"  FILTERED OUT: {stock['sector']} not tech sector")
-                meets_criteria = False
-        
-        if parsed_criteria.get('healthcare'):
-            healthcare_sectors = ['Healthcare', 'Biotechnology']
-            if not any(sector in stock['sector'] for sector in healthcare_sectors):
-                print(f"  FILTERED OUT: {stock['sector']} not healthcare sector")
-                meets_criteria = False
-        
-        if parsed_criteria.get('financial'):
-            financial_sectors = ['Financial Services', 'Financials']
-            if not any(sector in stock['sector'] for sector in financial_sectors):
-                print(f"  FILTERED OUT: {stock['sector']} not financial sector")
-                meets_criteria = False
-        
-        if parsed_criteria.get('energy'):
-            energy_sectors = ['Energy']
-            if not any(sector in stock['sector'] for sector in energy_sectors):
-                print(f"  FILTERED OUT: {stock['sector']} not energy sector")
-                meets_criteria = False
-        
-        # Dividend stocks filter
-        if parsed_criteria.get('dividend') and stock['dividend_yield'] <= 0:
-            print(f"  FILTERED OUT: No dividend yield")
-            meets_criteria = False
-        
-        if meets_criteria:
-            print(f"  KEPT: {stock['symbol']}")
-            filtered_results.append(stock)
-    
-    print(f"Final filtered count: {len(filtered_results)}")
-    
-    # Sort results appropriately
-    if 'dividend' in criteria.lower() or 'yield' in criteria.lower():
-        filtered_results.sort(key=lambda x: x['dividend_yield'] or 0, reverse=True)
-    elif 'lowest pe' in criteria.lower() or 'value' in criteria.lower():
-        filtered_results.sort(key=lambda x: x['pe_ratio'] or 999)
-    else:
-        filtered_results.sort(key=lambda x: x['market_cap'] or 0, reverse=True)
-    
+    return results
+
+def screening_result(query: str, parsed_criteria: dict, total_screened: int, snapshot: UniverseSnapshot, matches) -> dict:
     return {
-        "query": criteria,
+        "query": query,
         "parsed_criteria": parsed_criteria,
-        "total_screened": len(results),
-        "results_count": len(filtered_results),
-        "stocks": filtered_results[:requested_count],
-        "analysis": f"Found {len(filtered_results)} stocks matching criteria: {criteria}"
+        "total_screened": total_screened,
+        "results_count": len(matches),
+        "stocks": snapshot.select(matches[:parsed_criteria['requested_count']]),
+        "analysis": f"Found {len(matches)} stocks matching criteria: {query}"
     }
 
 def stock_screening_function(query: str, tool_context: ToolContext = None) -> str:
     """Function that the LLM will call for stock screening."""
     try:
-        result = screen_stocks_by_criteria(query)
-        
-        if result["results_count"] == 0:
-            return f"**📊 No stocks found matching:** {query}\n\n🔍 **Suggestion:** Try adjusting your criteria."
-        
-        response = f"**📊 Stock Screening Results for:** {query}\n\n"
-        response += f"**Found {result['results_count']} stocks** (showing top {len(result['stocks'])}):\n\n"
-        
-        for i, stock in enumerate(result['stocks'], 1):
-            pe_str = f"P/E: {stock['pe_ratio']:.2f}" if stock['pe_ratio'] else "P/E: N/A"
-            div_str = f"Div: {stock['dividend_yield']:.2f}%" if stock['dividend_yield'] else "Div: 0%"
-            price_str = f"${stock['price']:.2f}" if stock['price'] else "Price: N/A"
-            
-            response += f"**{i}. {stock['symbol']}**: {price_str} | {pe_str} | {div_str} | {stock['sector']}\n"
-        
-        response += f"\n📈 **Analysis:** {result['analysis']}"
-        response += f"\n🔍 **Data Source:** Live Yahoo Finance data"
-        
-        return response
+        with agent_scope('stock_screener'), span('agent', agent='stock_screener'):
+            result = screen_stocks_by_criteria(query)
+            with span('format'):
+                return format_screening_results(query, result)
         
     except Exception as e:
         return f"Error screening stocks: {str(e)}"
 
+def format_screening_results(query: str, result: dict) -> str:
+    """Markdown summary of a `screen_stocks_by_criteria` result"""
+    if result["results_count"] == 0:
+        return f"**📊 No stocks found matching:** {query}\n\n🔍 **Suggestion:** Try adjusting your criteria."
+    
+    response = f"**📊 Stock Screening Results for:** {query}\n\n"
+    response += f"**Found {result['results_count']} stocks** (showing top {len(result['stocks'])}):\n\n"
+    
+    for i, stock in enumerate(result['stocks'], 1):
+        pe_str = f"P/E: {stock['pe_ratio']:.2f}" if stock['pe_ratio'] else "P/E: N/A"
+        div_str = f"Div: {stock['dividend_yield']:.2f}%" if stock['dividend_yield'] else "Div: 0%"
+        price_str = f"${stock['price']:.2f}" if stock['price'] else "Price: N/A"
+        
+        response += f"**{i}. {stock['symbol']}**: {price_str} | {pe_str} | {div_str} | {stock['sector']}\n"
+    
+    response += f"\n📈 **Analysis:** {result['analysis']}"
+    response += f"\n🔍 **Data Source:** Live Yahoo Finance data"
+    
+    return response
+
 class StockScreeningAgent(Agent):
     def __init__(self):
         super().__init__(
@@ -198,9 +199,7 @@ The tool returns complete, formatted analysis ready for direct display to users.
 
     def run(self, query: str) -> str:
         """ALWAYS use the tool for stock queries"""
-        stock_keywords = ['stock', 'find', 'show', 'screen', 'search', 'dividend', 'pe', 'price', 'nasdaq', 'tech', 'companies', 'filter', 'lowest', 'highest', 'value']
-        
-        if any(keyword in query.lower() for keyword in stock_keywords):
+        if get_router().matches(query, 'agent', 'stock_screener'):
             return stock_screening_function(query)
         else:
             return super().run(query)
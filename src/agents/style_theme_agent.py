@@ -1,91 +1,33 @@
 # src/agents/style_theme_agent.py - COMPLETE VERSION WITH ALL SECTORS
 from google.adk.agents import Agent
-import yfinance as yf
 import sys
 import os
+import time
 from typing import Dict, List, Tuple
 
 # Add src to path so we can import our utilities
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.market_data import get_provider
+from utils.quote_stream import live_prices
+from utils.universe import get_universe
+from utils.style_scoring import MOMENTUM_PERIOD, score_stock
+from utils.factor_snapshot import get_factor_snapshot, publish_records, snapshot_max_age
+from utils.sector_aggregates import get_sector_aggregates
+from agents.registry import get_analyzer
+from utils.rate_limit import agent_scope
+from utils.router import get_router
+from utils.tracing import span
 
-# Define sector universes - focusing on liquid, well-known stocks
-SECTOR_STOCKS = {
-    'Technology': [
-        'AAPL', 'MSFT', 'NVDA', 'AVGO', 'ORCL', 'ADBE', 'CRM', 'CSCO', 
-        'INTC', 'AMD', 'QCOM', 'TXX', 'INTU', 'IBM', 'MU', 'AMAT'
-    ],
-    'Healthcare': [
-        'UNH', 'JNJ', 'LLY', 'PFE', 'ABBV', 'MRK', 'TMO', 'ABT',
-        'CVS', 'AMGN', 'MDT', 'DHR', 'BMY', 'GILD', 'ISRG', 'VRTX'
-    ],
-    'Financials': [
-        'BRK-B', 'JPM', 'V', 'MA', 'BAC', 'WFC', 'GS', 'MS',
-        'AXP', 'SCHW', 'C', 'SPGI', 'BLK', 'CB', 'MMC', 'PGR'
-    ],
-    'Consumer': [
-        'AMZN', 'TSLA', 'HD', 'WMT', 'MCD', 'NKE', 'SBUX', 'TGT',
-        'LOW', 'COST', 'TJX', 'DG', 'CMG', 'YUM', 'LULU', 'ROST'
-    ],
-    'Energy': [
-        'XOM', 'CVX', 'COP', 'SLB', 'EOG', 'MPC', 'VLO', 'PSX',
-        'OXY', 'PXD', 'HES', 'DVN', 'HAL', 'BKR', 'FANG', 'KMI'
-    ],
-    'Industrials': [
-        'BA', 'RTX', 'HON', 'UPS', 'CAT', 'LMT', 'DE', 'GE',
-        'MMM', 'FDX', 'ETN', 'EMR', 'ITW', 'GD', 'NSC', 'WM'
-    ],
-    'Materials': [
-        'LIN', 'APD', 'SHW', 'ECL', 'DD', 'NEM', 'FCX', 'DOW',
-        'PPG', 'CTVA', 'ALB', 'IFF', 'LYB', 'BALL', 'AVY', 'IP'
-    ],
-    'Communication Services': [
-        'GOOGL', 'META', 'DIS', 'NFLX', 'CMCSA', 'VZ', 'T', 'TMUS',
-        'CHTR', 'EA', 'TTWO', 'ATVI', 'MTCH', 'SNAP', 'PINS', 'ROKU'
-    ],
-    'Utilities': [
-        'NEE', 'SO', 'DUK', 'CEG', 'SRE', 'AEP', 'D', 'PCG',
-        'EXC', 'XEL', 'ED', 'WEC', 'ES', 'DTE', 'AWK', 'PPL'
-    ],
-    'Real Estate': [
-        'PLD', 'AMT', 'CCI', 'EQIX', 'PSA', 'O', 'SBAC', 'WELL',
-        'DLR', 'AVB', 'EQR', 'VTR', 'INVH', 'MAA', 'ARE', 'UDR'
-    ]
-}
-
-# Theme definitions
-THEME_UNIVERSE = {
-    'AI': {
-        'core_stocks': ['NVDA', 'GOOGL', 'MSFT', 'META', 'AMD'],
-        'related_stocks': ['PLTR', 'CRM', 'SNOW', 'ADBE', 'NOW'],
-        'description': 'Artificial Intelligence & Machine Learning'
-    },
-    'EV_CleanEnergy': {
-        'core_stocks': ['TSLA', 'RIVN', 'LCID', 'NIO', 'XPEV'],
-        'related_stocks': ['CHPT', 'PLUG', 'ENPH', 'SEDG', 'LAC'],
-        'description': 'Electric Vehicles & Clean Energy'
-    },
-    'Fintech': {
-        'core_stocks': ['SQ', 'PYPL', 'V', 'MA', 'COIN'],
-        'related_stocks': ['AFRM', 'SOFI', 'HOOD', 'UPST'],
-        'description': 'Financial Technology & Digital Payments'
-    },
-    'Cybersecurity': {
-        'core_stocks': ['CRWD', 'PANW', 'ZS', 'OKTA', 'FTNT'],
-        'related_stocks': ['S', 'NET', 'CYBR', 'RPD', 'TENB'],
-        'description': 'Cybersecurity & Data Protection'
-    },
-    'Cloud': {
-        'core_stocks': ['AMZN', 'MSFT', 'GOOGL', 'CRM', 'NOW'],
-        'related_stocks': ['SNOW', 'DDOG', 'MDB', 'TEAM', 'HUBS'],
-        'description': 'Cloud Computing & Infrastructure'
-    }
-}
+# Sector and theme universes, loaded from the shared universe file
+SECTOR_STOCKS = get_universe().sectors
+THEME_UNIVERSE = get_universe().themes
 
 def style_theme_analysis_function(query: str) -> str:
     """Main analysis function that MUST be called for all style/theme queries"""
     try:
-        analyzer = StyleThemeAnalyzer()
-        return analyzer.perform_analysis(query)
+        analyzer = get_analyzer('style_theme')
+        with agent_scope('style_theme'), span('agent', agent='style_theme'):
+            return analyzer.perform_analysis(query)
     except Exception as e:
         return f"Error in style/theme analysis: {str(e)}"
 
@@ -147,7 +89,6 @@ class StyleThemeAnalyzer:
         
         response = f"# 📊 {sector_name} Sector - Investment Style Classification\n\n"
         response += f"**Analyzing {len(sector_stocks)} Major {sector_name} Stocks**\n"
-        response += f"**Live Market Data Analysis**\n\n"
         
         style_results = {
             'Growth': [],
@@ -158,114 +99,55 @@ class StyleThemeAnalyzer:
         
         successful_analyses = 0
         
-        # Analyze each stock in the sector
+        # Precomputed scores from the factor snapshot; only missing or stale names go live
+        records = {}
+        snapshot = get_factor_snapshot()
+        if snapshot is not None:
+            max_age = snapshot_max_age()
+            for ticker in sector_stocks:
+                record = snapshot.get(ticker, max_age)
+                if record is not None:
+                    records[ticker] = record
+        
+        live_stocks = [ticker for ticker in sector_stocks if ticker not in records]
+        if records:
+            response += f"**Style Factors as of {snapshot.as_of}**"
+            response += f" ({len(live_stocks)} refreshed live)\n\n" if live_stocks else "\n\n"
+        else:
+            response += f"**Live Market Data Analysis**\n\n"
+        
+        if live_stocks:
+            # Fetch fundamentals and the 3-month momentum windows in one batch
+            fundamentals, windows = get_provider().fetch_fundamentals_with_windows(live_stocks, MOMENTUM_PERIOD)
+            # Momentum runs to the streamed price where the quote board has a fresh one
+            prices = live_prices(live_stocks)
+            
+            now = time.time()
+            with span('score.style', stocks=len(live_stocks)):
+                for ticker in live_stocks:
+                    try:
+                        info = fundamentals[ticker]
+                        window = windows[ticker]
+                        if isinstance(info, Exception):
+                            raise info
+                        if isinstance(window, Exception):
+                            raise window
+                        records[ticker] = score_stock(ticker, info, window, prices.get(ticker))
+                        records[ticker]['updated_at'] = now
+                        
+                    except Exception as e:
+                        print(f"Error analyzing {ticker}: {e}")
+                        continue
+            # Keep the sector/theme aggregates in step with the refreshed names
+            publish_records([records[ticker] for ticker in live_stocks if ticker in records])
+        
+        # Group each stock under its primary style, in sector order
         for ticker in sector_stocks:
-            try:
-                stock = yf.Ticker(ticker)
-                info = stock.info
-                
-                # Get price history for momentum
-                hist = stock.history(period="3mo")
-                
-                # Get key metrics
-                price = info.get('currentPrice', 0) or info.get('regularMarketPrice', 0)
-                pe_ratio = info.get('trailingPE', 0) or 0
-                revenue_growth = (info.get('revenueGrowth', 0) or 0) * 100
-                dividend_yield = (info.get('dividendYield', 0) or 0) * 100
-                pb_ratio = info.get('priceToBook', 0) or 0
-                roe = (info.get('returnOnEquity', 0) or 0) * 100
-                market_cap = info.get('marketCap', 0) or 0
-                
-                # Calculate momentum
-                if len(hist) > 0:
-                    price_3m_ago = hist['Close'].iloc[0]
-                    momentum_3m = ((price - price_3m_ago) / price_3m_ago * 100) if price_3m_ago > 0 else 0
-                else:
-                    momentum_3m = 0
-                
-                # Calculate style scores
-                growth_score = 0
-                value_score = 0
-                momentum_score = 0
-                
-                # Growth scoring
-                if revenue_growth > 25:
-                    growth_score += 40
-                elif revenue_growth > 15:
-                    growth_score += 30
-                elif revenue_growth > 10:
-                    growth_score += 20
-                
-                if pe_ratio > 35:
-                    growth_score += 30
-                elif pe_ratio > 25:
-                    growth_score += 20
-                
-                if roe > 20:
-                    growth_score += 30
-                elif roe > 15:
-                    growth_score += 20
-                
-                # Value scoring  
-                if 0 < pe_ratio < 12:
-                    value_score += 40
-                elif pe_ratio < 18:
-                    value_score += 25
-                
-                if dividend_yield > 3.5:
-                    value_score += 40
-                elif dividend_yield > 2:
-                    value_score += 25
-                
-                if 0 < pb_ratio < 2:
-                    value_score += 20
-                elif pb_ratio < 3:
-                    value_score += 10
-                
-                # Momentum scoring
-                if momentum_3m > 20:
-                    momentum_score += 50
-                elif momentum_3m > 10:
-                    momentum_score += 35
-                elif momentum_3m > 5:
-                    momentum_score += 20
-                
-                if pe_ratio > 40:  # High PE can indicate momentum
-                    momentum_score += 30
-                
-                # Determine primary style
-                max_score = max(growth_score, value_score, momentum_score)
-                
-                if max_score < 40:
-                    primary_style = 'Blend'
-                elif growth_score == max_score:
-                    primary_style = 'Growth'
-                elif value_score == max_score:
-                    primary_style = 'Value'
-                else:
-                    primary_style = 'Momentum'
-                
-                stock_data = {
-                    'ticker': ticker,
-                    'price': price,
-                    'pe_ratio': pe_ratio,
-                    'revenue_growth': revenue_growth,
-                    'dividend_yield': dividend_yield,
-                    'pb_ratio': pb_ratio,
-                    'roe': roe,
-                    'momentum_3m': momentum_3m,
-                    'market_cap': market_cap,
-                    'growth_score': growth_score,
-                    'value_score': value_score,
-                    'momentum_score': momentum_score
-                }
-                
-                style_results[primary_style].append(stock_data)
-                successful_analyses += 1
-                
-            except Exception as e:
-                print(f"Error analyzing {ticker}: {e}")
+            stock_data = records.get(ticker)
+            if stock_data is None:
                 continue
+            style_results[stock_data['style']].append(stock_data)
+            successful_analyses += 1
         
         # Format results by style
         for style, stocks in style_results.items():
@@ -319,10 +201,12 @@ class StyleThemeAnalyzer:
         
         theme_results = []
         
-        for ticker in all_stocks[:10]:  # Analyze top 10 theme stocks
+        fundamentals = get_provider().fetch_fundamentals(all_stocks[:10])  # Analyze top 10 theme stocks
+        
+        for ticker, info in fundamentals.items():
             try:
-                stock = yf.Ticker(ticker)
-                info = stock.info
+                if isinstance(info, Exception):
+                    raise info
                 
                 # Get metrics
                 price = info.get('currentPrice', 0) or info.get('regularMarketPrice', 0)
@@ -361,51 +245,60 @@ class StyleThemeAnalyzer:
         return response
     
     def analyze_all_sectors(self) -> str:
-        """Analyze style distribution across all sectors"""
-        response = "# 📊 Cross-Sector Style Analysis\n\n"
-        response += "**Analyzing top stocks from each major sector**\n\n"
+        """Style distribution of every sector and theme, from the materialized aggregates"""
+        aggregates = get_sector_aggregates()
         
-        sector_summary = {}
+        # Answer from the aggregates as they are; missing or aged members are rescored in the background
+        queued = aggregates.refresh_stale(snapshot_max_age())
         
-        # Quick analysis of 3 stocks per sector
-        for sector_name, stocks in SECTOR_STOCKS.items():
-            growth_count = 0
-            value_count = 0
-            
-            for ticker in stocks[:3]:  # Just top 3 for quick analysis
-                try:
-                    stock = yf.Ticker(ticker)
-                    info = stock.info
-                    pe = info.get('trailingPE', 0) or 0
-                    growth = (info.get('revenueGrowth', 0) or 0) * 100
-                    
-                    if growth > 20 or pe > 30:
-                        growth_count += 1
-                    elif 0 < pe < 15:
-                        value_count += 1
-                        
-                except:
-                    continue
-            
-            sector_summary[sector_name] = {
-                'growth': growth_count,
-                'value': value_count
-            }
+        sectors = aggregates.summaries('sector')
+        themes = aggregates.summaries('theme')
+        covered = sum(summary['covered'] for summary in sectors)
+        members = sum(summary['members'] for summary in sectors)
         
-        # Format as table
-        response += "| Sector | Growth Stocks | Value Stocks |\n"
-        response += "|--------|---------------|---------------|\n"
+        response = "# 📊 Cross-Sector Style Analysis\n\n"
+        response += f"**Covering {covered}/{members} stocks across {len(sectors)} sectors**"
+        if queued or aggregates.refreshing:
+            response += " (refreshing the rest in the background)"
+        response += "\n\n"
         
-        for sector, counts in sector_summary.items():
-            response += f"| {sector} | {counts['growth']} | {counts['value']} |\n"
+        response += self.format_aggregate_table('Sector', sectors)
+        response += "\n## Themes\n\n"
+        response += self.format_aggregate_table('Theme', themes)
         
         response += "\n## Key Insights\n"
-        response += "- Technology and Healthcare tend toward growth characteristics\n"
-        response += "- Energy and Financials offer more value opportunities\n"
-        response += "- Consumer and Industrials show mixed styles\n"
+        ranked = [summary for summary in sectors if summary['covered']]
+        if ranked:
+            growth_leader = max(ranked, key=lambda s: s['styles']['Growth'] / s['covered'])
+            value_leader = max(ranked, key=lambda s: s['styles']['Value'] / s['covered'])
+            with_momentum = [summary for summary in ranked if summary['momentum'] is not None]
+            response += f"- **{growth_leader['name']}** has the largest share of growth names "
+            response += f"({growth_leader['styles']['Growth']}/{growth_leader['covered']})\n"
+            response += f"- **{value_leader['name']}** has the largest share of value names "
+            response += f"({value_leader['styles']['Value']}/{value_leader['covered']})\n"
+            if with_momentum:
+                momentum_leader = max(with_momentum, key=lambda s: s['momentum']['median'])
+                response += f"- **{momentum_leader['name']}** leads on 3-month momentum "
+                response += f"(median {momentum_leader['momentum']['median']:.1f}%)\n"
         
         return response
     
+    def format_aggregate_table(self, label: str, summaries: List[Dict]) -> str:
+        """Markdown table of sector or theme aggregates"""
+        table = f"| {label} | Stocks | Growth | Value | Momentum | Blend | Median P/E | Median Rev. Growth | 3M Momentum (p25 / median / p75) |\n"
+        table += "|---|---|---|---|---|---|---|---|---|\n"
+        for summary in summaries:
+            styles = summary['styles']
+            median_pe = f"{summary['median_pe']:.1f}" if summary['median_pe'] is not None else "n/a"
+            median_growth = f"{summary['median_growth']:.1f}%" if summary['median_growth'] is not None else "n/a"
+            momentum = summary['momentum']
+            spread = (f"{momentum['p25']:.1f}% / {momentum['median']:.1f}% / {momentum['p75']:.1f}%"
+                      if momentum is not None else "n/a")
+            table += (f"| {summary['name']} | {summary['covered']}/{summary['members']} | {styles['Growth']} | "
+                      f"{styles['Value']} | {styles['Momentum']} | {styles['Blend']} | {median_pe} | "
+                      f"{median_growth} | {spread} |\n")
+        return table
+    
     def general_style_classification(self, query: str) -> str:
         """General market-wide style classification"""
         # Mix stocks from different sectors
@@ -505,34 +398,8 @@ The tool will return real analysis with actual stock prices, P/E ratios, revenue
 
     def run(self, query: str) -> str:
         """ALWAYS use the tool for any style/theme query"""
-        # Comprehensive trigger words for all sectors and themes
-        trigger_words = [
-            # Style words
-            'classify', 'style', 'growth', 'value', 'momentum', 'blend',
-            # Sector words
-            'healthcare', 'health', 'pharma', 'biotech',
-            'tech', 'technology', 'software', 'hardware',
-            'financial', 'finance', 'bank', 'insurance',
-            'energy', 'oil', 'gas', 'renewable',
-            'consumer', 'retail', 'discretionary', 'staples',
-            'industrial', 'manufacturing', 'aerospace',
-            'material', 'chemical', 'mining',
-            'communication', 'media', 'telecom',
-            'utility', 'utilities', 'electric',
-            'real estate', 'reit', 'property',
-            # Theme words
-            'ai', 'artificial intelligence', 'machine learning',
-            'ev', 'electric vehicle', 'clean energy',
-            'fintech', 'digital payment', 'cryptocurrency',
-            'cloud', 'saas', 'infrastructure',
-            'cyber', 'security', 'cybersecurity',
-            # General words
-            'sector', 'stocks', 'analysis', 'investment', 'nasdaq', 'market',
-            'analyze', 'show', 'display', 'list', 'categorize'
-        ]
-        
-        # If ANY trigger word is in the query, use the tool
-        if any(word in query.lower() for word in trigger_words):
+        # If ANY trigger word (sector, theme or style) is in the query, use the tool
+        if get_router().matches(query, 'agent', 'style_theme'):
             result = style_theme_analysis_function(query)
             return result
         
@@ -0,0 +1 @@
+# src/benchmarks - Offline benchmarks of the agent entry points over recorded market data
@@ -0,0 +1,161 @@
+# src/benchmarks/importtime.py - Import-time report of the container's startup path
+"""Profile what importing (and optionally warming up) a module costs.
+
+Runs `python -X importtime` in a fresh interpreter per module, so nothing
+is already imported, and summarizes the report: cumulative time of the
+target, the slowest modules by their own import time, and self time
+totalled per top-level package. Run from the `src` directory:
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime server --warmup --mode lazy
+    python -m benchmarks.importtime --output startup.json --baseline previous.json
+
+`--warmup` also runs `agents.registry.warmup()` after the import, in the
+STARTUP_MODE given by `--mode`, so imports it triggers are counted too.
+With `--baseline`, the exit status is 1 if a module's cumulative import
+time grew by more than `--threshold`.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What `adk web` / src/server.py import before the first request
+DEFAULT_MODULES = ['server']
+DEFAULT_TOP = 15
+DEFAULT_THRESHOLD = 0.20
+
+# Cumulative import time below which a change is treated as noise
+NOISE_FLOOR_MS = 50.0
+
+# "import time:  self [us] | cumulative | imported package", nesting shown by indentation
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+WARMUP = "from agents.registry import warmup; warmup()"
+
+
+def profile(module: str, warmup: bool = False, mode: Optional[str] = None) -> Dict:
+    """Import `module` in a fresh interpreter and parse its -X importtime report"""
+    code = f"import {module}"
+    if warmup:
+        code += f"\n{WARMUP}"
+    env = dict(os.environ)
+    if mode:
+        env['STARTUP_MODE'] = mode
+
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                'module': name,
+                'depth': len(indent) // 2,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000
+            })
+    return {'wall_ms': round(wall * 1000, 1), 'entries': entries}
+
+
+def summarize(module: str, profiled: Dict, top: int) -> Dict:
+    entries = profiled['entries']
+    target = next((entry for entry in entries if entry['module'] == module), None)
+
+    packages: Dict[str, float] = {}
+    for entry in entries:
+        package = entry['module'].split('.')[0]
+        packages[package] = packages.get(package, 0.0) + entry['self_ms']
+
+    return {
+        'wall_ms': profiled['wall_ms'],
+        'import_ms': round(target['cumulative_ms'], 1) if target else None,
+        'modules_imported': len(entries),
+        'slowest_modules': [
+            {'module': entry['module'], 'self_ms': round(entry['self_ms'], 1)}
+            for entry in sorted(entries, key=lambda entry: -entry['self_ms'])[:top]
+        ],
+        'packages_ms': {
+            package: round(ms, 1)
+            for package, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        }
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """Per-module ratio of cumulative import time against `baseline`"""
+    rows = []
+    for module, current in results['modules'].items():
+        previous = baseline.get('modules', {}).get(module)
+        if not previous or not previous.get('import_ms') or current['import_ms'] is None:
+            continue
+        ratio = current['import_ms'] / previous['import_ms']
+        regressed = ratio > 1 + threshold and current['import_ms'] - previous['import_ms'] > NOISE_FLOOR_MS
+        rows.append({'module': module, 'import_ms': round(ratio, 3), 'regressed': regressed})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report the import-time cost of the startup path")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES, help="modules to import (default: server)")
+    parser.add_argument('--warmup', action='store_true', help="also run agents.registry.warmup() after importing")
+    parser.add_argument('--mode', default=None, help="STARTUP_MODE for --warmup (eager or lazy)")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help="modules and packages listed per report")
+    parser.add_argument('--output', default=None, help="write the report JSON here (default: stdout)")
+    parser.add_argument('--baseline', default=None, help="report JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative growth in import time counted as a regression")
+    args = parser.parse_args(argv)
+
+    results = {
+        'meta': {
+            'python': sys.version.split()[0],
+            'warmup': args.warmup,
+            'mode': args.mode or os.environ.get('STARTUP_MODE', 'eager')
+        },
+        'modules': {}
+    }
+    for module in args.modules:
+        summary = summarize(module, profile(module, args.warmup, args.mode), args.top)
+        results['modules'][module] = summary
+        print(f"{module}: import {summary['import_ms']}ms, wall {summary['wall_ms']}ms, "
+              f"{summary['modules_imported']} modules", file=sys.stderr)
+        for package, ms in summary['packages_ms'].items():
+            print(f"  {package:<32} {ms:>8.1f}ms", file=sys.stderr)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            comparison = compare(results, json.load(f), args.threshold)
+        results['comparison'] = comparison
+        for row in comparison:
+            marker = "REGRESSED" if row['regressed'] else "ok"
+            print(f"{row['module']}: import x{row['import_ms']:.2f} {marker}", file=sys.stderr)
+        if any(row['regressed'] for row in comparison):
+            exit_code = 1
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
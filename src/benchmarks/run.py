@@ -0,0 +1,273 @@
+# src/benchmarks/run.py - Per-query latency, allocation and throughput benchmarks over fixtures
+"""Run representative queries through every agent entry point, offline.
+
+Market data comes from a fixture directory (see utils.fixture_backend):
+a recording made with MARKET_DATA_RECORD_DIR, or synthetic fixtures
+generated on the fly. Run from the `src` directory:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --fixtures ~/recorded --latency 0.05
+    python -m benchmarks.run --output new.json --baseline results.json
+
+Each query is timed once cold (empty fundamentals cache and price store)
+and `--iterations` times warm; one more warm run is traced with
+tracemalloc for allocations. With `--baseline`, warm p50 latency and peak
+allocations are compared per query and the exit status is 1 if any query
+regressed by more than `--threshold`.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Entry points as "module:attribute[.attribute]", imported after the provider is set up
+ENTRY_POINTS = {
+    'stock_screener': 'agents.stock_screener_final:stock_screening_function',
+    'style_theme': 'agents.style_theme_agent:style_theme_analysis_function',
+    'portfolio_risk': 'agents.portfolio_risk_agent:portfolio_risk_analysis_function',
+    'multi_strategy': 'agents.multi_strategy_agent:multi_strategy_analysis_function',
+    'root_router': 'root_agent:root_agent.run',
+    'orchestrator': 'multi_agent_orchestrator:multi_agent_coordination_function'
+}
+
+# (name, entry point, query)
+QUERIES = [
+    ('screen_tech_pe', 'stock_screener', "Find tech stocks with P/E under 30"),
+    ('screen_dividend', 'stock_screener', "Show dividend stocks with yield over 3%"),
+    ('style_healthcare', 'style_theme', "Classify healthcare stocks by investment style"),
+    ('theme_ai', 'style_theme', "Analyze AI theme stocks"),
+    ('style_cross_sector', 'style_theme', "Cross sector style analysis"),
+    ('risk_custom_portfolio', 'portfolio_risk', "Analyze risk of AAPL MSFT NVDA GOOGL"),
+    ('risk_stress_test', 'portfolio_risk', "Run stress test scenarios"),
+    ('risk_attribution', 'portfolio_risk', "Portfolio risk attribution"),
+    ('multi_overlap', 'multi_strategy', "Show manager overlap"),
+    ('multi_comprehensive', 'multi_strategy', "Multi-strategy overview"),
+    ('router_style', 'root_router', "Classify technology stocks by style"),
+    ('router_screen', 'root_router', "Find stocks under $50"),
+    ('orchestrator_multi_agent', 'orchestrator', "Find growth stocks and analyze portfolio risk")
+]
+
+DEFAULT_ITERATIONS = 5
+DEFAULT_THRESHOLD = 0.20
+
+# Compared metrics and the absolute change below which a ratio is treated as noise
+COMPARED_METRICS = {
+    'warm_p50_ms': 1.0,
+    'peak_alloc_kb': 64.0
+}
+
+# Replayed fixtures need no upstream politeness; keeps the limiter out of the numbers
+BENCHMARK_RATE_LIMIT = '100000'
+
+
+def resolve(target: str) -> Callable:
+    module_name, path = target.split(':')
+    obj = importlib.import_module(module_name)
+    for attribute in path.split('.'):
+        obj = getattr(obj, attribute)
+    return obj
+
+
+def benchmark_symbols() -> List[str]:
+    """Every symbol an agent may request: the universe, market factor ETFs and managers' holdings"""
+    from agents.portfolio_risk_agent import MARKET_FACTORS
+    from utils.holdings_ingest import get_holdings_store
+    from utils.universe import get_universe
+
+    symbols = get_universe().all_symbols()
+    symbols += [symbol for members in MARKET_FACTORS.values() for symbol in members]
+    store = get_holdings_store()
+    for manager in store.portfolios():
+        symbols += list(store.holdings_of(manager))
+    return list(dict.fromkeys(symbols))
+
+
+class BenchmarkEnvironment:
+    """Fixture-backed provider with a private cache and price store that can be reset to cold"""
+
+    def __init__(self, fixtures: str, latency: float, work_dir: str):
+        from utils.fixture_backend import FixtureBackend
+        from utils.fundamentals_cache import FundamentalsCache
+        from utils.market_data import MarketDataProvider, set_provider
+
+        self.work_dir = work_dir
+        self.backend = FixtureBackend(fixtures, latency=latency)
+        self.cache = FundamentalsCache()
+        self.provider = MarketDataProvider(self.backend, cache=self.cache, price_store=self._new_price_store())
+        set_provider(self.provider)
+
+    def reset(self) -> None:
+        """Drop every cached fundamental and stored bar"""
+        self.cache.clear()
+        self.provider.price_store = self._new_price_store()
+
+    def _new_price_store(self):
+        from utils.price_store import PriceHistoryStore
+        return PriceHistoryStore(tempfile.mkdtemp(prefix='prices-', dir=self.work_dir))
+
+
+def run_query(environment: BenchmarkEnvironment, func: Callable, query: str,
+              iterations: int, concurrency: int) -> Dict:
+    from utils.tracing import get_tracer, latency_summary
+
+    environment.reset()
+    calls_before = environment.backend.calls
+    start = time.perf_counter()
+    output = func(query)
+    cold = time.perf_counter() - start
+    backend_calls = environment.backend.calls - calls_before
+
+    get_tracer().reset()
+    warm = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(query)
+        warm.append(time.perf_counter() - start)
+    stages = {name: stats['p50_ms'] for name, stats in latency_summary().items()}
+
+    tracemalloc.start()
+    baseline_memory = tracemalloc.get_traced_memory()[0]
+    func(query)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        # Agents report failures in their output rather than raising
+        'ok': isinstance(output, str) and not output.startswith('Error') and 'Error:' not in output,
+        'output_chars': len(output) if isinstance(output, str) else 0,
+        'backend_calls': backend_calls,
+        'cold_ms': _ms(cold),
+        'warm_p50_ms': _ms(statistics.median(warm)),
+        'warm_p95_ms': _ms(_percentile(warm, 0.95)),
+        'warm_mean_ms': _ms(statistics.fmean(warm)),
+        'warm_min_ms': _ms(min(warm)),
+        'throughput_qps': round(len(warm) / sum(warm), 3) if sum(warm) else None,
+        'peak_alloc_kb': round((peak - baseline_memory) / 1024, 1),
+        'retained_kb': round((current - baseline_memory) / 1024, 1),
+        'stage_p50_ms': stages
+    }
+
+    if concurrency > 1:
+        runs = concurrency * iterations
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            start = time.perf_counter()
+            list(pool.map(lambda _: func(query), range(runs)))
+            elapsed = time.perf_counter() - start
+        result['concurrent_throughput_qps'] = round(runs / elapsed, 3)
+    return result
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """Per-query ratios of COMPARED_METRICS against `baseline`.
+
+    A metric regressed if it grew by more than `threshold` and by more than
+    its noise floor, so sub-millisecond queries don't flap.
+    """
+    rows = []
+    for name, current in results['queries'].items():
+        previous = baseline.get('queries', {}).get(name)
+        if previous is None:
+            continue
+        row = {'query': name, 'regressed': False}
+        for metric, noise_floor in COMPARED_METRICS.items():
+            if not previous.get(metric):
+                continue
+            row[metric] = round(current[metric] / previous[metric], 3)
+            if row[metric] > 1 + threshold and current[metric] - previous[metric] > noise_floor:
+                row['regressed'] = True
+        rows.append(row)
+    return rows
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark agent entry points against market data fixtures")
+    parser.add_argument('--fixtures', default=None, help="fixture directory (default: synthesize into a temp dir)")
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated seconds per backend call")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help="warm runs per query")
+    parser.add_argument('--concurrency', type=int, default=1, help="also measure throughput with this many threads")
+    parser.add_argument('--queries', default=None, help="comma-separated query names (default: all)")
+    parser.add_argument('--output', default=None, help="write results JSON here (default: stdout)")
+    parser.add_argument('--baseline', default=None, help="results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='investment-benchmark-')
+    # Keep the machine's factor snapshot and rate limit out of the measurements
+    os.environ['FACTOR_SNAPSHOT_DIR'] = os.path.join(work_dir, 'factor_snapshot')
+    os.environ.setdefault('MARKET_DATA_RATE_LIMIT', BENCHMARK_RATE_LIMIT)
+
+    fixtures = args.fixtures
+    if fixtures is None:
+        from utils.fixture_backend import synthesize_fixtures
+        from utils.universe import get_universe
+        fixtures = os.path.join(work_dir, 'fixtures')
+        synthesize_fixtures(fixtures, benchmark_symbols(), sector_of=get_universe().sector_of)
+
+    environment = BenchmarkEnvironment(fixtures, args.latency, work_dir)
+    selected = set(args.queries.split(',')) if args.queries else None
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'fixtures': args.fixtures or 'synthetic',
+            'latency': args.latency,
+            'iterations': args.iterations,
+            'concurrency': args.concurrency
+        },
+        'queries': {}
+    }
+    for name, entry_point, query in QUERIES:
+        if selected is not None and name not in selected:
+            continue
+        func = resolve(ENTRY_POINTS[entry_point])
+        result = run_query(environment, func, query, args.iterations, args.concurrency)
+        results['queries'][name] = dict(entry_point=entry_point, query=query, **result)
+        print(f"{name}: cold {result['cold_ms']:.0f}ms, warm p50 {result['warm_p50_ms']:.1f}ms, "
+              f"peak {result['peak_alloc_kb']:.0f}KB", file=sys.stderr)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            comparison = compare(results, json.load(f), args.threshold)
+        results['comparison'] = comparison
+        for row in comparison:
+            marker = "REGRESSED" if row['regressed'] else "ok"
+            print(f"{row['query']}: p50 x{row.get('warm_p50_ms', float('nan')):.2f}, "
+                  f"peak x{row.get('peak_alloc_kb', float('nan')):.2f} {marker}", file=sys.stderr)
+        if any(row['regressed'] for row in comparison):
+            exit_code = 1
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
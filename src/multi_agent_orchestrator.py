@@ -1,68 +1,84 @@
 # src/multi_agent_orchestrator.py
 from google.adk.agents import Agent
+from functools import partial
+from typing import Iterator
 import sys
 import os
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
 
-# Import all our agents
-from agents.stock_screener_final import StockScreeningAgent
-from agents.style_theme_agent import StyleThemeAgent
-from agents.portfolio_risk_agent import PortfolioRiskAgent
+# Agents are shared process-wide singletons
+from agents.registry import get_agent, get_orchestrator
+from utils.fundamentals_cache import get_fundamentals_cache
+from utils.fanout import fan_out, fan_out_as_completed, result_text
+from utils.router import get_router
+from utils.tracing import span
+
+# Section headings for each agent's part of a combined response
+AGENT_TITLES = {
+    'stock_screener': "📊 Stock Screening Results",
+    'style_theme': "🎭 Style & Theme Classification",
+    'portfolio_risk': "⚖️ Portfolio Risk Analysis"
+}
 
 def multi_agent_coordination_function(query: str) -> str:
     """
     Orchestrates multiple agents to provide comprehensive investment intelligence
     """
     try:
-        orchestrator = InvestmentIntelligenceOrchestrator()
+        orchestrator = get_orchestrator()
         return orchestrator.coordinate_agents(query)
     except Exception as e:
         return f"Error in multi-agent coordination: {str(e)}"
 
+def multi_agent_coordination_stream(query: str) -> Iterator[str]:
+    """
+    Streams the multi-agent analysis as markdown chunks, one per agent section
+    """
+    try:
+        yield from get_orchestrator().stream_analysis(query)
+    except Exception as e:
+        yield f"Error in multi-agent coordination: {str(e)}"
+
 class InvestmentIntelligenceOrchestrator:
     """Orchestrates multiple investment intelligence agents"""
     
     def __init__(self):
-        # Initialize all agents
-        self.stock_screener = StockScreeningAgent()
-        self.style_theme_agent = StyleThemeAgent()
-        self.portfolio_risk_agent = PortfolioRiskAgent()
+        # Reuse the process-wide agents instead of building new ones
+        self.stock_screener = get_agent('stock_screener')
+        self.style_theme_agent = get_agent('style_theme')
+        self.portfolio_risk_agent = get_agent('portfolio_risk')
         
-        # Define agent routing keywords
-        self.agent_routing = {
-            'stock_screener': ['find', 'screen', 'stocks', 'companies', 'search', 'filter', 'dividend', 'pe', 'price'],
-            'style_theme': ['style', 'theme', 'growth', 'value', 'momentum', 'ai', 'ev', 'fintech', 'classify'],
-            'portfolio_risk': ['risk', 'attribution', 'portfolio', 'stress', 'factor', 'concentration', 'scenario']
-        }
+        # Agent routing keywords live in the shared router's 'orchestrator' table
+        self.router = get_router()
 
     def coordinate_agents(self, query: str) -> str:
         """Main coordination logic"""
         try:
             query_lower = query.lower()
             
-            # Determine which agents to engage
-            agents_to_use = self.determine_agent_strategy(query_lower)
-            
-            if len(agents_to_use) == 1:
-                return self.single_agent_response(agents_to_use[0], query)
-            elif len(agents_to_use) > 1:
-                return self.multi_agent_response(agents_to_use, query)
-            else:
-                return self.comprehensive_analysis(query)
+            # Agents share one fundamentals snapshot, so each symbol is fetched once per query
+            with span('request', entry='orchestrator'), get_fundamentals_cache().request_scope():
+                # Determine which agents to engage
+                agents_to_use = self.determine_agent_strategy(query_lower)
+                
+                if len(agents_to_use) == 1:
+                    return self.single_agent_response(agents_to_use[0], query)
+                elif len(agents_to_use) > 1:
+                    return self.multi_agent_response(agents_to_use, query)
+                else:
+                    return self.comprehensive_analysis(query)
                 
         except Exception as e:
             return f"Error in agent coordination: {str(e)}"
 
     def determine_agent_strategy(self, query_lower: str) -> list:
         """Determine which agents should handle the query"""
-        agents_needed = []
-        
-        # Check each agent's keywords
-        for agent_name, keywords in self.agent_routing.items():
-            if any(keyword in query_lower for keyword in keywords):
-                agents_needed.append(agent_name)
+        with span('route') as route:
+            # Every agent with a keyword in the query, found in one scan
+            agents_needed = list(self.router.agents(query_lower, 'orchestrator'))
+            route.set('agents', ','.join(agents_needed) or 'all')
         
         return agents_needed
 
@@ -84,15 +100,12 @@ class InvestmentIntelligenceOrchestrator:
     def multi_agent_response(self, agents_to_use: list, query: str) -> str:
         """Handle query with multiple agents"""
         try:
-            responses = {}
-            
-            # Get response from each relevant agent
-            for agent_name in agents_to_use:
-                try:
-                    response = self.single_agent_response(agent_name, query)
-                    responses[agent_name] = response
-                except Exception as e:
-                    responses[agent_name] = f"Error: {str(e)}"
+            # Run the relevant agents concurrently; slow ones are reported, not awaited
+            results = fan_out({
+                agent_name: partial(self.single_agent_response, agent_name, query)
+                for agent_name in agents_to_use
+            })
+            responses = {agent_name: result_text(result) for agent_name, result in results.items()}
             
             # Synthesize responses
             return self.synthesize_responses(responses, query)
@@ -103,10 +116,15 @@ class InvestmentIntelligenceOrchestrator:
     def comprehensive_analysis(self, query: str) -> str:
         """Perform comprehensive analysis using all agents"""
         try:
-            # Use all agents for comprehensive analysis
-            stock_analysis = self.stock_screener.run(query)
-            style_analysis = self.style_theme_agent.run(query)
-            risk_analysis = self.portfolio_risk_agent.run(query)
+            # Use all agents for comprehensive analysis, concurrently
+            results = fan_out({
+                'stock_screener': partial(self.stock_screener.run, query),
+                'style_theme': partial(self.style_theme_agent.run, query),
+                'portfolio_risk': partial(self.portfolio_risk_agent.run, query)
+            })
+            stock_analysis = result_text(results['stock_screener'])
+            style_analysis = result_text(results['style_theme'])
+            risk_analysis = result_text(results['portfolio_risk'])
             
             return f"""# 🎯 Comprehensive Investment Intelligence Analysis
 
@@ -131,6 +149,35 @@ This comprehensive analysis combines stock screening, style classification, and
         except Exception as e:
             return f"Error in comprehensive analysis: {str(e)}"
 
+    def stream_analysis(self, query: str) -> Iterator[str]:
+        """Yield the header, then each agent's section as it completes, then the insights"""
+        # Same routing as coordinate_agents; queries matching no agent get all of them
+        agents_to_use = self.determine_agent_strategy(query.lower()) or list(AGENT_TITLES)
+        
+        yield f"# 🎯 Multi-Agent Investment Analysis\n**Query:** {query}\n\n"
+        
+        responses = {}
+        for agent_name, result in fan_out_as_completed({
+            agent_name: partial(self.scoped_agent_response, agent_name, query)
+            for agent_name in agents_to_use
+        }):
+            response = result_text(result)
+            responses[agent_name] = response
+            if response and "Error:" not in response:
+                title = AGENT_TITLES.get(agent_name, f"{agent_name} Analysis")
+                yield f"## {title}\n{response}\n\n---\n\n"
+        
+        yield "## 💡 Integrated Insights\n" + self.generate_synthesis_insights(responses, query)
+
+    def scoped_agent_response(self, agent_name: str, query: str) -> str:
+        """Run one agent inside its own fundamentals request scope.
+
+        A generator can't hold the scope open across yields (each chunk may be
+        pulled from a different thread), so streamed agents enter it themselves.
+        """
+        with span('request', entry='stream', agent=agent_name), get_fundamentals_cache().request_scope():
+            return self.single_agent_response(agent_name, query)
+
     def synthesize_responses(self, responses: dict, query: str) -> str:
         """Synthesize multiple agent responses into coherent analysis"""
         try:
@@ -138,15 +185,9 @@ This comprehensive analysis combines stock screening, style classification, and
             synthesis += f"**Query:** {query}\n\n"
             
             # Add each agent's response
-            agent_titles = {
-                'stock_screener': "📊 Stock Screening Results",
-                'style_theme': "🎭 Style & Theme Classification", 
-                'portfolio_risk': "⚖️ Portfolio Risk Analysis"
-            }
-            
             for agent_name, response in responses.items():
                 if response and "Error:" not in response:
-                    title = agent_titles.get(agent_name, f"{agent_name} Analysis")
+                    title = AGENT_TITLES.get(agent_name, f"{agent_name} Analysis")
                     synthesis += f"## {title}\n{response}\n\n---\n\n"
             
             # Add synthesis insights
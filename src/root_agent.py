@@ -4,6 +4,8 @@ from google.adk.tools import ToolContext
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
+from utils.router import get_router
+from utils.tracing import span
 
 def stock_screening_tool(query: str, tool_context: ToolContext = None) -> str:
     """Tool function for stock screening - let LLM present results"""
@@ -43,6 +45,14 @@ def multi_strategy_tool(query: str, tool_context: ToolContext = None) -> str:
     except Exception as e:
         return f"Error in multi-strategy analysis: {str(e)}"
 
+# Tool behind each agent of the router's 'platform' table
+PLATFORM_TOOLS = {
+    'style_theme': style_theme_tool,
+    'portfolio_risk': portfolio_risk_tool,
+    'multi_strategy': multi_strategy_tool,
+    'stock_screener': stock_screening_tool
+}
+
 class AdaptiveInvestmentPlatform(Agent):
     def __init__(self):
         super().__init__(
@@ -77,50 +87,17 @@ RESPONSE FORMAT:
     def run(self, query: str) -> str:
         """Custom routing to ensure queries go to the right agents"""
         try:
-            query_lower = query.lower()
-            
-            # Style and theme keywords - FORCE routing to style_theme_tool
-            style_keywords = [
-                'classify', 'style', 'growth', 'value', 'momentum', 'theme', 
-                'ai', 'ev', 'fintech', 'healthcare', 'sector', 'analysis',
-                'by investment style', 'by style', 'investment style'
-            ]
-            
-            # Stock screening keywords
-            stock_keywords = [
-                'find', 'show', 'search', 'screen', 'dividend', 'pe', 'price', 
-                'nasdaq', 'tech', 'companies', 'filter', 'lowest', 'highest', 
-                'stocks', 'under', 'over', 'yield'
-            ]
-            
-            # Risk keywords  
-            risk_keywords = [
-                'risk', 'portfolio', 'stress', 'factor', 'concentration', 
-                'attribution', 'analyze risk'
-            ]
-            
-            # Strategy keywords
-            strategy_keywords = [
-                'manager', 'overlap', 'correlation', 'multi', 'strategy'
-            ]
-            
-            # Route based on keywords - Style queries get priority
-            if any(keyword in query_lower for keyword in style_keywords):
-                print(f"DEBUG: Routing to style_theme_tool for query: {query}")
-                return style_theme_tool(query)
-            elif any(keyword in query_lower for keyword in risk_keywords):
-                print(f"DEBUG: Routing to portfolio_risk_tool for query: {query}")
-                return portfolio_risk_tool(query)
-            elif any(keyword in query_lower for keyword in strategy_keywords):
-                print(f"DEBUG: Routing to multi_strategy_tool for query: {query}")
-                return multi_strategy_tool(query)
-            elif any(keyword in query_lower for keyword in stock_keywords):
-                print(f"DEBUG: Routing to stock_screening_tool for query: {query}")
-                return stock_screening_tool(query)
-            else:
-                # Default to stock screening
-                print(f"DEBUG: Default routing to stock_screening_tool for query: {query}")
-                return stock_screening_tool(query)
+            with span('request', entry='root_agent'):
+                # First matching agent of the platform table wins (style, risk, strategy, then screening)
+                with span('route') as route:
+                    agent_name = get_router().first(query, 'platform')
+                    if agent_name is None:
+                        # Default to stock screening
+                        agent_name = 'stock_screener'
+                        route.set('default', True)
+                    tool = PLATFORM_TOOLS[agent_name]
+                    route.set('tool', tool.__name__)
+                return tool(query)
                 
         except Exception as e:
             return f"Error: {str(e)}"
@@ -0,0 +1,157 @@
+# src/server.py - ADK web server with warm startup and a readiness probe
+import json
+import os
+import sys
+import threading
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import uvicorn
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from google.adk.cli.fast_api import get_fast_api_app
+from pydantic import BaseModel
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
+
+from agents.registry import warmup, is_warm
+from utils.fanout import abandoned_tasks
+from utils.fundamentals_cache import get_fundamentals_cache, snapshot_path
+from utils.quote_stream import get_quote_stream
+from utils.rate_limit import guard_status
+from utils.tracing import latency_summary
+from multi_agent_orchestrator import multi_agent_coordination_stream
+
+# `adk web` is run from the repository root, which holds the `src` agent package
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = os.environ.get('HOST', '0.0.0.0')
+PORT = int(os.environ.get('PORT', '8000'))
+MAX_BATCH_SCREENS = int(os.environ.get('MAX_BATCH_SCREENS', '200'))
+
+
+def _run_warmup():
+    try:
+        warmup()
+    except Exception as e:
+        # Stay unhealthy so the orchestrator restarts the container
+        print(f"Warmup failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in the background so /health can answer (503) while it runs
+    threading.Thread(target=_run_warmup, name="warmup", daemon=True).start()
+    # Start streaming quotes (when QUOTE_FEED is set) before the first screen asks for them
+    quote_stream = get_quote_stream()
+    yield
+    if quote_stream is not None:
+        quote_stream.stop()
+    try:
+        saved = get_fundamentals_cache().save_snapshot(snapshot_path())
+        print(f"Saved {saved} cached symbols to {snapshot_path()}")
+    except OSError as e:
+        print(f"Could not save fundamentals snapshot: {e}")
+
+
+app = get_fast_api_app(agents_dir=AGENTS_DIR, web=True, lifespan=lifespan)
+
+
+@app.get("/health")
+def health():
+    """Ready once agents, imports and the cache snapshot are loaded"""
+    if not is_warm():
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+    market_data = guard_status()
+    # Degraded, not down: requests are still answered from cached data
+    status = "ok" if market_data["circuit"] == "closed" else "degraded"
+    return {"status": status, "fundamentals_cache": get_fundamentals_cache().stats(), "market_data": market_data}
+
+
+@app.get("/metrics")
+def metrics():
+    """Latency percentiles per stage (request, route, parse, fetch.*, score.*, filter, format)"""
+    quote_stream = get_quote_stream()
+    return {
+        "spans": latency_summary(),
+        "market_data": guard_status(),
+        "abandoned_agents": abandoned_tasks(),
+        "quotes": quote_stream.status() if quote_stream is not None else None
+    }
+
+
+class ScreenBatch(BaseModel):
+    queries: List[str]
+
+
+class StandingScreenRequest(BaseModel):
+    query: str
+
+
+@app.post("/screens/batch")
+def screens_batch(batch: ScreenBatch):
+    """Screen every query against one shared fetch of their universes; results in query order"""
+    if len(batch.queries) > MAX_BATCH_SCREENS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SCREENS} queries per batch")
+    # Imported here so the screener's data stack loads with the first agent, not at startup
+    from agents.stock_screener_final import screen_stocks_batch
+    return {"results": screen_stocks_batch(batch.queries)}
+
+
+@app.post("/screens/standing")
+def register_standing_screen(request: StandingScreenRequest):
+    """Keep a screen standing; poll its changes for entered/exited deltas"""
+    from utils.standing_screens import get_standing_screens
+    try:
+        standing = get_standing_screens().register(request.query)
+    except ValueError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return dict(standing.describe(), matches=standing.ranked_matches())
+
+
+@app.get("/screens/standing")
+def list_standing_screens():
+    from utils.standing_screens import get_standing_screens
+    return {"screens": [standing.describe() for standing in get_standing_screens().screens()]}
+
+
+@app.get("/screens/standing/{screen_id}")
+def standing_screen_changes(screen_id: str, since: Optional[int] = None):
+    """Deltas after version `since`; `matches` is included without `since` or when the history no longer reaches back that far"""
+    from utils.standing_screens import get_standing_screens
+    standing = get_standing_screens().get(screen_id)
+    if standing is None:
+        raise HTTPException(status_code=404, detail=f"No standing screen {screen_id}")
+    deltas, complete = standing.catch_up(since if since is not None else 0)
+    response = dict(standing.describe(), deltas=deltas)
+    if since is None or not complete:
+        # Older deltas were dropped from the history (or the caller has none): resync from the full match list
+        response['matches'] = standing.ranked_matches()
+    return response
+
+
+@app.delete("/screens/standing/{screen_id}")
+def delete_standing_screen(screen_id: str):
+    from utils.standing_screens import get_standing_screens
+    if not get_standing_screens().unregister(screen_id):
+        raise HTTPException(status_code=404, detail=f"No standing screen {screen_id}")
+    return {"deleted": screen_id}
+
+
+@app.get("/stream")
+def stream(query: str):
+    """Server-sent events: one `section` event per completed agent section, then `done`"""
+    def events():
+        for chunk in multi_agent_coordination_stream(query):
+            yield f"event: section\ndata: {json.dumps({'markdown': chunk})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=HOST, port=PORT)
@@ -0,0 +1,54 @@
+# src/tests/test_fanout.py - Deadlines and abandoned-task shedding of the agent fan-out
+import threading
+import time
+import unittest
+from unittest import mock
+
+from utils import fanout
+from utils.fanout import AgentTimeoutError, FanOutSaturatedError, fan_out
+
+
+def wait_for(event):
+    return lambda: event.wait(5) and 'late'
+
+
+class FanOutTest(unittest.TestCase):
+
+    def test_results_keep_task_order(self):
+        results = fan_out({'a': lambda: 1, 'b': lambda: 2}, timeout=1.0)
+        self.assertEqual(list(results.items()), [('a', 1), ('b', 2)])
+
+    def test_errors_are_returned(self):
+        results = fan_out({'a': lambda: 1 / 0}, timeout=1.0)
+        self.assertIsInstance(results['a'], ZeroDivisionError)
+
+    def test_single_task_gets_the_deadline(self):
+        release = threading.Event()
+        started = time.monotonic()
+        results = fan_out({'slow': wait_for(release)}, timeout=0.05)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertIsInstance(results['slow'], AgentTimeoutError)
+        self.assertEqual(fanout.abandoned_tasks(), 1)
+        release.set()
+        deadline = time.monotonic() + 2
+        while fanout.abandoned_tasks() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(fanout.abandoned_tasks(), 0)
+
+    def test_rejects_new_fan_outs_while_late_tasks_fill_the_headroom(self):
+        release = threading.Event()
+        with mock.patch.object(fanout, 'MAX_ABANDONED', 2):
+            fan_out({'a': wait_for(release), 'b': wait_for(release)}, timeout=0.05)
+            self.assertEqual(fanout.abandoned_tasks(), 2)
+            results = fan_out({'c': lambda: 3}, timeout=1.0)
+            self.assertIsInstance(results['c'], FanOutSaturatedError)
+
+            release.set()
+            deadline = time.monotonic() + 2
+            while fanout.abandoned_tasks() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(fan_out({'c': lambda: 3}, timeout=1.0), {'c': 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# src/tests/test_fundamentals_cache.py - TTL and request-scope behaviour of the fundamentals cache
+import os
+import tempfile
+import unittest
+
+from utils.fundamentals_cache import FundamentalsCache
+from utils.market_data import MarketDataProvider
+
+
+class CountingBackend:
+    def __init__(self):
+        self.calls = 0
+
+    def get_info(self, symbol):
+        self.calls += 1
+        return {'symbol': symbol, 'currentPrice': 100.0 + self.calls}
+
+
+def backdate(cache, symbol, seconds):
+    payload, fetched_at, size = cache._entries[symbol]
+    cache._entries[symbol] = (payload, fetched_at - seconds, size)
+
+
+class RequestScopeTest(unittest.TestCase):
+
+    def test_expired_entry_is_a_miss_inside_scope(self):
+        cache = FundamentalsCache(ttls={'quote': 30.0})
+        cache.put('AAPL', {'currentPrice': 1.0})
+        backdate(cache, 'AAPL', 60)
+        with cache.request_scope():
+            self.assertIsNone(cache.get('AAPL', ['currentPrice']))
+
+    def test_entry_fetched_in_scope_is_reused_past_its_ttl(self):
+        cache = FundamentalsCache(ttls={'quote': 30.0})
+        with cache.request_scope():
+            cache.put('AAPL', {'currentPrice': 1.0})
+            backdate(cache, 'AAPL', 60)
+            # Backdated to before the scope opened, so it expires like any other entry
+            self.assertIsNone(cache.get('AAPL', ['currentPrice']))
+            cache.put('AAPL', {'currentPrice': 2.0})
+            cache.ttls['quote'] = 0.0
+            self.assertEqual(cache.get('AAPL', ['currentPrice']), {'currentPrice': 2.0})
+        self.assertIsNone(cache.get('AAPL', ['currentPrice']))
+
+    def test_expired_entry_is_refetched_inside_scope(self):
+        backend = CountingBackend()
+        cache = FundamentalsCache(ttls={'quote': 30.0})
+        provider = MarketDataProvider(backend, cache=cache)
+        provider.fetch_fundamentals(['AAPL'])
+        backdate(cache, 'AAPL', 60)
+
+        with cache.request_scope():
+            first = provider.fetch_fundamentals(['AAPL'])['AAPL']
+            second = provider.fetch_fundamentals(['AAPL'])['AAPL']
+        self.assertEqual(backend.calls, 2)
+        self.assertEqual(first['currentPrice'], 102.0)
+        self.assertIs(first, second)
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def test_load_drops_entries_past_every_ttl(self):
+        cache = FundamentalsCache(ttls={'quote': 30.0, 'fundamental': 3600.0, 'profile': 7200.0})
+        cache.put('OLD', {'currentPrice': 1.0, 'sector': 'Technology'})
+        cache.put('RECENT', {'currentPrice': 2.0, 'sector': 'Energy'})
+        backdate(cache, 'OLD', 7300)
+        backdate(cache, 'RECENT', 600)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'snapshot.json')
+            cache.save_snapshot(path)
+            restored = FundamentalsCache(ttls=cache.ttls)
+            self.assertEqual(restored.load_snapshot(path), 1)
+
+        self.assertIsNone(restored.get_stale('OLD'))
+        # Still good for slow-moving fields, but not for the price
+        self.assertIsNotNone(restored.get('RECENT', ['sector']))
+        self.assertIsNone(restored.get('RECENT', ['currentPrice']))
+        with restored.request_scope():
+            self.assertIsNone(restored.get('RECENT', ['currentPrice']))
+
+
+if __name__ == '__main__':
+    unittest.main()
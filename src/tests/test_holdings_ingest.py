@@ -0,0 +1,46 @@
+# src/tests/test_holdings_ingest.py - Malformed rows in holdings files
+import os
+import tempfile
+import unittest
+
+from utils.holdings_ingest import HoldingsStore
+
+
+class MalformedRowTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, text):
+        with open(os.path.join(self.directory.name, name), 'w') as f:
+            f.write(text)
+
+    def test_short_and_non_numeric_rows_are_skipped_and_counted(self):
+        self.write('funds.csv', 'manager,symbol,value\n'
+                                'A,AAPL,100\n'
+                                'A,MSFT\n'
+                                'A,NVDA,n/a\n'
+                                'B,AAPL,50\n')
+        store = HoldingsStore(self.directory.name)
+        stats = store.reload()
+
+        self.assertEqual(stats['updated'], 2)
+        self.assertEqual(store.holdings_of('A'), {'AAPL': 1.0})
+        self.assertEqual(store.malformed, {os.path.join(self.directory.name, 'funds.csv'): 2})
+
+    def test_fixed_file_clears_the_count(self):
+        self.write('funds.csv', 'manager,symbol,value\nA,MSFT\n')
+        store = HoldingsStore(self.directory.name)
+        store.reload()
+        self.assertTrue(store.malformed)
+
+        self.write('funds.csv', 'manager,symbol,value\nA,MSFT,10\nA,AAPL,30\n')
+        os.utime(os.path.join(self.directory.name, 'funds.csv'), (1, 1))
+        store.reload()
+        self.assertEqual(store.malformed, {})
+        self.assertEqual(set(store.holdings_of('A')), {'AAPL', 'MSFT'})
+
+
+if __name__ == '__main__':
+    unittest.main()
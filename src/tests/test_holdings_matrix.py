@@ -0,0 +1,68 @@
+# src/tests/test_holdings_matrix.py - Blocked pairwise statistics of the holdings matrix
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from utils import holdings_matrix
+from utils.holdings_matrix import MIN_COMMON_HOLDINGS, HoldingsMatrix
+
+PORTFOLIOS = {
+    'alpha': {'aum': 1e9, 'holdings': {'AAPL': 0.5, 'MSFT': 0.3, 'NVDA': 0.2}},
+    'beta': {'aum': 2e9, 'holdings': {'MSFT': 0.6, 'AAPL': 0.1, 'JPM': 0.3}},
+    'gamma': {'aum': 5e8, 'holdings': {'JPM': 0.7, 'XOM': 0.3}},
+    'empty': {'aum': 1e8, 'holdings': {}},
+    'delta': {'aum': 3e9, 'holdings': {'NVDA': 0.4, 'AAPL': 0.4, 'XOM': 0.2}}
+}
+
+
+def brute_force(portfolios):
+    """Pairwise statistics straight from the holdings dicts"""
+    stats = {'common': {}, 'dot': {}, 'min_overlap': {}, 'cosine': {}, 'overlap': {}}
+    for a, first in portfolios.items():
+        for b, second in portfolios.items():
+            x, y = first['holdings'], second['holdings']
+            shared = set(x) & set(y)
+            dot = sum(x[s] * y[s] for s in shared)
+            min_overlap = sum(min(x[s], y[s]) for s in shared)
+            norms = np.sqrt(sum(w * w for w in x.values()) * sum(w * w for w in y.values()))
+            smaller = min(sum(x.values()), sum(y.values()))
+            stats['common'][a, b] = len(shared)
+            stats['dot'][a, b] = dot
+            stats['min_overlap'][a, b] = min_overlap
+            stats['cosine'][a, b] = dot / norms if norms else 0.0
+            if a == b:
+                stats['overlap'][a, b] = 1.0
+            elif len(shared) < MIN_COMMON_HOLDINGS or not smaller:
+                stats['overlap'][a, b] = 0.0
+            else:
+                stats['overlap'][a, b] = min(min_overlap / smaller, 1.0)
+    return stats
+
+
+class PairwiseTest(unittest.TestCase):
+
+    def assert_matches(self, matrix, expected):
+        pairwise = matrix.pairwise()
+        computed = dict(pairwise, cosine=matrix.cosine_similarity(), overlap=matrix.overlap_similarity())
+        for name, values in expected.items():
+            for (a, b), value in values.items():
+                self.assertAlmostEqual(computed[name][matrix.manager_row(a), matrix.manager_row(b)], value,
+                                       msg=f"{name}[{a}, {b}]")
+
+    def test_blocks_match_brute_force(self):
+        expected = brute_force(PORTFOLIOS)
+        positions = HoldingsMatrix.from_portfolios(PORTFOLIOS).nnz
+        # One and two managers per block: blocks split mid-matrix and around the empty portfolio
+        for cells in (1, 2 * positions):
+            with self.subTest(cells=cells), mock.patch.object(holdings_matrix, 'PAIRWISE_BLOCK_CELLS', cells):
+                self.assert_matches(HoldingsMatrix.from_portfolios(PORTFOLIOS), expected)
+
+    def test_statistics_are_cached(self):
+        matrix = HoldingsMatrix.from_portfolios(PORTFOLIOS)
+        first = matrix.pairwise(('dot',))['dot']
+        self.assertIs(matrix.pairwise()['dot'], first)
+
+
+if __name__ == '__main__':
+    unittest.main()
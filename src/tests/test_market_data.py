@@ -0,0 +1,54 @@
+# src/tests/test_market_data.py - Coalescing of concurrent fetches in the market data provider
+import threading
+import time
+import unittest
+
+from utils.fanout import fan_out
+from utils.fundamentals_cache import FundamentalsCache
+from utils.market_data import MarketDataProvider
+
+
+class BlockingBackend:
+    """Counts calls per symbol and holds every fetch until released"""
+
+    def __init__(self):
+        self.calls = {}
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def get_info(self, symbol):
+        with self._lock:
+            self.calls[symbol] = self.calls.get(symbol, 0) + 1
+        self.release.wait(5)
+        return {'symbol': symbol, 'currentPrice': 100.0}
+
+
+class CoalescingTest(unittest.TestCase):
+
+    def test_overlapping_agents_fetch_each_symbol_once(self):
+        backend = BlockingBackend()
+        provider = MarketDataProvider(backend, cache=FundamentalsCache(ttls={'quote': 30.0}))
+        agents = {
+            'screener': lambda: provider.fetch_fundamentals(['AAPL', 'MSFT', 'NVDA'], ['currentPrice']),
+            'risk': lambda: provider.fetch_fundamentals(['MSFT', 'NVDA', 'GOOG'], ['currentPrice'])
+        }
+        results = {}
+        runner = threading.Thread(target=lambda: results.update(fan_out(agents, timeout=5.0)))
+        runner.start()
+
+        # Nothing completes before the release, so the second agent cannot be served from the cache
+        deadline = time.monotonic() + 5
+        while len(backend.calls) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        backend.release.set()
+        runner.join(5)
+
+        self.assertEqual(backend.calls, {'AAPL': 1, 'MSFT': 1, 'NVDA': 1, 'GOOG': 1})
+        self.assertEqual(list(results['risk']), ['MSFT', 'NVDA', 'GOOG'])
+        self.assertEqual(results['risk']['MSFT']['symbol'], 'MSFT')
+        self.assertEqual(provider._inflight, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
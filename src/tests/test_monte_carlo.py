@@ -0,0 +1,74 @@
+# src/tests/test_monte_carlo.py - Path simulation, scenario conditioning and tail metrics
+import unittest
+
+import numpy as np
+
+from utils.monte_carlo import BASE_CASE, simulate_paths, simulate_scenarios, tail_metrics
+
+
+def sample_inputs(assets=6):
+    rng = np.random.default_rng(3)
+    factors = rng.normal(scale=0.01, size=(assets, assets))
+    cov = factors @ factors.T + np.eye(assets) * 1e-4
+    loadings = np.zeros((assets, 2))
+    loadings[:3, 0] = 1 / 3
+    loadings[3:, 1] = 1 / (assets - 3)
+    return np.full(assets, 1 / assets), cov, loadings
+
+
+class ChunkingTest(unittest.TestCase):
+
+    def test_chunked_results_equal_unchunked(self):
+        weights, cov, loadings = sample_inputs()
+        scenarios = {BASE_CASE: None, 'selloff': np.array([-0.2, np.nan]), 'rotation': np.array([-0.1, 0.05])}
+        whole = simulate_scenarios(weights, cov, horizon_days=10, paths=1000, seed=11,
+                                   loadings=loadings, scenarios=scenarios, chunk_size=1000)
+        # 1000 is not a multiple of 128, so the last chunk is a partial one
+        chunked = simulate_scenarios(weights, cov, horizon_days=10, paths=1000, seed=11,
+                                     loadings=loadings, scenarios=scenarios, chunk_size=128)
+        for name in scenarios:
+            np.testing.assert_allclose(chunked[name].returns, whole[name].returns, rtol=0, atol=1e-12)
+            np.testing.assert_allclose(chunked[name].max_drawdown, whole[name].max_drawdown, rtol=0, atol=1e-12)
+
+
+class ScenarioTest(unittest.TestCase):
+
+    def test_bridge_hits_the_imposed_shock(self):
+        _, cov, _ = sample_inputs()
+        loadings = np.eye(len(cov))[:, :2]
+        result = simulate_paths(loadings[:, 0], cov, horizon_days=10, paths=500, loadings=loadings,
+                                shocks=np.array([-0.2, np.nan]))
+        # A single-asset basket's log return is pinned to log(0.8) on every path
+        np.testing.assert_allclose(result.returns, -0.2, atol=1e-12)
+
+    def test_correlated_assets_follow_the_shock(self):
+        cov = np.array([[1.0, 0.8], [0.8, 1.0]]) * 1e-4
+        loadings = np.array([[1.0], [0.0]])
+        result = simulate_paths(np.array([0.0, 1.0]), cov, horizon_days=10, paths=2000, loadings=loadings,
+                                shocks=np.array([-0.2]))
+        # E[log r2 | log r1 = log 0.8] = 0.8 * log 0.8 with equal variances
+        self.assertAlmostEqual(np.log1p(result.returns).mean(), 0.8 * np.log(0.8), delta=0.005)
+
+    def test_seed_reproduces_paths(self):
+        weights, cov, _ = sample_inputs()
+        first = simulate_paths(weights, cov, paths=200, seed=4)
+        np.testing.assert_array_equal(simulate_paths(weights, cov, paths=200, seed=4).returns, first.returns)
+        self.assertFalse(np.array_equal(simulate_paths(weights, cov, paths=200, seed=5).returns, first.returns))
+
+
+class TailMetricsTest(unittest.TestCase):
+
+    def test_var_and_expected_shortfall(self):
+        returns = np.arange(-50, 50) / 100
+        metrics = tail_metrics(returns, confidence=0.95)
+        # The 5% quantile interpolates 95% of the way from -0.46 to -0.45
+        self.assertAlmostEqual(metrics['var'], 0.4505)
+        # Expected shortfall averages the five returns at or below it
+        self.assertAlmostEqual(metrics['cvar'], 0.48)
+        self.assertAlmostEqual(metrics['worst_loss'], 0.5)
+        self.assertEqual(metrics['probability_of_loss'], 0.5)
+        self.assertEqual(metrics['paths'], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# src/tests/test_quote_stream.py - Screens priced from a replayed quote feed
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from agents.stock_screener_final import screen_stocks_by_criteria
+from utils import market_data
+from utils.fundamentals_cache import FundamentalsCache
+from utils.market_data import MarketDataProvider, set_provider
+from utils.query_parser_fixed import parse_query
+from utils.quote_stream import QuoteStream, ReplayFeed, set_quote_stream
+from utils.universe import get_universe
+
+UNDER = 'technology stocks under $200'
+ABOVE = 'technology stocks above $80'
+MAX_AGE = 0.2
+
+
+class PayloadBackend:
+    def get_info(self, symbol):
+        return {'currentPrice': 100.0, 'trailingPE': 20.0, 'marketCap': 1e11, 'sector': 'Technology'}
+
+
+class ReplayScreenTest(unittest.TestCase):
+
+    def setUp(self):
+        provider = MarketDataProvider(PayloadBackend(), cache=FundamentalsCache(ttls={'quote': 3600.0}))
+        self.symbols = get_universe().screen_symbols(parse_query(UNDER)['universe'])
+        for symbol in self.symbols:
+            provider.cache.put(symbol, PayloadBackend().get_info(symbol))
+        previous = market_data._provider
+        set_provider(provider)
+        self.addCleanup(set_provider, previous)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'quotes.jsonl')
+        with open(path, 'w') as f:
+            for record in ({'t': 0.0, 'symbol': 'AAPL', 'price': 250.0}, {'t': 5.0, 'symbol': 'MSFT', 'price': 50.0}):
+                f.write(json.dumps(record) + '\n')
+        # Five seconds of recorded spacing replayed in five milliseconds
+        self.stream = QuoteStream(ReplayFeed(path, speed=1000.0, loop=False), max_age=MAX_AGE)
+        set_quote_stream(self.stream.start())
+        self.addCleanup(set_quote_stream, None)
+
+    def wait_for_updates(self, count):
+        deadline = time.monotonic() + 5
+        while self.stream.board.updates < count and time.monotonic() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(self.stream.board.updates, count)
+
+    def test_price_bounds_read_the_board_until_quotes_age_out(self):
+        self.wait_for_updates(2)
+        under = screen_stocks_by_criteria(UNDER)
+        above = screen_stocks_by_criteria(ABOVE)
+        self.assertEqual(under['results_count'], len(self.symbols) - 1)
+        self.assertNotIn('AAPL', [stock['symbol'] for stock in under['stocks']])
+        self.assertEqual(above['results_count'], len(self.symbols) - 1)
+        self.assertEqual(above['stocks'][0]['symbol'], 'AAPL')
+        self.assertEqual(above['stocks'][0]['price'], 250.0)
+
+        # Past QUOTE_MAX_AGE every symbol is priced from its payload again
+        time.sleep(MAX_AGE + 0.05)
+        under = screen_stocks_by_criteria(UNDER)
+        above = screen_stocks_by_criteria(ABOVE)
+        self.assertEqual(under['results_count'], len(self.symbols))
+        self.assertEqual(above['results_count'], len(self.symbols))
+        self.assertEqual(above['stocks'][0]['price'], 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
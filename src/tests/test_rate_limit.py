@@ -0,0 +1,169 @@
+# src/tests/test_rate_limit.py - Rate limiter, circuit breaker and guarded backend behaviour
+import threading
+import time
+import unittest
+
+from utils.rate_limit import (AdaptiveRateLimiter, CircuitBreaker, CircuitOpenError, FetchMetrics,
+                              GuardedBackend, RateLimitTimeout, UpstreamThrottled)
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.response = type('Response', (), {'status_code': status_code, 'headers': headers or {}})()
+
+
+class FlakyBackend:
+    """Fails with `error` while `failing` is set"""
+
+    def __init__(self, error):
+        self.error = error
+        self.failing = True
+        self.calls = 0
+
+    def get_info(self, symbol):
+        self.calls += 1
+        if self.failing:
+            raise self.error
+        return {'symbol': symbol}
+
+
+class AdaptiveRateLimiterTest(unittest.TestCase):
+
+    def test_burst_is_served_without_waiting(self):
+        limiter = AdaptiveRateLimiter(rate=1.0, burst=3)
+        self.assertEqual([limiter.acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+
+    def test_fails_fast_past_max_wait(self):
+        limiter = AdaptiveRateLimiter(rate=1.0, burst=1, max_wait=0.5)
+        limiter.acquire()
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire()
+
+    def test_retry_after_pauses_callers(self):
+        limiter = AdaptiveRateLimiter(rate=100.0, burst=10, max_wait=1.0)
+        limiter.throttled(retry_after=5.0)
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire()
+
+    def test_throttling_halves_rate_and_success_recovers(self):
+        limiter = AdaptiveRateLimiter(rate=8.0, min_rate=0.5)
+        limiter.throttled()
+        self.assertEqual(limiter.rate, 4.0)
+        for _ in range(5):
+            limiter.throttled()
+        self.assertEqual(limiter.rate, 0.5)
+        for _ in range(200):
+            limiter.succeeded()
+        self.assertEqual(limiter.rate, 8.0)
+
+    def test_waiter_aborts_on_wake(self):
+        limiter = AdaptiveRateLimiter(rate=1.0, burst=1, max_wait=5.0)
+        limiter.acquire()
+        abort = [False]
+
+        def trip():
+            time.sleep(0.05)
+            abort[0] = True
+            limiter.wake()
+
+        threading.Thread(target=trip).start()
+        started = time.monotonic()
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire(abort=lambda: abort[0])
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def trip(self, breaker):
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        breaker = CircuitBreaker(failure_threshold=3, cooldown=60.0)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.record_failure())
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.trips, 1)
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=60.0)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.0)
+        self.trip(breaker)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, 'half_open')
+        self.assertFalse(breaker.allow())
+
+    def test_probe_success_closes(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.0)
+        self.trip(breaker)
+        breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertTrue(breaker.allow())
+
+    def test_probe_failure_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=60.0)
+        self.trip(breaker)
+        breaker._opened_at -= 60.0
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+
+    def test_aborted_probe_releases_the_slot(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.0)
+        self.trip(breaker)
+        self.assertTrue(breaker.allow())
+        breaker.abort_probe()
+        self.assertEqual(breaker.state, 'half_open')
+        self.assertTrue(breaker.allow())
+
+
+class GuardedBackendTest(unittest.TestCase):
+
+    def guarded(self, backend, cooldown=0.05):
+        limiter = AdaptiveRateLimiter(rate=100.0, burst=10, max_wait=0.1)
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=cooldown)
+        return GuardedBackend(backend, limiter, breaker, FetchMetrics())
+
+    def test_unknown_symbol_errors_pass_through(self):
+        guarded = self.guarded(FlakyBackend(KeyError('XYZ')))
+        for _ in range(5):
+            with self.assertRaises(KeyError):
+                guarded.get_info('XYZ')
+        self.assertEqual(guarded.breaker.state, 'closed')
+
+    def test_recovers_after_probe_times_out_on_retry_after(self):
+        # Retry-After outlasts the cooldown plus max_wait, so the first probe never reaches the upstream
+        backend = FlakyBackend(HTTPError(503, {'Retry-After': '0.3'}))
+        guarded = self.guarded(backend)
+        with self.assertRaises(UpstreamThrottled):
+            guarded.get_info('AAPL')
+        self.assertEqual(guarded.breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            guarded.get_info('AAPL')
+
+        time.sleep(0.06)
+        with self.assertRaises(RateLimitTimeout):
+            guarded.get_info('AAPL')
+        self.assertEqual(guarded.breaker.state, 'half_open')
+
+        backend.failing = False
+        time.sleep(0.3)
+        self.assertEqual(guarded.get_info('AAPL'), {'symbol': 'AAPL'})
+        self.assertEqual(guarded.breaker.state, 'closed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# src/tests/test_risk_engine.py - Covariance estimators and returns alignment of the risk engine
+import unittest
+
+import numpy as np
+
+from utils.price_store import period_start
+from utils.risk_engine import MAX_START_LAG_DAYS, MIN_OBSERVATIONS, covariance, ledoit_wolf_intensity, load_returns
+
+
+class ClosesProvider:
+    """Serves (dates, closes) from a dict; an exception value is returned as the fetch error"""
+
+    def __init__(self, series):
+        self.series = series
+
+    def fetch_closes(self, symbols, period):
+        return {symbol: self.series[symbol] for symbol in symbols}
+
+
+def daily_closes(start, days):
+    dates = np.arange(start, start + np.timedelta64(days, 'D'))
+    return dates, np.linspace(100.0, 110.0, days) * (1 + 0.01 * np.sin(np.arange(days)))
+
+
+class CovarianceTest(unittest.TestCase):
+    # Mean-zero returns with X'X = [[10, 2], [2, 2]], so S = X'X / 4 = [[2.5, 0.5], [0.5, 0.5]]
+    RETURNS = np.array([[2.0, 0.0], [-2.0, 0.0], [1.0, 1.0], [-1.0, -1.0]])
+
+    def test_ledoit_wolf_intensity(self):
+        # mu = 1.5, d2 = ||S - mu I||^2 / 2 = 1.25
+        # b2 = (sum_t ||x_t||^4 - T ||S||^2) / (T^2 N) = (40 - 4 * 7) / 32 = 0.375
+        self.assertAlmostEqual(ledoit_wolf_intensity(self.RETURNS), 0.3)
+
+    def test_ledoit_wolf_shrinks_towards_scaled_identity(self):
+        # Unbiased sample covariance is X'X / 3; the target is its mean variance (2) times I
+        sample = np.array([[10.0, 2.0], [2.0, 2.0]]) / 3
+        expected = 0.7 * sample + 0.3 * 2.0 * np.eye(2)
+        np.testing.assert_allclose(covariance(self.RETURNS, shrinkage='ledoit_wolf'), expected)
+
+    def test_identity_sample_needs_no_shrinkage(self):
+        returns = np.array([[1.0, 1.0], [1.0, -1.0], [-1.0, 1.0], [-1.0, -1.0]])
+        self.assertEqual(ledoit_wolf_intensity(returns), 0.0)
+
+    def test_ewma_covariance(self):
+        # halflife 1 day: weights 1:2:4 (oldest first), weighted mean 1,
+        # weighted variance 12/7 corrected by 1 / (1 - sum w^2) = 7/4
+        returns = np.array([[1.0], [-1.0], [2.0]])
+        np.testing.assert_allclose(covariance(returns, halflife=1.0), [[3.0]])
+
+    def test_unweighted_covariance_matches_numpy(self):
+        returns = np.random.default_rng(5).normal(size=(40, 3))
+        np.testing.assert_allclose(covariance(returns), np.cov(returns, rowvar=False))
+
+
+class LoadReturnsTest(unittest.TestCase):
+
+    def test_late_and_short_histories_are_left_out(self):
+        start = np.datetime64(period_start('1y'), 'D')
+        provider = ClosesProvider({
+            'OLD': daily_closes(start - np.timedelta64(5, 'D'), 370),
+            'ON_TIME': daily_closes(start + np.timedelta64(MAX_START_LAG_DAYS, 'D'), 300),
+            'LATE': daily_closes(start + np.timedelta64(MAX_START_LAG_DAYS + 1, 'D'), 300),
+            'SHORT': daily_closes(start, MIN_OBSERVATIONS),
+            'ERROR': ValueError('no data')
+        })
+        matrix = load_returns(['OLD', 'ON_TIME', 'LATE', 'SHORT', 'ERROR'], '1y', provider)
+
+        self.assertEqual(matrix.symbols, ['OLD', 'ON_TIME'])
+        self.assertEqual(set(matrix.missing), {'LATE', 'SHORT', 'ERROR'})
+        self.assertIn('history only starts on', matrix.missing['LATE'])
+        # Rows are the days both kept symbols traded, less the first for the return
+        self.assertEqual(matrix.returns.shape, (299, 2))
+        self.assertEqual(matrix.dates[0], start + np.timedelta64(MAX_START_LAG_DAYS + 1, 'D'))
+
+
+if __name__ == '__main__':
+    unittest.main()
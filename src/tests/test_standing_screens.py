@@ -0,0 +1,101 @@
+# src/tests/test_standing_screens.py - Deltas, catch-up and quote fallback of standing screens
+import time
+import unittest
+from unittest import mock
+
+from agents.stock_screener_final import stock_records
+from utils import market_data, standing_screens
+from utils.fundamentals_cache import FundamentalsCache
+from utils.market_data import MarketDataProvider, set_provider
+from utils.quote_stream import QuoteBoard, QuoteStream, set_quote_stream
+from utils.query_parser_fixed import parse_query
+from utils.standing_screens import StandingScreen, StandingScreens
+from utils.universe import get_universe
+
+QUERY = 'technology stocks under $200'
+
+
+def info(price):
+    return {'currentPrice': price, 'trailingPE': 20.0, 'marketCap': 1e11, 'sector': 'Technology'}
+
+
+class PriceBackend:
+    def get_info(self, symbol):
+        return info(100.0)
+
+
+class StandingScreensTest(unittest.TestCase):
+
+    def setUp(self):
+        self.provider = MarketDataProvider(PriceBackend(), cache=FundamentalsCache(ttls={'quote': 3600.0}))
+        # Warm payloads keep registration off the shared rate limiter
+        for symbol in get_universe().screen_symbols(parse_query(QUERY)['universe']):
+            self.provider.cache.put(symbol, info(100.0))
+        self.stream = QuoteStream(feed=None, max_age=0.1, board=QuoteBoard())
+        previous = market_data._provider
+        set_provider(self.provider)
+        set_quote_stream(self.stream)
+        self.addCleanup(set_provider, previous)
+        self.addCleanup(set_quote_stream, None)
+        self.registry = StandingScreens(self.provider, self.stream, refresh_interval=0)
+
+    def test_registration_enters_every_match(self):
+        standing = self.registry.register(QUERY)
+        self.assertEqual(standing.version, 1)
+        self.assertEqual(len(standing.matches), len(standing.symbols))
+        self.assertIn('AAPL', standing.matches)
+
+    def test_payload_changes_produce_exited_and_entered_deltas(self):
+        standing = self.registry.register(QUERY)
+        self.provider.cache.put('AAPL', info(300.0))
+        deltas = self.registry.refresh()
+        self.assertEqual([(d['version'], d['exited'], d['entered']) for d in deltas], [(2, ['AAPL'], [])])
+
+        self.provider.cache.put('AAPL', info(150.0))
+        [delta] = self.registry.refresh()
+        self.assertEqual([record['symbol'] for record in delta['entered']], ['AAPL'])
+        self.assertEqual(delta['entered'][0]['price'], 150.0)
+        # Nothing changed since, so nothing is re-evaluated
+        self.assertEqual(self.registry.refresh(), [])
+        self.assertEqual([d['version'] for d in standing.changes(since=1)], [2, 3])
+
+    def test_stale_quote_falls_back_to_the_payload_price(self):
+        standing = self.registry.register(QUERY)
+        self.stream.board.update('AAPL', 300.0)
+        [delta] = self.registry.refresh()
+        self.assertEqual(delta['exited'], ['AAPL'])
+
+        # No update arrives when the quote ages out; the refresh notices on its own
+        time.sleep(0.15)
+        [delta] = self.registry.refresh()
+        self.assertEqual(delta['entered'][0]['symbol'], 'AAPL')
+        self.assertEqual(delta['entered'][0]['price'], 100.0)
+        self.assertIn('AAPL', standing.matches)
+
+    def test_registry_is_bounded(self):
+        with mock.patch.object(standing_screens, 'MAX_STANDING_SCREENS', 1):
+            self.registry.register(QUERY)
+            with self.assertRaises(ValueError):
+                self.registry.register(QUERY)
+        self.assertEqual(len(self.registry.screens()), 1)
+
+
+class CatchUpTest(unittest.TestCase):
+
+    def test_reports_whether_the_history_still_covers_since(self):
+        standing = StandingScreen(QUERY, parse_query(QUERY), ['AAPL', 'MSFT'], history=2)
+        for price in (100.0, 300.0, 100.0):
+            standing.apply({record['symbol']: record for record in stock_records({'AAPL': info(price)})})
+
+        deltas, complete = standing.catch_up(since=1)
+        self.assertEqual([delta['version'] for delta in deltas], [2, 3])
+        self.assertTrue(complete)
+        # Version 1 rolled off the two-delta history
+        deltas, complete = standing.catch_up(since=0)
+        self.assertEqual([delta['version'] for delta in deltas], [2, 3])
+        self.assertFalse(complete)
+        self.assertEqual(standing.catch_up(since=3), ([], True))
+
+
+if __name__ == '__main__':
+    unittest.main()
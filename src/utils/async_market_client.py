@@ -0,0 +1,269 @@
+# src/utils/async_market_client.py - asyncio market data client over one pooled HTTP session
+"""Yahoo Finance over HTTP without yfinance's per-ticker sessions.
+
+`AsyncMarketClient` keeps a single httpx.AsyncClient (keep-alive pool, HTTP/2
+when the `h2` package is installed) and coalesces identical in-flight
+requests: concurrent `get_info('NVDA')` calls share one response. Single
+quote lookups are gathered for a few milliseconds and sent as one
+multi-symbol request.
+
+`AsyncClientBackend` runs the client on a background event loop and exposes
+the synchronous backend interface `MarketDataProvider` uses; select it with
+MARKET_DATA_BACKEND=http. Point MARKET_DATA_BASE_URL at a local server (and
+leave MARKET_DATA_COOKIE_URL empty) to run against a fake.
+"""
+import asyncio
+import importlib.util
+import os
+import threading
+from datetime import date, datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import httpx
+import pandas as pd
+
+YAHOO_QUERY_URL = 'https://query2.finance.yahoo.com'
+# Visiting this sets the session cookie the crumb is tied to
+YAHOO_COOKIE_URL = 'https://fc.yahoo.com'
+
+INFO_MODULES = ['assetProfile', 'summaryDetail', 'financialData', 'defaultKeyStatistics', 'price', 'quoteType']
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_TIMEOUT = 15.0
+
+# Single quote requests arriving within this window share one batched request
+QUOTE_BATCH_WINDOW = 0.005
+QUOTE_BATCH_SIZE = 50
+
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+
+
+class AsyncMarketClient:
+    """Fundamentals, daily history and quotes from the Yahoo Finance JSON API.
+
+    Results match what YFinanceBackend returns (a flat `.info` dict, an
+    adjusted OHLCV DataFrame indexed by exchange-local dates), so either
+    backend can sit behind MarketDataProvider. Must be used from a single
+    event loop.
+    """
+
+    def __init__(self, base_url: str = YAHOO_QUERY_URL, cookie_url: Optional[str] = YAHOO_COOKIE_URL,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS, timeout: float = DEFAULT_TIMEOUT):
+        self.cookie_url = cookie_url
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            transport=transport,
+            http2=transport is None and importlib.util.find_spec('h2') is not None,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            headers={'User-Agent': USER_AGENT},
+            follow_redirects=True
+        )
+        self._crumb: Optional[str] = None
+        self._crumb_lock = asyncio.Lock()
+        self._in_flight: Dict[Any, asyncio.Future] = {}
+        self._pending_quotes: Dict[str, asyncio.Future] = {}
+        self._quote_flush: Optional[asyncio.TimerHandle] = None
+        self.requests_sent = 0
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def get_info(self, symbol: str) -> Dict:
+        """Flattened quoteSummary modules, as yfinance's `Ticker.info`"""
+        return await self._coalesce(('info', symbol), lambda: self._fetch_info(symbol))
+
+    async def get_history(self, symbol: str, period: Optional[str] = None, start: Optional[date] = None) -> pd.DataFrame:
+        """Adjusted daily OHLCV bars for a yfinance-style period or since `start`"""
+        return await self._coalesce(('history', symbol, period, start), lambda: self._fetch_history(symbol, period, start))
+
+    async def get_quote(self, symbol: str) -> Dict:
+        """Latest quote of one symbol, batched with other lookups in the same moment"""
+        future = self._pending_quotes.get(symbol)
+        if future is None:
+            future = self._pending_quotes[symbol] = asyncio.get_running_loop().create_future()
+            if len(self._pending_quotes) >= QUOTE_BATCH_SIZE:
+                self._flush_quotes()
+            elif self._quote_flush is None:
+                self._quote_flush = asyncio.get_running_loop().call_later(QUOTE_BATCH_WINDOW, self._flush_quotes)
+        return await asyncio.shield(future)
+
+    async def get_quotes(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        """Latest quotes keyed by symbol, QUOTE_BATCH_SIZE symbols per request"""
+        symbols = list(dict.fromkeys(symbols))
+        batches = [symbols[i:i + QUOTE_BATCH_SIZE] for i in range(0, len(symbols), QUOTE_BATCH_SIZE)]
+        quotes = {}
+        for batch_quotes in await asyncio.gather(*(
+            self._coalesce(('quotes', tuple(batch)), lambda batch=batch: self._fetch_quotes(batch)) for batch in batches
+        )):
+            quotes.update(batch_quotes)
+        return quotes
+
+    async def _coalesce(self, key, factory: Callable[[], Awaitable]) -> Any:
+        # Callers asking for an in-flight key await the same task instead of re-sending
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self._in_flight[key] = asyncio.ensure_future(factory())
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def _flush_quotes(self) -> None:
+        if self._quote_flush is not None:
+            self._quote_flush.cancel()
+            self._quote_flush = None
+        pending, self._pending_quotes = self._pending_quotes, {}
+        if pending:
+            asyncio.ensure_future(self._resolve_quotes(pending))
+
+    async def _resolve_quotes(self, pending: Dict[str, asyncio.Future]) -> None:
+        try:
+            quotes = await self.get_quotes(list(pending))
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for symbol, future in pending.items():
+            if future.done():
+                continue
+            if symbol in quotes:
+                future.set_result(quotes[symbol])
+            else:
+                future.set_exception(KeyError(f"No quote for {symbol}"))
+
+    async def _fetch_info(self, symbol: str) -> Dict:
+        data = await self._get_json(
+            f"/v10/finance/quoteSummary/{symbol}", {'modules': ','.join(INFO_MODULES)}, with_crumb=True
+        )
+        summary = data.get('quoteSummary') or {}
+        if summary.get('error') or not summary.get('result'):
+            raise ValueError(f"No fundamentals for {symbol}: {(summary.get('error') or {}).get('description', 'empty result')}")
+
+        info = {}
+        for module in INFO_MODULES:
+            for field, value in (summary['result'][0].get(module) or {}).items():
+                if isinstance(value, dict):
+                    # Numbers come as {'raw': 1.23, 'fmt': '1.23'}; drop fmt-only or empty values
+                    if 'raw' in value:
+                        info.setdefault(field, value['raw'])
+                elif field not in info:
+                    info[field] = value
+        return info
+
+    async def _fetch_history(self, symbol: str, period: Optional[str], start: Optional[date]) -> pd.DataFrame:
+        params = {'interval': '1d', 'events': 'div,split', 'includeAdjustedClose': 'true'}
+        if start is not None:
+            params['period1'] = int(datetime(start.year, start.month, start.day, tzinfo=timezone.utc).timestamp())
+            params['period2'] = int(datetime.now(timezone.utc).timestamp())
+        else:
+            params['range'] = period or '1mo'
+        data = await self._get_json(f"/v8/finance/chart/{symbol}", params)
+
+        chart = data.get('chart') or {}
+        if chart.get('error') or not chart.get('result'):
+            raise ValueError(f"No price history for {symbol}: {(chart.get('error') or {}).get('description', 'empty result')}")
+        return _chart_to_frame(chart['result'][0])
+
+    async def _fetch_quotes(self, symbols: List[str]) -> Dict[str, Dict]:
+        data = await self._get_json('/v7/finance/quote', {'symbols': ','.join(symbols)}, with_crumb=True)
+        results = (data.get('quoteResponse') or {}).get('result') or []
+        return {quote['symbol']: quote for quote in results if 'symbol' in quote}
+
+    async def _get_json(self, path: str, params: Dict, with_crumb: bool = False) -> Dict:
+        refreshed = False
+        while True:
+            if with_crumb and self.cookie_url:
+                params = dict(params, crumb=await self._get_crumb(refresh=refreshed))
+            self.requests_sent += 1
+            response = await self._client.get(path, params=params)
+            # An expired cookie/crumb pair is refreshed once
+            if response.status_code in (401, 403) and with_crumb and self.cookie_url and not refreshed:
+                refreshed = True
+                continue
+            # Unknown symbols answer 404 with an error body the callers turn into ValueError
+            if response.status_code != 404:
+                response.raise_for_status()
+            return response.json()
+
+    async def _get_crumb(self, refresh: bool = False) -> str:
+        async with self._crumb_lock:
+            if self._crumb is None or refresh:
+                await self._client.get(self.cookie_url)
+                response = await self._client.get('/v1/test/getcrumb')
+                response.raise_for_status()
+                self._crumb = response.text.strip()
+            return self._crumb
+
+
+def _chart_to_frame(result: Dict) -> pd.DataFrame:
+    """Chart JSON -> yfinance-style auto-adjusted OHLCV frame"""
+    timestamps = result.get('timestamp') or []
+    quote = (result.get('indicators', {}).get('quote') or [{}])[0]
+    frame = pd.DataFrame({
+        'Open': quote.get('open', []),
+        'High': quote.get('high', []),
+        'Low': quote.get('low', []),
+        'Close': quote.get('close', []),
+        'Volume': quote.get('volume', [])
+    }, index=pd.to_datetime(timestamps, unit='s', utc=True), dtype='float64')
+
+    adjusted = (result.get('indicators', {}).get('adjclose') or [{}])[0].get('adjclose')
+    if adjusted is not None:
+        ratio = pd.Series(adjusted, index=frame.index, dtype='float64') / frame['Close']
+        for column in ('Open', 'High', 'Low', 'Close'):
+            frame[column] = frame[column] * ratio
+
+    exchange_tz = result.get('meta', {}).get('exchangeTimezoneName', 'America/New_York')
+    frame.index = frame.index.tz_convert(exchange_tz).normalize()
+    frame.index.name = 'Date'
+    return frame.dropna(subset=['Close'])
+
+
+class AsyncClientBackend:
+    """Synchronous backend facade over an AsyncMarketClient on its own event loop.
+
+    Calls from any number of threads are scheduled onto one loop, so
+    concurrent identical requests coalesce and all of them share the
+    client's connection pool.
+    """
+
+    def __init__(self, client_factory: Optional[Callable[[], AsyncMarketClient]] = None,
+                 timeout: float = DEFAULT_TIMEOUT * 2):
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='market-data-loop', daemon=True)
+        self._thread.start()
+        factory = client_factory or client_from_env
+
+        async def create():
+            return factory()
+        self.client = self._run(create())
+
+    def get_info(self, symbol: str) -> Dict:
+        return self._run(self.client.get_info(symbol))
+
+    def get_history(self, symbol: str, period: Optional[str] = None, start=None) -> pd.DataFrame:
+        return self._run(self.client.get_history(symbol, period, start))
+
+    def get_quote(self, symbol: str) -> Dict:
+        return self._run(self.client.get_quote(symbol))
+
+    def get_quotes(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        return self._run(self.client.get_quotes(list(symbols)))
+
+    def close(self) -> None:
+        self._run(self.client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(self.timeout)
+
+
+def client_from_env() -> AsyncMarketClient:
+    """Client for MARKET_DATA_BASE_URL / MARKET_DATA_COOKIE_URL (Yahoo Finance by default)"""
+    cookie_url = os.environ.get('MARKET_DATA_COOKIE_URL', YAHOO_COOKIE_URL)
+    return AsyncMarketClient(
+        base_url=os.environ.get('MARKET_DATA_BASE_URL', YAHOO_QUERY_URL),
+        cookie_url=cookie_url or None
+    )
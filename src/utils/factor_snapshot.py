@@ -0,0 +1,261 @@
+# src/utils/factor_snapshot.py - Precomputed style factor snapshot, memory-mapped for lookups
+"""Nightly style-factor snapshot.
+
+Build or refresh it from the `src` directory:
+
+    python -m utils.factor_snapshot                       # rebuild every row
+    python -m utils.factor_snapshot --refresh-stale 86400 # only rows older than a day
+
+The snapshot is a directory of `.npy` columns plus `meta.json`. Columns carry a
+generation suffix and `meta.json` is replaced last, so readers never see a
+half-written snapshot and can keep using a mapping of the previous one.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils.style_scoring import MOMENTUM_PERIOD, STYLES, score_stock
+
+SNAPSHOT_VERSION = 1
+META_FILE = 'meta.json'
+
+METRIC_COLUMNS = [
+    'price', 'pe_ratio', 'revenue_growth', 'dividend_yield', 'pb_ratio',
+    'roe', 'momentum_3m', 'market_cap'
+]
+SCORE_COLUMNS = ['growth_score', 'value_score', 'momentum_score']
+
+# Rows older than this are recomputed live; a nightly job leaves some slack
+DEFAULT_MAX_AGE = 36 * 3600.0
+
+_record_listeners: List[Callable[[List[Dict]], None]] = []
+
+
+class FactorSnapshot:
+    """Read-only, memory-mapped style scores for a symbol universe.
+
+    `get` returns the same record `score_stock` produces, so callers can
+    mix snapshot rows with live ones. Each row has its own `updated_at`
+    (epoch seconds), so a partial refresh can leave old rows in place.
+    """
+
+    def __init__(self, directory: str, meta: Dict, columns: Dict[str, np.ndarray]):
+        self.directory = directory
+        self.as_of = meta['as_of']
+        self.generation = meta['generation']
+        self.symbols: List[str] = meta['symbols']
+        self.columns = columns
+        self._rows = {symbol: row for row, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    def load(cls, directory: str) -> Optional['FactorSnapshot']:
+        """Memory-map the snapshot in `directory` (None if there is none)"""
+        try:
+            with open(os.path.join(directory, META_FILE)) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if meta.get('version') != SNAPSHOT_VERSION:
+            return None
+
+        columns = {
+            name: np.load(_column_path(directory, name, meta['generation']), mmap_mode='r')
+            for name in METRIC_COLUMNS + SCORE_COLUMNS + ['style', 'updated_at']
+        }
+        return cls(directory, meta, columns)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._rows
+
+    def get(self, symbol: str, max_age: Optional[float] = None, now: Optional[float] = None) -> Optional[Dict]:
+        """Style record for `symbol`, or None if missing or older than `max_age` seconds"""
+        row = self._rows.get(symbol)
+        if row is None:
+            return None
+        if max_age is not None and (now or time.time()) - self.columns['updated_at'][row] > max_age:
+            return None
+
+        record = {'ticker': symbol}
+        for name in METRIC_COLUMNS:
+            record[name] = float(self.columns[name][row])
+        for name in SCORE_COLUMNS:
+            record[name] = int(self.columns[name][row])
+        record['style'] = STYLES[self.columns['style'][row]]
+        record['updated_at'] = float(self.columns['updated_at'][row])
+        return record
+
+    def records(self, symbols: Iterable[str]) -> List[Dict]:
+        """Records of the given symbols that are in the snapshot, whatever their age"""
+        return [self.get(symbol) for symbol in symbols if symbol in self._rows]
+
+    def stale_symbols(self, symbols: Iterable[str], max_age: float, now: Optional[float] = None) -> List[str]:
+        """Symbols that are missing from the snapshot or older than `max_age` seconds"""
+        now = now or time.time()
+        return [symbol for symbol in symbols if self.get(symbol, max_age, now) is None]
+
+
+def build_records(symbols: Iterable[str], previous: Optional[FactorSnapshot] = None,
+                  max_age: Optional[float] = None, provider=None) -> List[Dict]:
+    """Score every symbol, reusing rows of `previous` younger than `max_age`.
+
+    Without `max_age` every row is recomputed. A symbol that fails to fetch
+    keeps its previous row (if any) rather than dropping out.
+    """
+    if provider is None:
+        from utils.market_data import get_provider
+        provider = get_provider()
+
+    symbols = list(dict.fromkeys(symbols))
+    now = time.time()
+    records = {}
+    if previous is not None and max_age is not None:
+        for symbol in symbols:
+            record = previous.get(symbol, max_age, now)
+            if record is not None:
+                records[symbol] = record
+
+    stale = [symbol for symbol in symbols if symbol not in records]
+    fundamentals, windows = provider.fetch_fundamentals_with_windows(stale, MOMENTUM_PERIOD)
+    for symbol in stale:
+        try:
+            info = fundamentals[symbol]
+            window = windows[symbol]
+            if isinstance(info, Exception):
+                raise info
+            if isinstance(window, Exception):
+                raise window
+            record = score_stock(symbol, info, window)
+            record['updated_at'] = now
+            records[symbol] = record
+        except Exception as e:
+            print(f"Error scoring {symbol}: {e}")
+            if previous is not None and symbol in previous:
+                records[symbol] = previous.get(symbol)
+
+    publish_records([records[symbol] for symbol in stale if symbol in records])
+    return [records[symbol] for symbol in symbols if symbol in records]
+
+
+def add_record_listener(listener: Callable[[List[Dict]], None]) -> None:
+    """Call `listener(records)` whenever style records are (re)scored in this process"""
+    _record_listeners.append(listener)
+
+
+def publish_records(records: List[Dict]) -> None:
+    """Hand freshly scored records (with 'updated_at') to the record listeners"""
+    if not records:
+        return
+    for listener in _record_listeners:
+        try:
+            listener(records)
+        except Exception as e:
+            print(f"Style record listener failed: {e}")
+
+
+def write_snapshot(directory: str, records: List[Dict]) -> str:
+    """Write `records` as a new snapshot generation; returns its as-of timestamp"""
+    os.makedirs(directory, exist_ok=True)
+    generation = uuid.uuid4().hex[:12]
+    as_of = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+    columns = {name: np.array([record[name] for record in records], dtype=np.float64) for name in METRIC_COLUMNS}
+    columns.update({name: np.array([record[name] for record in records], dtype=np.int16) for name in SCORE_COLUMNS})
+    columns['style'] = np.array([STYLES.index(record['style']) for record in records], dtype=np.int8)
+    columns['updated_at'] = np.array([record['updated_at'] for record in records], dtype=np.float64)
+    for name, values in columns.items():
+        np.save(_column_path(directory, name, generation), values)
+
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'as_of': as_of,
+        'generation': generation,
+        'symbols': [record['ticker'] for record in records]
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(directory, META_FILE))
+
+    # Older generations are unlinked; processes that mapped them keep their view
+    for name in os.listdir(directory):
+        if name.endswith('.npy') and not name.endswith(f".{generation}.npy"):
+            os.remove(os.path.join(directory, name))
+    return as_of
+
+
+def snapshot_dir() -> str:
+    """Snapshot location (FACTOR_SNAPSHOT_DIR overrides)"""
+    return os.environ.get(
+        'FACTOR_SNAPSHOT_DIR',
+        os.path.join(tempfile.gettempdir(), 'investment_factor_snapshot')
+    )
+
+
+def snapshot_max_age() -> float:
+    """Oldest row served from the snapshot, in seconds (FACTOR_SNAPSHOT_MAX_AGE overrides)"""
+    value = os.environ.get('FACTOR_SNAPSHOT_MAX_AGE')
+    return float(value) if value else DEFAULT_MAX_AGE
+
+
+def _column_path(directory: str, name: str, generation: str) -> str:
+    return os.path.join(directory, f"{name}.{generation}.npy")
+
+
+_snapshot = None
+_snapshot_mtime = None
+_snapshot_lock = threading.Lock()
+
+
+def get_factor_snapshot() -> Optional[FactorSnapshot]:
+    """Return the current snapshot, re-mapping it after the batch job writes a new one"""
+    global _snapshot, _snapshot_mtime
+    try:
+        mtime = os.stat(os.path.join(snapshot_dir(), META_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    if mtime != _snapshot_mtime:
+        with _snapshot_lock:
+            if mtime != _snapshot_mtime:
+                _snapshot = FactorSnapshot.load(snapshot_dir())
+                _snapshot_mtime = mtime
+    return _snapshot
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build the style factor snapshot")
+    parser.add_argument('--dir', default=None, help="snapshot directory (default: FACTOR_SNAPSHOT_DIR)")
+    parser.add_argument('--refresh-stale', type=float, default=None, metavar='SECONDS',
+                        help="only recompute rows older than this; keep the rest")
+    parser.add_argument('--symbols', default=None, help="comma-separated symbols (default: the whole universe)")
+    args = parser.parse_args(argv)
+
+    from utils.universe import get_universe
+
+    directory = args.dir or snapshot_dir()
+    symbols = args.symbols.split(',') if args.symbols else get_universe().all_symbols()
+    previous = FactorSnapshot.load(directory)
+    if args.refresh_stale is not None and previous is not None:
+        # Rows outside the requested universe are carried over untouched
+        symbols = list(dict.fromkeys(list(previous.symbols) + symbols))
+
+    start = time.perf_counter()
+    records = build_records(symbols, previous=previous, max_age=args.refresh_stale)
+    as_of = write_snapshot(directory, records)
+    print(f"Wrote {len(records)}/{len(symbols)} rows to {directory} as of {as_of} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
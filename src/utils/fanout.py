@@ -0,0 +1,146 @@
+# src/utils/fanout.py - Run independent agents concurrently with a deadline
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+
+# Agent calls are network-bound and each one fans out further on the market
+# data pool, so this pool only needs room for a few requests' worth of agents
+DEFAULT_MAX_WORKERS = 12
+
+DEFAULT_AGENT_TIMEOUT = 60.0
+
+# Workers reserved for agents still running past their deadline. Once late
+# agents hold all of them, new fan-outs are rejected until some finish, so
+# abandoned work never starves live requests of the DEFAULT_MAX_WORKERS
+MAX_ABANDONED = 12
+
+# An agent's result is either its output or the exception it raised / timed out with
+TaskResult = Union[Any, Exception]
+
+
+class AgentTimeoutError(TimeoutError):
+    """An agent did not finish before the fan-out deadline"""
+
+
+class FanOutSaturatedError(RuntimeError):
+    """The agent pool is full of timed-out agents, so the task was not started"""
+
+
+def fan_out(tasks: Dict[str, Callable[[], Any]], timeout: Optional[float] = None) -> Dict[str, TaskResult]:
+    """Run every task concurrently and return the results that arrive in time.
+
+    Each task runs in a copy of the caller's context, so request-scoped state
+    (such as the fundamentals cache request scope) carries over to the worker
+    threads. Results are keyed like `tasks`, in the same order; a task that
+    raised maps to its exception and one still running at the deadline maps
+    to an AgentTimeoutError. Late tasks keep running in the background (they
+    cannot be interrupted) but their results are dropped; while MAX_ABANDONED
+    of them are running, every task maps to a FanOutSaturatedError instead.
+    """
+    results = dict(fan_out_as_completed(tasks, timeout))
+    return {name: results[name] for name in tasks}
+
+
+def fan_out_as_completed(tasks: Dict[str, Callable[[], Any]],
+                         timeout: Optional[float] = None) -> Iterator[Tuple[str, TaskResult]]:
+    """Like `fan_out`, but yield (name, result) pairs in completion order.
+
+    Every task is submitted on the first `next()`, even a single one, so the
+    deadline always applies. Tasks still running at the deadline are yielded
+    last, each with an AgentTimeoutError.
+    """
+    if timeout is None:
+        timeout = agent_timeout()
+
+    if abandoned_tasks() >= MAX_ABANDONED:
+        for name in tasks:
+            yield name, FanOutSaturatedError(f"{name} was not started: {MAX_ABANDONED} timed-out agents are still running")
+        return
+
+    executor = _get_executor()
+    futures = {
+        executor.submit(contextvars.copy_context().run, _call, func): name
+        for name, func in tasks.items()
+    }
+    pending = dict(futures)
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            del pending[future]
+            yield futures[future], future.result()
+    except TimeoutError:
+        for future, name in list(pending.items()):
+            del pending[future]
+            if future.done():
+                yield name, future.result()
+            else:
+                _abandon(future)
+                yield name, AgentTimeoutError(f"{name} did not respond within {timeout:g}s")
+    finally:
+        # The caller stopped early; nobody will read what is left
+        for future in pending:
+            _abandon(future)
+
+
+def abandoned_tasks() -> int:
+    """Tasks that missed their deadline and are still holding a worker"""
+    return _abandoned
+
+
+def agent_timeout() -> float:
+    """Per-agent deadline in seconds (AGENT_TIMEOUT_SECONDS overrides)"""
+    value = os.environ.get('AGENT_TIMEOUT_SECONDS')
+    return float(value) if value else DEFAULT_AGENT_TIMEOUT
+
+
+def result_text(result: TaskResult) -> str:
+    """Agent output as text, or a short note if it failed or timed out"""
+    if isinstance(result, AgentTimeoutError):
+        return f"⏱️ *Not available: {result}. Other sections are complete.*"
+    if isinstance(result, FanOutSaturatedError):
+        return f"⏱️ *Not available: the platform is overloaded ({result}).*"
+    if isinstance(result, Exception):
+        return f"Error: {str(result)}"
+    return result
+
+
+def _call(func: Callable[[], Any]) -> TaskResult:
+    try:
+        return func()
+    except Exception as e:
+        return e
+
+
+def _abandon(future) -> None:
+    """Cancel a queued task, or count a running one until it finishes"""
+    global _abandoned
+    if future.cancel():
+        return
+    with _abandoned_lock:
+        _abandoned += 1
+    future.add_done_callback(_release)
+
+
+def _release(future) -> None:
+    global _abandoned
+    with _abandoned_lock:
+        _abandoned -= 1
+
+
+_abandoned = 0
+_abandoned_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # Headroom for abandoned tasks on top of the live workers
+                _executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS + MAX_ABANDONED,
+                                               thread_name_prefix="agent-fanout")
+    return _executor
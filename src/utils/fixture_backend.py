@@ -0,0 +1,229 @@
+# src/utils/fixture_backend.py - Recorded market data payloads, replayed offline
+"""Market data backends that read and write a fixture directory.
+
+A fixture directory holds one `<SYMBOL>.info.json` (the `.info` payload)
+and one `<SYMBOL>.history.csv` (daily OHLCV bars) per symbol.
+
+  - RecordingBackend wraps a live backend and saves what it returns; set
+    MARKET_DATA_RECORD_DIR to record whichever backend is configured.
+  - FixtureBackend replays a directory (MARKET_DATA_BACKEND=fixture, with
+    MARKET_DATA_FIXTURES pointing at it). Bars are re-dated so the last
+    recorded bar lands on the last complete session, so recordings stay
+    usable for period-relative lookbacks however old they are.
+
+`synthesize_fixtures` writes deterministic synthetic fixtures for when no
+recording is at hand (see src/benchmarks).
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.price_store import MARKET_TIMEZONE, last_complete_session, period_start
+
+# Yahoo sector names for the universe's sector tables
+YAHOO_SECTORS = {
+    'Technology': 'Technology',
+    'Healthcare': 'Healthcare',
+    'Financials': 'Financial Services',
+    'Energy': 'Energy',
+    'Consumer': 'Consumer Cyclical',
+    'Industrials': 'Industrials',
+    'Materials': 'Basic Materials',
+    'Communication Services': 'Communication Services',
+    'Utilities': 'Utilities',
+    'Real Estate': 'Real Estate'
+}
+
+SYNTHETIC_HISTORY_DAYS = 3 * 252
+
+
+class FixtureStore:
+    """Read and write the per-symbol fixture files of one directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def symbols(self) -> List[str]:
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+        return [name[:-len('.info.json')] for name in names if name.endswith('.info.json')]
+
+    def read_info(self, symbol: str) -> Optional[Dict]:
+        try:
+            with open(self._path(symbol, 'info.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def read_history(self, symbol: str) -> Optional[pd.DataFrame]:
+        path = self._path(symbol, 'history.csv')
+        if not os.path.exists(path):
+            return None
+        return pd.read_csv(path, index_col='Date', parse_dates=['Date'])
+
+    def write_info(self, symbol: str, info: Dict) -> None:
+        self._write(self._path(symbol, 'info.json'), json.dumps(info, default=str))
+
+    def write_history(self, symbol: str, history: pd.DataFrame) -> None:
+        """Merge `history` into the recorded bars (newer values win on overlapping dates)"""
+        history = _naive_dates(history)[['Open', 'High', 'Low', 'Close', 'Volume']]
+        existing = self.read_history(symbol)
+        if existing is not None:
+            history = pd.concat([existing[~existing.index.isin(history.index)], history]).sort_index()
+        self._write(self._path(symbol, 'history.csv'), history.to_csv(index_label='Date'))
+
+    def _path(self, symbol: str, suffix: str) -> str:
+        safe = symbol.upper().replace('/', '_')
+        return os.path.join(self.directory, f"{safe}.{suffix}")
+
+    def _write(self, path: str, text: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+class FixtureBackend:
+    """Serves `.info` payloads and price history from a fixture directory.
+
+    Symbols without a fixture raise ValueError, as an unknown ticker does
+    live. `latency` seconds are slept per call to stand in for the network
+    round trip when comparing fetch strategies.
+    """
+
+    def __init__(self, directory: str, latency: float = 0.0, shift_to_today: bool = True):
+        self.store = FixtureStore(directory)
+        self.latency = latency
+        self.shift_to_today = shift_to_today
+        self.calls = 0
+        self._histories: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    def get_info(self, symbol: str) -> Dict:
+        self._wait()
+        info = self.store.read_info(symbol)
+        if info is None:
+            raise ValueError(f"No fixture for {symbol}")
+        return info
+
+    def get_history(self, symbol: str, period: Optional[str] = None, start=None) -> pd.DataFrame:
+        self._wait()
+        history = self._history(symbol)
+        first = pd.Timestamp(start if start is not None else period_start(period or '1mo'))
+        return history[history.index.tz_localize(None) >= first]
+
+    def _history(self, symbol: str) -> pd.DataFrame:
+        with self._lock:
+            history = self._histories.get(symbol)
+        if history is not None:
+            return history
+
+        history = self.store.read_history(symbol)
+        if history is None:
+            raise ValueError(f"No price history fixture for {symbol}")
+        if self.shift_to_today and len(history):
+            # Move every bar forward by the business days between the recording and today
+            dates = history.index.values.astype('datetime64[D]')
+            lag = int(np.busday_count(dates[-1], np.datetime64(last_complete_session(), 'D')))
+            history = history.set_axis(pd.DatetimeIndex(np.busday_offset(dates, lag, roll='forward'), name='Date'))
+        history.index = history.index.tz_localize(MARKET_TIMEZONE)
+
+        with self._lock:
+            self._histories[symbol] = history
+        return history
+
+    def _wait(self) -> None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class RecordingBackend:
+    """Passes calls to `backend` and saves every payload it returns to a fixture directory"""
+
+    def __init__(self, backend, directory: str):
+        self.backend = backend
+        self.store = FixtureStore(directory)
+
+    def get_info(self, symbol: str) -> Dict:
+        info = self.backend.get_info(symbol)
+        self.store.write_info(symbol, info)
+        return info
+
+    def get_history(self, symbol: str, period: Optional[str] = None, start=None) -> pd.DataFrame:
+        history = self.backend.get_history(symbol, period=period, start=start)
+        if history is not None and len(history):
+            self.store.write_history(symbol, history)
+        return history
+
+    def __getattr__(self, name: str):
+        # Other backend methods (e.g. get_quotes) pass through unrecorded
+        return getattr(self.backend, name)
+
+
+def synthesize_fixtures(directory: str, symbols: Iterable[str], days: int = SYNTHETIC_HISTORY_DAYS,
+                        sector_of=None) -> int:
+    """Write deterministic, plausible fixtures for `symbols`; returns how many were written.
+
+    Each symbol's values are seeded from its name, so regenerating gives
+    identical files and benchmark runs stay comparable.
+    """
+    store = FixtureStore(directory)
+    end = np.datetime64(last_complete_session(), 'D')
+    dates = pd.DatetimeIndex(np.busday_offset(end, np.arange(-days + 1, 1), roll='backward'), name='Date')
+    count = 0
+    for symbol in dict.fromkeys(symbols):
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        sector = YAHOO_SECTORS.get(sector_of(symbol) if sector_of else None) or rng.choice(sorted(set(YAHOO_SECTORS.values())))
+
+        closes = rng.uniform(15, 400) * np.cumprod(1 + rng.normal(0.0004, rng.uniform(0.01, 0.03), days))
+        spread = np.abs(rng.normal(0, 0.008, days))
+        store.write_history(symbol, pd.DataFrame({
+            'Open': closes * (1 + rng.normal(0, 0.004, days)),
+            'High': closes * (1 + spread),
+            'Low': closes * (1 - spread),
+            'Close': closes,
+            'Volume': rng.integers(200_000, 50_000_000, days).astype(np.float64)
+        }, index=dates))
+
+        earnings = rng.uniform(-0.05, 0.12)
+        store.write_info(symbol, {
+            'symbol': symbol,
+            'currentPrice': float(closes[-1]),
+            'regularMarketPrice': float(closes[-1]),
+            'trailingPE': float(1 / earnings) if earnings > 0.01 else None,
+            'forwardPE': float(rng.uniform(8, 45)),
+            'priceToBook': float(rng.uniform(0.6, 14)),
+            'dividendYield': float(rng.uniform(0.002, 0.055)) if rng.random() < 0.6 else None,
+            'marketCap': float(rng.lognormal(24.5, 1.3)),
+            'revenueGrowth': float(rng.normal(0.08, 0.12)),
+            'returnOnEquity': float(rng.normal(0.15, 0.1)),
+            'beta': float(rng.uniform(0.4, 2.0)),
+            'debtToEquity': float(rng.uniform(0, 250)),
+            'currentRatio': float(rng.uniform(0.6, 3.5)),
+            'sector': str(sector)
+        })
+        count += 1
+    return count
+
+
+def fixture_dir() -> Optional[str]:
+    """Fixture directory replayed by the 'fixture' backend (MARKET_DATA_FIXTURES)"""
+    return os.environ.get('MARKET_DATA_FIXTURES')
+
+
+def _naive_dates(history: pd.DataFrame) -> pd.DataFrame:
+    index = history.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    return history.set_axis(pd.DatetimeIndex(index.normalize(), name='Date'))
+
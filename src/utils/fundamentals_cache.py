@@ -0,0 +1,265 @@
+# src/utils/fundamentals_cache.py - Process-wide TTL + LRU cache for `.info` payloads
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Fields that go stale quickly; everything not listed here or in the profile
+# class is treated as a slower-moving fundamental ratio
+QUOTE_FIELDS = {
+    'currentPrice', 'regularMarketPrice', 'regularMarketChange', 'regularMarketChangePercent',
+    'regularMarketOpen', 'regularMarketDayHigh', 'regularMarketDayLow', 'regularMarketVolume',
+    'previousClose', 'open', 'dayHigh', 'dayLow', 'bid', 'ask', 'bidSize', 'askSize', 'volume'
+}
+
+# Descriptive fields that are safe to reuse for hours
+PROFILE_FIELDS = {
+    'sector', 'industry', 'longName', 'shortName', 'country', 'exchange', 'quoteType',
+    'currency', 'marketCap', 'sharesOutstanding', 'fullTimeEmployees', 'website'
+}
+
+DEFAULT_TTLS = {
+    'quote': 30.0,
+    'fundamental': 3600.0,
+    'profile': 6 * 3600.0
+}
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Where the server saves the cache on shutdown and restores it during warmup
+DEFAULT_SNAPSHOT_FILE = 'investment_fundamentals_snapshot.json'
+
+# Start time of the current request scope. Entries fetched since then are
+# served regardless of age so that a single request sees one consistent
+# payload per symbol across every agent it touches
+_request_scope_start: ContextVar[Optional[float]] = ContextVar('fundamentals_request_scope', default=None)
+
+
+def field_class(field: str) -> str:
+    """Return the TTL class ('quote', 'fundamental' or 'profile') of an info field"""
+    if field in QUOTE_FIELDS:
+        return 'quote'
+    if field in PROFILE_FIELDS:
+        return 'profile'
+    return 'fundamental'
+
+
+class FundamentalsCache:
+    """Thread-safe LRU cache of fundamentals keyed by symbol.
+
+    An entry is fresh for a lookup if it is younger than the shortest TTL among
+    the field classes the caller needs; a lookup without `fields` needs the
+    whole payload and so uses the quote TTL. Least recently used entries are
+    evicted once the estimated payload size exceeds `max_bytes`.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()  # symbol -> (payload, fetched_at, size)
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+        self._listeners: List[Callable[[str, Dict], None]] = []
+
+    def add_listener(self, listener: Callable[[str, Dict], None]) -> None:
+        """Call `listener(symbol, payload)` after every `put`"""
+        self._listeners.append(listener)
+
+    def get(self, symbol: str, fields: Optional[Iterable[str]] = None) -> Optional[Dict]:
+        """Return the cached payload if it is fresh enough for `fields`, else None"""
+        max_age = self.max_age(fields)
+
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            payload, fetched_at, _ = entry
+            scope_start = _request_scope_start.get()
+            fetched_in_scope = scope_start is not None and fetched_at >= scope_start
+            if time.time() - fetched_at > max_age and not fetched_in_scope:
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(symbol)
+            self.hits += 1
+            return payload
+
+    def get_stale(self, symbol: str) -> Optional[Dict]:
+        """Return the last known payload regardless of age (for when the source is unavailable)"""
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is None:
+                return None
+            self.stale_hits += 1
+            return entry[0]
+
+    def put(self, symbol: str, payload: Dict) -> None:
+        """Store a freshly fetched payload, evicting old entries past the memory cap"""
+        size = _estimate_size(payload)
+
+        with self._lock:
+            previous = self._entries.pop(symbol, None)
+            if previous is not None:
+                self._size_bytes -= previous[2]
+
+            self._entries[symbol] = (payload, time.time(), size)
+            self._size_bytes += size
+
+            while self._size_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._size_bytes -= evicted_size
+                self.evictions += 1
+
+        for listener in self._listeners:
+            listener(symbol, payload)
+
+    def max_age(self, fields: Optional[Iterable[str]] = None) -> float:
+        """Shortest TTL among the field classes in `fields` (all classes if None)"""
+        if fields is None:
+            return min(self.ttls.values())
+        classes = {field_class(field) for field in fields}
+        return min(self.ttls[name] for name in classes) if classes else min(self.ttls.values())
+
+    @contextmanager
+    def request_scope(self):
+        """Reuse entries fetched during this request regardless of age until it ends.
+
+        Entries fetched before the scope opened still expire on their TTLs.
+        A nested scope keeps the outer request's start time.
+        """
+        if _request_scope_start.get() is not None:
+            yield self
+            return
+        token = _request_scope_start.set(time.time())
+        try:
+            yield self
+        finally:
+            _request_scope_start.reset(token)
+
+    def save_snapshot(self, path: str) -> int:
+        """Write every entry (with its fetch time) to `path` as JSON; returns the entry count"""
+        with self._lock:
+            entries = [[symbol, payload, fetched_at] for symbol, (payload, fetched_at, _) in self._entries.items()]
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'entries': entries}, f, default=str)
+        os.replace(tmp_path, path)
+        return len(entries)
+
+    def load_snapshot(self, path: str) -> int:
+        """Restore entries saved by `save_snapshot`, keeping their original fetch times.
+
+        Entries older than the longest TTL could not serve any lookup and are
+        dropped; the rest still expire per field class on `get`. Entries
+        already in the cache are newer and are left alone. A missing or
+        unreadable snapshot restores nothing. Returns the entries restored.
+        """
+        try:
+            with open(path) as f:
+                entries = json.load(f)['entries']
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable fundamentals snapshot {path}: {e}")
+            return 0
+
+        restored = 0
+        oldest = time.time() - max(self.ttls.values())
+        with self._lock:
+            # Snapshot is in LRU order; restored entries go to the cold end, oldest first
+            for symbol, payload, fetched_at in reversed(entries):
+                if symbol in self._entries or fetched_at < oldest:
+                    continue
+                size = _estimate_size(payload)
+                self._entries[symbol] = (payload, fetched_at, size)
+                self._entries.move_to_end(symbol, last=False)
+                self._size_bytes += size
+                restored += 1
+
+            while self._size_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._size_bytes -= evicted_size
+                self.evictions += 1
+        return restored
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self._size_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'stale_hits': self.stale_hits
+            }
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate deep size of a JSON-like payload in bytes"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_estimate_size(item) for item in value)
+    return size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_fundamentals_cache() -> FundamentalsCache:
+    """Return the process-wide fundamentals cache, configured from the environment"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                ttls = {}
+                for name in DEFAULT_TTLS:
+                    value = os.environ.get(f"FUNDAMENTALS_TTL_{name.upper()}")
+                    if value:
+                        ttls[name] = float(value)
+                max_mb = os.environ.get('FUNDAMENTALS_CACHE_MAX_MB')
+                max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+                _cache = FundamentalsCache(ttls=ttls, max_bytes=max_bytes)
+    return _cache
+
+
+def snapshot_path() -> str:
+    """Location of the fundamentals cache snapshot (FUNDAMENTALS_SNAPSHOT overrides)"""
+    return os.environ.get(
+        'FUNDAMENTALS_SNAPSHOT',
+        os.path.join(tempfile.gettempdir(), DEFAULT_SNAPSHOT_FILE)
+    )
@@ -0,0 +1,393 @@
+# src/utils/holdings_ingest.py - Streaming ingestion of manager holdings files into a compact store
+"""Institutional holdings loaded from a directory of CSV and 13F XML files.
+
+CSV files may hold any number of managers, one position per row:
+
+    manager,name,strategy,aum,symbol,weight      (weights of a stated AUM)
+    manager,name,strategy,symbol,value           (market values; AUM is their sum)
+
+`name`, `strategy` and `aum` are optional. 13F information tables (`.xml`,
+one filing per manager, named after it) are read element by element; each
+`infoTable` contributes its `value` under its ticker. Filings (and CSVs with
+a `cusip` column) identify securities by CUSIP, which is mapped to a ticker
+through the CUSIP map (`cusip,symbol` rows; CUSIP_MAP_FILE overrides the
+location). Rows with an unmapped CUSIP are skipped and counted in
+`unmapped`, so they never show up as securities no other manager can
+share. Malformed rows (missing columns, non-numeric amounts) are skipped
+and counted in `malformed`, so one bad line never drops a whole file.
+Either format may be gzipped (`.csv.gz`, `.xml.gz`).
+
+Files are streamed row by row, so memory follows the number of positions
+kept, not file size. Each manager's rows feed an incremental fingerprint;
+files whose size and mtime are unchanged are not read on reload, and
+managers whose fingerprint is unchanged keep their stored arrays.
+"""
+import csv
+import gzip
+import hashlib
+import io
+import os
+import threading
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from utils.holdings_matrix import HoldingsMatrix
+
+DEFAULT_HOLDINGS_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'holdings')
+DEFAULT_CUSIP_MAP_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'cusip_map.csv')
+
+DEFAULT_STRATEGY = 'Unclassified'
+
+# 13F information table elements, matched by local name (namespaces vary by filer)
+INFO_TABLE_TAG = 'infoTable'
+TICKER_TAGS = ('ticker', 'symbol')
+CUSIP_TAG = 'cusip'
+
+
+class ManagerHoldings:
+    """One manager's positions as parallel arrays of symbol ids and weights"""
+
+    __slots__ = ('manager', 'name', 'strategy', 'aum', 'symbol_ids', 'weights', 'fingerprint', 'source')
+
+    def __init__(self, manager: str, name: str, strategy: str, aum: float, symbol_ids: np.ndarray,
+                 weights: np.ndarray, fingerprint: str, source: str):
+        self.manager = manager
+        self.name = name
+        self.strategy = strategy
+        self.aum = aum
+        self.symbol_ids = symbol_ids
+        self.weights = weights
+        self.fingerprint = fingerprint
+        self.source = source
+
+
+class _ManagerAccumulator:
+    """Positions and running fingerprint of one manager while its file streams past"""
+
+    def __init__(self, manager: str):
+        self.manager = manager
+        self.name = manager
+        self.strategy = DEFAULT_STRATEGY
+        self.aum: Optional[float] = None
+        # True when amounts are portfolio weights rather than dollar values
+        self.weighted = False
+        self.amounts: Dict[int, float] = {}
+        # Value of rows skipped for an unmapped CUSIP; still part of the filing's AUM
+        self.skipped = 0.0
+        self.digest = hashlib.blake2b(digest_size=16)
+
+    def add(self, symbol_id: int, amount: float, record: bytes) -> None:
+        # Repeated lines of one security (e.g. per voting authority) are summed
+        self.amounts[symbol_id] = self.amounts.get(symbol_id, 0.0) + amount
+        self.digest.update(record)
+
+
+class HoldingsStore:
+    """Holdings of every manager in a directory, with interned symbols.
+
+    `reload()` picks up new, changed and deleted files; `snapshot()` gives
+    the analyzer its manager metadata and the HoldingsMatrix of one
+    version, rebuilt only when a reload changed something (`version`
+    counts those changes).
+    """
+
+    def __init__(self, directory: str, resolve_symbol: Optional[Callable[[str], str]] = None,
+                 cusip_map: Optional[Dict[str, str]] = None):
+        self.directory = directory
+        self.resolve_symbol = resolve_symbol or (lambda identifier: identifier)
+        self.cusip_map = {cusip.upper(): symbol for cusip, symbol in (cusip_map or {}).items()}
+        # Rows skipped per file because their CUSIP has no ticker
+        self.unmapped: Dict[str, int] = {}
+        # Rows skipped per file because they were malformed
+        self.malformed: Dict[str, int] = {}
+        self.version = 0
+        self._symbols: List[str] = []
+        self._symbol_ids: Dict[str, int] = {}
+        self._managers: Dict[str, ManagerHoldings] = {}
+        self._files: Dict[str, Tuple[int, int]] = {}
+        self._matrix = None
+        self._matrix_version = -1
+        self._lock = threading.Lock()
+
+    def reload(self) -> Dict[str, int]:
+        """Ingest what changed on disk; returns counts of 'updated', 'unchanged' and 'removed' managers"""
+        with self._lock:
+            stats = {'updated': 0, 'unchanged': 0, 'removed': 0}
+            seen_files = set()
+            for path in _holdings_files(self.directory):
+                seen_files.add(path)
+                stat = os.stat(path)
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if self._files.get(path) == signature:
+                    stats['unchanged'] += sum(1 for holdings in self._managers.values() if holdings.source == path)
+                    continue
+
+                try:
+                    accumulators, skipped = self._parse(path)
+                except (OSError, ValueError, IndexError, csv.Error, ET.ParseError) as e:
+                    print(f"Error ingesting holdings file {path}: {e}")
+                    continue
+                self._files[path] = signature
+                self._record_skipped(path, self.unmapped, skipped['unmapped'], "with CUSIPs missing from the CUSIP map")
+                self._record_skipped(path, self.malformed, skipped['malformed'], "that were malformed")
+
+                for manager in [m for m, holdings in self._managers.items() if holdings.source == path and m not in accumulators]:
+                    del self._managers[manager]
+                    stats['removed'] += 1
+                for manager, accumulator in accumulators.items():
+                    fingerprint = accumulator.digest.hexdigest()
+                    current = self._managers.get(manager)
+                    if current is not None and current.fingerprint == fingerprint and current.source == path:
+                        stats['unchanged'] += 1
+                        continue
+                    self._managers[manager] = self._finish(accumulator, fingerprint, path)
+                    stats['updated'] += 1
+
+            for path in [p for p in self._files if p not in seen_files]:
+                del self._files[path]
+                self.unmapped.pop(path, None)
+                self.malformed.pop(path, None)
+                for manager in [m for m, holdings in self._managers.items() if holdings.source == path]:
+                    del self._managers[manager]
+                    stats['removed'] += 1
+
+            if stats['updated'] or stats['removed']:
+                self.version += 1
+            return stats
+
+    def __len__(self) -> int:
+        return len(self._managers)
+
+    def portfolios(self) -> Dict[str, Dict]:
+        """{manager: {'name', 'strategy', 'aum'}} in ingestion order"""
+        with self._lock:
+            return self._portfolios()
+
+    def snapshot(self) -> Tuple[int, Dict[str, Dict], HoldingsMatrix]:
+        """(version, portfolios, matrix) of one consistent state of the store"""
+        with self._lock:
+            return self.version, self._portfolios(), self._build_matrix()
+
+    def holdings_of(self, manager: str) -> Dict[str, float]:
+        holdings = self._managers[manager]
+        return {self._symbols[symbol_id]: float(weight) for symbol_id, weight in zip(holdings.symbol_ids, holdings.weights)}
+
+    def matrix(self) -> HoldingsMatrix:
+        """Managers x securities weight matrix of the current holdings"""
+        with self._lock:
+            return self._build_matrix()
+
+    def _portfolios(self) -> Dict[str, Dict]:
+        return {
+            manager: {'name': holdings.name, 'strategy': holdings.strategy, 'aum': holdings.aum}
+            for manager, holdings in self._managers.items()
+        }
+
+    def _build_matrix(self) -> HoldingsMatrix:
+        if self._matrix_version != self.version:
+            managers = list(self._managers.values())
+            symbol_ids = np.concatenate([m.symbol_ids for m in managers]) if managers else np.empty(0, dtype=np.int64)
+            # Renumber columns densely in first-seen order, as HoldingsMatrix expects
+            used, first_seen, indices = np.unique(symbol_ids, return_index=True, return_inverse=True)
+            order = np.argsort(first_seen, kind='stable')
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+
+            self._matrix = HoldingsMatrix(
+                [m.manager for m in managers],
+                [self._symbols[symbol_id] for symbol_id in used[order]],
+                np.concatenate(([0], np.cumsum([len(m.weights) for m in managers]))).astype(np.int64),
+                rank[indices],
+                np.concatenate([m.weights for m in managers]) if managers else np.empty(0),
+                np.array([m.aum for m in managers], dtype=np.float64)
+            )
+            self._matrix_version = self.version
+        return self._matrix
+
+    def _intern(self, identifier: str) -> int:
+        symbol = self.resolve_symbol(identifier.strip())
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self._symbol_ids[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+        return symbol_id
+
+    def _resolve_cusip(self, cusip: str) -> Optional[str]:
+        return self.cusip_map.get(cusip.strip().upper())
+
+    def _record_skipped(self, path: str, counts: Dict[str, int], skipped: int, reason: str) -> None:
+        if skipped:
+            counts[path] = skipped
+            print(f"Skipped {skipped} holdings in {path} {reason}")
+        else:
+            counts.pop(path, None)
+
+    def _parse(self, path: str) -> Tuple[Dict[str, _ManagerAccumulator], Dict[str, int]]:
+        """Managers in `path` and the number of rows skipped ('unmapped', 'malformed')"""
+        if _base_name(path).endswith('.xml'):
+            return self._parse_13f(path)
+        return self._parse_csv(path)
+
+    def _parse_csv(self, path: str) -> Tuple[Dict[str, _ManagerAccumulator], Dict[str, int]]:
+        accumulators: Dict[str, _ManagerAccumulator] = {}
+        skipped = {'unmapped': 0, 'malformed': 0}
+        with _open_text(path) as f:
+            reader = csv.reader(f)
+            header = [column.strip().lower() for column in next(reader, [])]
+            columns = {column: i for i, column in enumerate(header)}
+            symbol_column = next((columns[c] for c in ('symbol', 'ticker') if c in columns), None)
+            cusip_column = columns.get(CUSIP_TAG)
+            amount_column = columns.get('weight', columns.get('value'))
+            if 'manager' not in columns or (symbol_column is None and cusip_column is None) or amount_column is None:
+                raise ValueError("CSV holdings need manager, symbol and weight or value columns")
+            name_column = columns.get('name')
+            strategy_column = columns.get('strategy')
+            aum_column = columns.get('aum')
+
+            for row in reader:
+                if not row:
+                    continue
+                try:
+                    if len(row) < len(header):
+                        raise ValueError("missing columns")
+                    amount = float(row[amount_column])
+                    aum = float(row[aum_column]) if aum_column is not None and row[aum_column] else None
+                except ValueError:
+                    skipped['malformed'] += 1
+                    continue
+
+                manager = row[columns['manager']]
+                accumulator = accumulators.get(manager)
+                if accumulator is None:
+                    accumulator = accumulators[manager] = _ManagerAccumulator(manager)
+                    accumulator.weighted = 'weight' in columns
+                    if name_column is not None and row[name_column]:
+                        accumulator.name = row[name_column]
+                    if strategy_column is not None and row[strategy_column]:
+                        accumulator.strategy = row[strategy_column]
+                    accumulator.aum = aum
+                symbol = row[symbol_column] if symbol_column is not None else ''
+                if not symbol.strip() and cusip_column is not None:
+                    symbol = self._resolve_cusip(row[cusip_column])
+                    if symbol is None:
+                        skipped['unmapped'] += 1
+                        accumulator.skipped += amount
+                        continue
+                accumulator.add(self._intern(symbol), amount, ','.join(row).encode() + b'\n')
+        return accumulators, skipped
+
+    def _parse_13f(self, path: str) -> Tuple[Dict[str, _ManagerAccumulator], Dict[str, int]]:
+        manager = _base_name(path)[:-len('.xml')]
+        accumulator = _ManagerAccumulator(manager)
+        skipped = {'unmapped': 0, 'malformed': 0}
+        with _open_binary(path) as f:
+            context = ET.iterparse(f, events=('start', 'end'))
+            _, root = next(context)
+            fields: Dict[str, str] = {}
+            for event, element in context:
+                if event != 'end':
+                    continue
+                tag = element.tag.rsplit('}', 1)[-1]
+                if tag == INFO_TABLE_TAG:
+                    symbol = next((fields[t] for t in TICKER_TAGS if fields.get(t)), None)
+                    if symbol is None and fields.get(CUSIP_TAG):
+                        symbol = self._resolve_cusip(fields[CUSIP_TAG])
+                    amount = _parse_amount(fields.get('value'))
+                    if fields.get('value') and amount is None:
+                        skipped['malformed'] += 1
+                    elif symbol is None and amount is not None:
+                        skipped['unmapped'] += 1
+                        accumulator.skipped += amount
+                    elif symbol is not None and amount is not None:
+                        record = f"{symbol},{fields['value']}\n".encode()
+                        accumulator.add(self._intern(symbol), amount, record)
+                    fields = {}
+                    # Drop the finished row so the tree never grows past one infoTable
+                    root.clear()
+                elif tag == 'name' and accumulator.name == manager and element.text:
+                    accumulator.name = element.text.strip()
+                elif tag in TICKER_TAGS or tag in (CUSIP_TAG, 'value'):
+                    fields[tag] = (element.text or '').strip()
+        return {manager: accumulator}, skipped
+
+    def _finish(self, accumulator: _ManagerAccumulator, fingerprint: str, source: str) -> ManagerHoldings:
+        symbol_ids = np.fromiter(accumulator.amounts.keys(), dtype=np.int64, count=len(accumulator.amounts))
+        amounts = np.fromiter(accumulator.amounts.values(), dtype=np.float64, count=len(accumulator.amounts))
+        if accumulator.weighted:
+            weights = amounts
+            aum = accumulator.aum if accumulator.aum is not None else 0.0
+        else:
+            aum = accumulator.aum if accumulator.aum is not None else float(amounts.sum()) + accumulator.skipped
+            weights = amounts / aum if aum else amounts
+        return ManagerHoldings(
+            accumulator.manager, accumulator.name, accumulator.strategy, aum,
+            symbol_ids, weights, fingerprint, source
+        )
+
+
+def _parse_amount(text: Optional[str]) -> Optional[float]:
+    try:
+        return float(text) if text else None
+    except ValueError:
+        return None
+
+
+def _base_name(path: str) -> str:
+    name = os.path.basename(path).lower()
+    return name[:-len('.gz')] if name.endswith('.gz') else name
+
+
+def _holdings_files(directory: str) -> Iterator[str]:
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return
+    for name in names:
+        if _base_name(name).endswith(('.csv', '.xml')):
+            yield os.path.join(directory, name)
+
+
+def _open_binary(path: str):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def _open_text(path: str):
+    return io.TextIOWrapper(_open_binary(path), encoding='utf-8', newline='')
+
+
+def load_cusip_map(path: str) -> Dict[str, str]:
+    """{CUSIP: ticker} from a `cusip,symbol` CSV (empty if the file does not exist)"""
+    try:
+        with open(path, newline='') as f:
+            return {row['cusip'].strip().upper(): row['symbol'].strip()
+                    for row in csv.DictReader(f) if row.get('cusip') and row.get('symbol')}
+    except FileNotFoundError:
+        return {}
+
+
+def cusip_map_file() -> str:
+    """CUSIP map location (CUSIP_MAP_FILE overrides)"""
+    return os.environ.get('CUSIP_MAP_FILE', DEFAULT_CUSIP_MAP_FILE)
+
+
+def holdings_dir() -> str:
+    """Holdings location (HOLDINGS_DIR overrides the bundled sample managers)"""
+    return os.environ.get('HOLDINGS_DIR', DEFAULT_HOLDINGS_DIR)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_holdings_store() -> HoldingsStore:
+    """Return the process-wide holdings store, loading it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = HoldingsStore(holdings_dir(), cusip_map=load_cusip_map(cusip_map_file()))
+                store.reload()
+                _store = store
+    return _store
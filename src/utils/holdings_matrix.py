@@ -0,0 +1,228 @@
+# src/utils/holdings_matrix.py - Sparse managers x securities weight matrix for multi-manager analytics
+import threading
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+# Portfolios sharing fewer holdings than this have zero overlap similarity
+MIN_COMMON_HOLDINGS = 2
+
+PAIRWISE_STATS = ('common', 'dot', 'min_overlap')
+
+# Dense cells (managers in a block x positions) materialized per pairwise block
+PAIRWISE_BLOCK_CELLS = 1 << 22
+
+
+class HoldingsMatrix:
+    """Portfolio weights of many managers, stored as a CSR matrix.
+
+    Row i holds manager i's weights: `indices[indptr[i]:indptr[i + 1]]` are
+    its security columns and `data` the matching weights. `aum` is each
+    manager's assets under management. Securities are numbered in
+    first-seen order, so aggregates tie-break the way dict iteration over
+    the source portfolios would.
+
+    Every aggregate is a bincount or a product over the nonzeros, so cost
+    grows with the number of positions rather than managers x securities.
+    Pairwise statistics are products against the nonzeros, computed over
+    blocks of managers so memory stays bounded however many managers
+    share a security.
+    """
+
+    def __init__(self, managers: List[str], securities: List[str], indptr: np.ndarray,
+                 indices: np.ndarray, data: np.ndarray, aum: np.ndarray):
+        self.managers = managers
+        self.securities = securities
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.aum = aum
+        self.rows = np.repeat(np.arange(len(managers)), np.diff(indptr))
+        self._manager_index = {manager: row for row, manager in enumerate(managers)}
+        self._security_index = {security: column for column, security in enumerate(securities)}
+        self._columns = None
+        self._pairwise: Dict[str, np.ndarray] = {}
+        # Matrices are shared across request threads; one of them computes each missing statistic
+        self._pairwise_lock = threading.Lock()
+
+    @classmethod
+    def from_portfolios(cls, portfolios: Dict[str, Dict], holdings_key: str = 'holdings',
+                        aum_key: str = 'aum') -> 'HoldingsMatrix':
+        """Build from {manager: {'aum': ..., 'holdings': {symbol: weight}}}"""
+        security_index: Dict[str, int] = {}
+        indptr = [0]
+        indices = []
+        data = []
+        aum = []
+        for portfolio in portfolios.values():
+            for symbol, weight in portfolio[holdings_key].items():
+                indices.append(security_index.setdefault(symbol, len(security_index)))
+                data.append(weight)
+            indptr.append(len(indices))
+            aum.append(portfolio.get(aum_key, 0.0))
+
+        return cls(
+            list(portfolios), list(security_index),
+            np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int64),
+            np.array(data, dtype=np.float64), np.array(aum, dtype=np.float64)
+        )
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.managers), len(self.securities)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def manager_row(self, manager: str) -> int:
+        return self._manager_index[manager]
+
+    def security_column(self, security: str) -> int:
+        return self._security_index[security]
+
+    def holdings_of(self, manager: str) -> Dict[str, float]:
+        """{symbol: weight} of one manager"""
+        row = self._manager_index[manager]
+        start, stop = self.indptr[row], self.indptr[row + 1]
+        return {self.securities[column]: float(weight) for column, weight in zip(self.indices[start:stop], self.data[start:stop])}
+
+    def holders_of(self, security: str) -> List[Tuple[int, float]]:
+        """(manager row, weight) of every manager holding `security`, in manager order"""
+        order, starts = self._column_order()
+        column = self._security_index[security]
+        positions = order[starts[column]:starts[column + 1]]
+        return [(int(self.rows[position]), float(self.data[position])) for position in positions]
+
+    # Per-manager aggregates
+
+    def weight_totals(self) -> np.ndarray:
+        """Sum of weights per manager"""
+        return np.bincount(self.rows, weights=self.data, minlength=len(self.managers))
+
+    def position_counts(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def herfindahl(self) -> np.ndarray:
+        """Herfindahl concentration index (sum of squared weights) per manager"""
+        return np.bincount(self.rows, weights=self.data ** 2, minlength=len(self.managers))
+
+    def max_weights(self) -> np.ndarray:
+        """Largest position per manager (0 for empty portfolios)"""
+        result = np.zeros(len(self.managers))
+        counts = self.position_counts()
+        nonempty = counts > 0
+        if self.nnz:
+            result[nonempty] = np.maximum.reduceat(self.data, self.indptr[:-1][nonempty])
+        return result
+
+    # Per-security aggregates
+
+    def holder_counts(self) -> np.ndarray:
+        """Number of managers holding each security"""
+        return np.bincount(self.indices, minlength=len(self.securities))
+
+    def dollar_values(self) -> np.ndarray:
+        """Dollar value of each position (weight x manager AUM), aligned with `data`"""
+        return self.data * self.aum[self.rows]
+
+    def dollar_holdings(self) -> np.ndarray:
+        """AUM-weighted dollars held in each security across all managers"""
+        return np.bincount(self.indices, weights=self.dollar_values(), minlength=len(self.securities))
+
+    def weight_sums(self) -> np.ndarray:
+        """Unweighted sum of every manager's weight in each security"""
+        return np.bincount(self.indices, weights=self.data, minlength=len(self.securities))
+
+    def rollup(self, group_of: Callable[[str], str], groups: List[str] = ()) -> Dict[str, float]:
+        """Dollars per group of securities (e.g. sector), keyed in `groups` then first-seen order"""
+        names = list(groups)
+        codes = {name: code for code, name in enumerate(names)}
+        security_codes = np.empty(len(self.securities), dtype=np.int64)
+        for column, security in enumerate(self.securities):
+            group = group_of(security)
+            if group not in codes:
+                codes[group] = len(names)
+                names.append(group)
+            security_codes[column] = codes[group]
+
+        totals = np.bincount(security_codes, weights=self.dollar_holdings(), minlength=len(names))
+        return {name: float(total) for name, total in zip(names, totals)}
+
+    # Manager x manager statistics
+
+    def pairwise(self, stats: Tuple[str, ...] = PAIRWISE_STATS) -> Dict[str, np.ndarray]:
+        """Symmetric (managers x managers) co-holding statistics named in `stats`.
+
+        'common' counts shared securities, 'dot' is the weight inner product
+        (A @ A.T) and 'min_overlap' sums min(weight_i, weight_j) over shared
+        securities; the diagonal is the managers' own values. Statistics are
+        computed on first request and cached.
+        """
+        with self._pairwise_lock:
+            missing = [name for name in stats if name not in self._pairwise]
+            if missing:
+                self._pairwise.update(self._pairwise_blocks(missing))
+            return {name: self._pairwise[name] for name in stats}
+
+    def _pairwise_blocks(self, stats: List[str]) -> Dict[str, np.ndarray]:
+        managers, securities = self.shape
+        result = {name: np.zeros((managers, managers)) for name in stats}
+        if not self.nnz:
+            return result
+
+        # Positions of nonempty rows start each reduceat segment; empty rows stay zero
+        nonempty = np.flatnonzero(self.position_counts())
+        segments = self.indptr[:-1][nonempty]
+        block_size = max(1, PAIRWISE_BLOCK_CELLS // max(self.nnz, securities))
+        for start in range(0, managers, block_size):
+            stop = min(managers, start + block_size)
+            # Dense weights / membership of the block's managers, then gathered at every position's security
+            weights = np.zeros((stop - start, securities))
+            held = np.zeros((stop - start, securities), dtype=bool)
+            first, last = self.indptr[start], self.indptr[stop]
+            block_rows = self.rows[first:last] - start
+            weights[block_rows, self.indices[first:last]] = self.data[first:last]
+            held[block_rows, self.indices[first:last]] = True
+            block_weights = weights[:, self.indices]
+            block_held = held[:, self.indices]
+
+            for name in stats:
+                if name == 'common':
+                    values = block_held.astype(np.float64)
+                elif name == 'dot':
+                    values = block_weights * self.data
+                else:
+                    values = np.where(block_held, np.minimum(block_weights, self.data), 0.0)
+                result[name][start:stop, nonempty] = np.add.reduceat(values, segments, axis=1)
+        return result
+
+    def cosine_similarity(self) -> np.ndarray:
+        """Cosine of the angle between managers' weight vectors"""
+        dot = self.pairwise(('dot',))['dot']
+        norms = np.sqrt(np.diag(dot))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = dot / np.outer(norms, norms)
+        return np.nan_to_num(similarity)
+
+    def overlap_similarity(self) -> np.ndarray:
+        """Shared weight relative to the smaller portfolio, capped at 1 (diagonal is 1).
+
+        Pairs with fewer than MIN_COMMON_HOLDINGS shared securities score 0.
+        """
+        stats = self.pairwise(('common', 'min_overlap'))
+        totals = self.weight_totals()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = stats['min_overlap'] / np.minimum.outer(totals, totals)
+        similarity = np.minimum(np.nan_to_num(similarity), 1.0)
+        similarity[stats['common'] < MIN_COMMON_HOLDINGS] = 0.0
+        np.fill_diagonal(similarity, 1.0)
+        return similarity
+
+    def _column_order(self) -> Tuple[np.ndarray, np.ndarray]:
+        # CSC view: nonzero positions grouped by security, managers ascending within each
+        if self._columns is None:
+            order = np.argsort(self.indices, kind='stable')
+            starts = np.concatenate(([0], np.cumsum(self.holder_counts())))
+            self._columns = (order, starts)
+        return self._columns
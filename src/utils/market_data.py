@@ -0,0 +1,281 @@
+# src/utils/market_data.py - Shared market data provider used by every agent
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from utils.fundamentals_cache import FundamentalsCache, get_fundamentals_cache
+from utils.price_store import PriceHistoryStore, get_price_store
+from utils.rate_limit import MarketDataUnavailable, get_guard, guard_backend
+from utils.rolling_stats import RollingStats
+from utils.tracing import span
+
+# Upper bound on simultaneous requests to the data source
+DEFAULT_MAX_WORKERS = 8
+
+# MARKET_DATA_BACKEND values: yfinance's per-ticker calls, the pooled asyncio HTTP
+# client, or recorded payloads replayed from MARKET_DATA_FIXTURES
+BACKENDS = ('yfinance', 'http', 'fixture')
+
+# A per-symbol result is either the payload or the exception raised fetching it
+FetchResult = Union[Any, Exception]
+
+
+class YFinanceBackend:
+    """Fetches fundamentals and price history from Yahoo Finance via yfinance"""
+
+    def get_info(self, symbol: str) -> Dict:
+        return self._ticker(symbol).info
+
+    def get_history(self, symbol: str, period: Optional[str] = None, start=None):
+        if start is not None:
+            return self._ticker(symbol).history(start=start)
+        return self._ticker(symbol).history(period=period)
+
+    def _ticker(self, symbol: str):
+        # Imported on first fetch: yfinance (with pandas) is the slowest import on the startup path
+        import yfinance as yf
+        return yf.Ticker(symbol)
+
+
+class MarketDataProvider:
+    """Batched, bounded-concurrency access to market data for a list of symbols.
+
+    Every fetch method takes a list of symbols and returns a dict keyed by
+    symbol (in input order, duplicates removed). A symbol that fails maps to
+    the exception instead of raising, so one bad ticker never aborts a batch.
+    Fundamentals are served from the shared cache when fresh enough and
+    price history from the local store, which only downloads new bars.
+
+    The backend is wrapped with the shared rate limiter and circuit breaker
+    (see utils.rate_limit). While the source is throttling, symbols with a
+    cached payload get that last-known payload instead of an error.
+
+    Fetches are coalesced per (kind, symbol, args): when agents fanned out
+    over overlapping symbols ask for the same one concurrently, only the
+    first reaches the backend and the others wait for its result.
+    """
+
+    def __init__(self, backend=None, max_workers: int = DEFAULT_MAX_WORKERS,
+                 cache: Optional[FundamentalsCache] = None, price_store: Optional[PriceHistoryStore] = None):
+        self.backend = guard_backend(backend or create_backend())
+        self.max_workers = max_workers
+        self.cache = cache or get_fundamentals_cache()
+        self.price_store = price_store or get_price_store()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._rolling_stats = None
+        self._rolling_stats_lock = threading.Lock()
+        # (kind, symbol, ...) -> future of the fetch currently running for it
+        self._inflight: Dict[tuple, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    def fetch_fundamentals(self, symbols: Iterable[str], fields: Optional[Iterable[str]] = None) -> Dict[str, FetchResult]:
+        """Fetch the `.info` payload for every symbol concurrently.
+
+        `fields` names the info keys the caller reads; it only decides how
+        stale a cached payload may be (see FundamentalsCache.max_age).
+        """
+        unique_symbols = _unique(symbols)
+        with span('fetch.fundamentals', symbols=len(unique_symbols)) as stage:
+            results, missing = self._lookup_cached(unique_symbols, fields)
+            stage.set('cache_hits', len(results))
+            stage.set('network', len(missing))
+
+            jobs = [(symbol, self._get_info, (symbol,)) for symbol in missing]
+            results.update(self._store_fetched(self._run_batch(jobs)))
+        return {symbol: results[symbol] for symbol in unique_symbols}
+
+    def fetch_histories(self, symbols: Iterable[str], period: str) -> Dict[str, FetchResult]:
+        """Fetch price history DataFrames for every symbol concurrently"""
+        jobs = [(symbol, self._get_history, (symbol, period)) for symbol in _unique(symbols)]
+        with span('fetch.histories', symbols=len(jobs), period=period):
+            return self._run_batch(jobs)
+
+    def fetch_closes(self, symbols: Iterable[str], period: str) -> Dict[str, FetchResult]:
+        """Fetch (dates, closes) arrays for every symbol straight from the price store"""
+        jobs = [(symbol, self.price_store.get_closes, (symbol, period, self.backend)) for symbol in _unique(symbols)]
+        with span('fetch.histories', symbols=len(jobs), period=period):
+            return self._run_batch(jobs)
+
+    def fetch_fundamentals_with_history(self, symbols: Iterable[str], period: str, fields: Optional[Iterable[str]] = None) -> Tuple[Dict[str, FetchResult], Dict[str, FetchResult]]:
+        """Fetch fundamentals and history together in a single concurrent batch"""
+        return self._fetch_fundamentals_with('fetch.fundamentals_with_history', symbols, self._get_history, period, fields)
+
+    def fetch_fundamentals_with_windows(self, symbols: Iterable[str], period: str, fields: Optional[Iterable[str]] = None) -> Tuple[Dict[str, FetchResult], Dict[str, FetchResult]]:
+        """Fetch fundamentals and each symbol's rolling `period` window (see utils.rolling_stats).
+
+        Like `fetch_fundamentals_with_history`, but the store's bars feed
+        running momentum / volatility state instead of being copied into a
+        DataFrame per call.
+        """
+        return self._fetch_fundamentals_with('fetch.fundamentals_with_windows', symbols, self._get_window, period, fields)
+
+    def rolling_stats(self) -> RollingStats:
+        """Rolling windows over the current price store"""
+        with self._rolling_stats_lock:
+            if self._rolling_stats is None or self._rolling_stats.store is not self.price_store:
+                self._rolling_stats = RollingStats(self.price_store)
+            return self._rolling_stats
+
+    def _fetch_fundamentals_with(self, stage_name: str, symbols: Iterable[str], get_series: Callable, period: str,
+                                 fields: Optional[Iterable[str]]) -> Tuple[Dict[str, FetchResult], Dict[str, FetchResult]]:
+        # Cache misses and every symbol's price series in one concurrent batch
+        unique_symbols = _unique(symbols)
+        with span(stage_name, symbols=len(unique_symbols), period=period) as stage:
+            cached, missing = self._lookup_cached(unique_symbols, fields)
+            stage.set('cache_hits', len(cached))
+            stage.set('network', len(missing))
+
+            jobs = [(('info', symbol), self._get_info, (symbol,)) for symbol in missing]
+            jobs += [(('history', symbol), get_series, (symbol, period)) for symbol in unique_symbols]
+            results = self._run_batch(jobs)
+
+            fetched = self._store_fetched({symbol: results[('info', symbol)] for symbol in missing})
+        cached.update(fetched)
+        fundamentals = {symbol: cached[symbol] for symbol in unique_symbols}
+        histories = {symbol: results[('history', symbol)] for symbol in unique_symbols}
+        return fundamentals, histories
+
+    def _get_info(self, symbol: str) -> Dict:
+        # Only cache misses get here, so every info span is a network fetch
+        with span('fetch.info', symbol=symbol, source='network'):
+            return self.backend.get_info(symbol)
+
+    def _get_history(self, symbol: str, period: str):
+        return self.price_store.get_history(symbol, period, self.backend)
+
+    def _get_window(self, symbol: str, period: str):
+        # Appends from the sync reach the window through the store's listener
+        self.price_store.sync(symbol, period, self.backend)
+        return self.rolling_stats().window(symbol, period)
+
+    def _lookup_cached(self, symbols: List[str], fields: Optional[Iterable[str]]) -> Tuple[Dict[str, FetchResult], List[str]]:
+        """Split symbols into cached payloads and those that must be fetched"""
+        fields = list(fields) if fields is not None else None
+        cached = {}
+        missing = []
+        for symbol in symbols:
+            payload = self.cache.get(symbol, fields)
+            if payload is None:
+                missing.append(symbol)
+            else:
+                cached[symbol] = payload
+        return cached, missing
+
+    def _store_fetched(self, fetched: Dict[str, FetchResult]) -> Dict[str, FetchResult]:
+        for symbol, payload in fetched.items():
+            if isinstance(payload, MarketDataUnavailable):
+                stale = self.cache.get_stale(symbol)
+                if stale is not None:
+                    get_guard()['metrics'].record('stale_served')
+                    fetched[symbol] = stale
+            elif not isinstance(payload, Exception):
+                self.cache.put(symbol, payload)
+        return fetched
+
+    def _run_batch(self, jobs: List[Tuple[Any, Callable, tuple]]) -> Dict[Any, FetchResult]:
+        """Run fetch jobs on the shared pool and collect results or errors by key"""
+        if not jobs:
+            return {}
+
+        if len(jobs) == 1:
+            key, func, args = jobs[0]
+            return {key: self._call_once(func, args)}
+
+        executor = self._get_executor()
+        # Each job runs in the caller's context, so fetches stay attributed to its agent
+        futures = [(key, executor.submit(contextvars.copy_context().run, self._call_once, func, args))
+                   for key, func, args in jobs]
+        return {key: future.result() for key, future in futures}
+
+    def _call_once(self, func: Callable, args: tuple) -> FetchResult:
+        """Run `func(*args)`, or wait for the identical call another thread is already running"""
+        key = (func.__name__,) + args
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            running = future is not None
+            if not running:
+                future = self._inflight[key] = Future()
+        if running:
+            # The owner is already executing (it registered itself when it started), so this never waits on queued work
+            return future.result()
+
+        result = None
+        try:
+            result = _call(func, args)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            future.set_result(result)
+        return result
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="market-data"
+                    )
+        return self._executor
+
+
+def create_backend(name: Optional[str] = None):
+    """Backend named by `name` or MARKET_DATA_BACKEND (default 'yfinance').
+
+    With MARKET_DATA_RECORD_DIR set, every payload it returns is also saved
+    there as a fixture for offline replay.
+    """
+    name = name or os.environ.get('MARKET_DATA_BACKEND', 'yfinance')
+    if name == 'yfinance':
+        backend = YFinanceBackend()
+    elif name == 'http':
+        from utils.async_market_client import AsyncClientBackend
+        backend = AsyncClientBackend()
+    elif name == 'fixture':
+        from utils.fixture_backend import FixtureBackend, fixture_dir
+        if not fixture_dir():
+            raise ValueError("MARKET_DATA_FIXTURES must point at a fixture directory for the fixture backend")
+        backend = FixtureBackend(fixture_dir())
+    else:
+        raise ValueError(f"Unknown market data backend: {name} (expected one of {', '.join(BACKENDS)})")
+
+    record_dir = os.environ.get('MARKET_DATA_RECORD_DIR')
+    if record_dir:
+        from utils.fixture_backend import RecordingBackend
+        backend = RecordingBackend(backend, record_dir)
+    return backend
+
+
+def _call(func: Callable, args: tuple) -> FetchResult:
+    try:
+        return func(*args)
+    except Exception as e:
+        return e
+
+
+def _unique(symbols: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(symbols))
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> MarketDataProvider:
+    """Return the process-wide market data provider"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = MarketDataProvider()
+    return _provider
+
+
+def set_provider(provider: MarketDataProvider) -> None:
+    """Replace the process-wide provider (e.g. with an offline backend)"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
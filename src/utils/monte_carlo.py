@@ -0,0 +1,233 @@
+# src/utils/monte_carlo.py - Monte Carlo portfolio paths with correlated returns and factor shocks
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.risk_engine import DEFAULT_CONFIDENCE, DEFAULT_PERIOD, covariance, load_returns
+from utils.tracing import span
+
+DEFAULT_PATHS = 20000
+DEFAULT_HORIZON_DAYS = 21
+DEFAULT_SEED = 7
+
+BASE_CASE = 'Base Case'
+
+# Upper bound on the per-chunk working set; larger runs are split
+DEFAULT_CHUNK_BYTES = 64 * 2 ** 20
+
+# (paths x days x assets) float64 buffers held per chunk: the draws, the
+# cumulative log paths and the scenario being valued
+CHUNK_BUFFERS = 3
+
+
+class SimulationResult:
+    """Horizon returns and maximum drawdowns of every simulated portfolio path"""
+
+    def __init__(self, returns: np.ndarray, max_drawdown: np.ndarray, horizon_days: int, seed: Optional[int]):
+        self.returns = returns
+        self.max_drawdown = max_drawdown
+        self.horizon_days = horizon_days
+        self.seed = seed
+
+    def __len__(self) -> int:
+        return len(self.returns)
+
+    def tail_metrics(self, confidence: float = DEFAULT_CONFIDENCE) -> Dict:
+        metrics = tail_metrics(self.returns, confidence)
+        metrics['mean_max_drawdown'] = float(self.max_drawdown.mean())
+        metrics['horizon_days'] = self.horizon_days
+        return metrics
+
+
+def cholesky_factor(cov: np.ndarray) -> np.ndarray:
+    """Lower-triangular L with L @ L.T == cov.
+
+    Sample covariances of co-moving holdings can be numerically
+    semi-definite; a diagonal jitter (scaled to the average variance) is
+    added in growing steps until the factorisation succeeds.
+    """
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        pass
+
+    scale = np.trace(cov) / cov.shape[0] if cov.shape[0] else 1.0
+    jitter = 1e-10
+    while jitter < 1.0:
+        try:
+            return np.linalg.cholesky(cov + np.eye(cov.shape[0]) * scale * jitter)
+        except np.linalg.LinAlgError:
+            jitter *= 10
+    raise ValueError("Covariance matrix is not positive semi-definite")
+
+
+def simulate_paths(weights: np.ndarray, cov: np.ndarray, mean: Optional[np.ndarray] = None,
+                   horizon_days: int = DEFAULT_HORIZON_DAYS, paths: int = DEFAULT_PATHS,
+                   seed: Optional[int] = DEFAULT_SEED, loadings: Optional[np.ndarray] = None,
+                   shocks: Optional[np.ndarray] = None, chunk_size: Optional[int] = None) -> SimulationResult:
+    """Simulate one set of paths, conditioned on `shocks` if given (see simulate_scenarios)"""
+    scenarios = {BASE_CASE: None} if shocks is None else {'shocked': shocks}
+    results = simulate_scenarios(weights, cov, mean, horizon_days, paths, seed, loadings, scenarios, chunk_size)
+    return next(iter(results.values()))
+
+
+def simulate_scenarios(weights: np.ndarray, cov: np.ndarray, mean: Optional[np.ndarray] = None,
+                       horizon_days: int = DEFAULT_HORIZON_DAYS, paths: int = DEFAULT_PATHS,
+                       seed: Optional[int] = DEFAULT_SEED, loadings: Optional[np.ndarray] = None,
+                       scenarios: Optional[Dict[str, Optional[np.ndarray]]] = None,
+                       chunk_size: Optional[int] = None) -> Dict[str, SimulationResult]:
+    """Simulate daily log-return paths and value the portfolio along each one.
+
+    `cov` and `mean` are the daily log-return covariance and drift of the
+    assets, drawn through their Cholesky factor. `loadings` (assets x
+    factors) defines factor baskets, and each scenario gives every factor's
+    simple return over the horizon (NaN leaves a factor unconstrained, None
+    shocks nothing). Paths are conditioned on the shocked factors with a
+    Gaussian bridge, so assets outside the baskets move through their
+    correlations with them.
+
+    All scenarios reuse the same draws, which both saves the sampling cost
+    and keeps their differences free of sampling noise. Paths are drawn
+    `chunk_size` at a time into preallocated buffers (default: whatever
+    fits in DEFAULT_CHUNK_BYTES), so memory does not grow with `paths`; a
+    seed gives the same results for any chunk size.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    assets = len(weights)
+    mean = np.zeros(assets) if mean is None else np.asarray(mean, dtype=np.float64)
+    factor = cholesky_factor(cov)
+    scenarios = scenarios if scenarios is not None else {BASE_CASE: None}
+
+    # Per scenario: the endpoint correction of its shocked factors, spread linearly over the days
+    bridges = {}
+    for name, shocks in scenarios.items():
+        shocks = None if shocks is None else np.asarray(shocks, dtype=np.float64)
+        if shocks is None or np.all(np.isnan(shocks)):
+            bridges[name] = None
+            continue
+        shocked = np.asarray(loadings, dtype=np.float64)[:, ~np.isnan(shocks)]
+        cross = cov * horizon_days @ shocked
+        bridges[name] = (shocked, np.log1p(shocks[~np.isnan(shocks)]), cross @ np.linalg.pinv(shocked.T @ cross))
+    time_fraction = (np.arange(1, horizon_days + 1) / horizon_days)[None, :, None]
+
+    if chunk_size is None:
+        chunk_size = max(1, DEFAULT_CHUNK_BYTES // (CHUNK_BUFFERS * 8 * horizon_days * max(assets, 1)))
+    chunk_size = min(chunk_size, max(paths, 1))
+
+    rng = np.random.default_rng(seed)
+    returns = {name: np.empty(paths) for name in scenarios}
+    max_drawdown = {name: np.empty(paths) for name in scenarios}
+    draw_buffer = np.empty((chunk_size * horizon_days, assets))
+    path_buffer = np.empty((chunk_size * horizon_days, assets))
+    work_buffer = np.empty((chunk_size, horizon_days, assets))
+    for start in range(0, paths, chunk_size):
+        count = min(chunk_size, paths - start)
+        stop = start + count
+        draws = draw_buffer[:count * horizon_days]
+        rng.standard_normal(out=draws)
+        log_paths = np.matmul(draws, factor.T, out=path_buffer[:count * horizon_days])
+        log_paths += mean
+        log_paths = log_paths.reshape(count, horizon_days, assets)
+        np.cumsum(log_paths, axis=1, out=log_paths)
+
+        work = work_buffer[:count]
+        for name, bridge in bridges.items():
+            if bridge is None:
+                np.exp(log_paths, out=work)
+            else:
+                shocked, targets, gain = bridge
+                gap = targets - log_paths[:, -1] @ shocked
+                np.multiply(time_fraction, (gap @ gain.T)[:, None, :], out=work)
+                work += log_paths
+                np.exp(work, out=work)
+            values = work @ weights
+            peaks = np.maximum(np.maximum.accumulate(values, axis=1), 1.0)
+            returns[name][start:stop] = values[:, -1] - 1.0
+            max_drawdown[name][start:stop] = np.max(1.0 - values / peaks, axis=1)
+
+    return {name: SimulationResult(returns[name], max_drawdown[name], horizon_days, seed) for name in scenarios}
+
+
+def tail_metrics(returns: np.ndarray, confidence: float = DEFAULT_CONFIDENCE) -> Dict:
+    """Loss distribution summary of simulated horizon returns.
+
+    VaR, CVaR and the worst case are positive loss fractions; the
+    percentiles are of the returns themselves.
+    """
+    cutoff = np.quantile(returns, 1.0 - confidence)
+    return {
+        'paths': len(returns),
+        'confidence': confidence,
+        'expected_return': float(returns.mean()),
+        'volatility': float(returns.std()),
+        'var': float(-cutoff),
+        'cvar': float(-returns[returns <= cutoff].mean()),
+        'worst_loss': float(-returns.min()),
+        'probability_of_loss': float(np.mean(returns < 0)),
+        'percentiles': {q: float(value) for q, value in zip((5, 25, 50, 75, 95), np.percentile(returns, (5, 25, 50, 75, 95)))}
+    }
+
+
+def factor_loadings(symbols: List[str], factors: Dict[str, Iterable[str]]) -> Tuple[List[str], np.ndarray]:
+    """Equal-weighted basket loadings (assets x factors) for factors with at least one listed symbol"""
+    column_of = {symbol: i for i, symbol in enumerate(symbols)}
+    names = []
+    columns = []
+    for name, members in factors.items():
+        rows = [column_of[symbol] for symbol in dict.fromkeys(members) if symbol in column_of]
+        if rows:
+            column = np.zeros(len(symbols))
+            column[rows] = 1.0 / len(rows)
+            names.append(name)
+            columns.append(column)
+    return names, np.column_stack(columns) if columns else np.empty((len(symbols), 0))
+
+
+def stress_test(holdings: Dict[str, float], scenarios: Dict[str, Dict[str, float]],
+                factors: Dict[str, Iterable[str]], period: str = DEFAULT_PERIOD,
+                horizon_days: int = DEFAULT_HORIZON_DAYS, paths: int = DEFAULT_PATHS,
+                seed: Optional[int] = DEFAULT_SEED, confidence: float = DEFAULT_CONFIDENCE,
+                shrinkage: Union[float, str, None] = None, provider=None) -> Dict[str, Dict]:
+    """Simulate `holdings` ({symbol: weight}) unshocked and under each scenario.
+
+    A scenario maps factor names to their simple return over the horizon;
+    `factors` maps each name to the symbols of its basket, which need not be
+    held (an index ETF works as a market factor). Results are keyed 'Base
+    Case' plus every scenario name, each holding `tail_metrics` output, or
+    {'error': ...} when none of a scenario's factor baskets have data. The
+    base case also lists symbols left out for lack of history ('missing').
+    """
+    used = {name for shocks in scenarios.values() for name in shocks if name in factors}
+    symbols = list(dict.fromkeys(list(holdings) + [s for name in factors if name in used for s in factors[name]]))
+    matrix = load_returns(symbols, period, provider)
+    if not any(symbol in holdings for symbol in matrix.symbols):
+        raise ValueError("No holdings have enough price history for simulation")
+
+    weights = np.array([holdings.get(symbol, 0.0) for symbol in matrix.symbols], dtype=np.float64)
+    weights /= weights.sum()
+    log_returns = np.log1p(matrix.returns)
+    cov = covariance(log_returns, shrinkage=shrinkage)
+    mean = log_returns.mean(axis=0)
+
+    names, loadings = factor_loadings(matrix.symbols, {name: factors[name] for name in used})
+    shocks = {BASE_CASE: None}
+    errors = {}
+    for scenario, factor_shocks in scenarios.items():
+        if any(name in factor_shocks for name in names):
+            shocks[scenario] = np.array([factor_shocks.get(name, np.nan) for name in names])
+        else:
+            errors[scenario] = {'error': f"no price history for {', '.join(factor_shocks)}"}
+
+    with span('score.monte_carlo', assets=len(matrix.symbols), paths=paths, scenarios=len(shocks)):
+        simulated = simulate_scenarios(weights, cov, mean, horizon_days, paths, seed, loadings, shocks)
+    results = {}
+    for scenario in [BASE_CASE] + list(scenarios):
+        if scenario in errors:
+            results[scenario] = errors[scenario]
+            continue
+        results[scenario] = simulated[scenario].tail_metrics(confidence)
+        if scenario == BASE_CASE:
+            results[scenario]['missing'] = matrix.missing
+        else:
+            results[scenario]['factor_shocks'] = {name: scenarios[scenario][name] for name in names if name in scenarios[scenario]}
+    return results
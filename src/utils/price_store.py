@@ -0,0 +1,260 @@
+# src/utils/price_store.py - Persistent per-symbol daily bar store with incremental append
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.rate_limit import MarketDataUnavailable, get_guard
+from utils.tracing import annotate, span
+
+STORE_VERSION = 1
+
+# One fixed-size record per daily bar; files are raw record arrays so they can
+# be memory-mapped directly and grown with a plain append
+BAR_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8')
+])
+
+# Minimum history pulled on a cold fetch so later, longer lookbacks are covered
+DEFAULT_BACKFILL_PERIOD = '1y'
+
+# Don't re-ask the data source about a symbol more often than this when it
+# has nothing new (weekends, holidays, halted tickers)
+DEFAULT_RECHECK_SECONDS = 3600
+
+# US equity sessions are complete once the closing auction has printed
+MARKET_TIMEZONE = 'America/New_York'
+SESSION_CLOSE = (16, 30)
+
+# Relative change in an overlapping bar that signals a split/dividend re-adjustment
+ADJUSTMENT_TOLERANCE = 1e-4
+
+_PERIOD_UNITS = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+
+
+class PriceHistoryStore:
+    """Local columnar store of completed daily bars, one memory-mappable file per symbol.
+
+    `get_history` serves reads from disk and only asks the backend for bars
+    newer than the last stored session. If the overlapping bar no longer
+    matches (the source re-adjusted history for a split or dividend), the
+    symbol is re-downloaded in full. Point PRICE_STORE_DIR at persistent
+    storage to keep the store across container restarts.
+
+    Listeners (see `add_listener`) are called as
+    `listener(symbol, bars, rewritten)` after new bars are appended
+    (rewritten=False, just the new bars) or a symbol's file is rewritten by
+    a backfill (rewritten=True, every bar).
+    """
+
+    def __init__(self, root_dir: str, backfill_period: str = DEFAULT_BACKFILL_PERIOD,
+                 recheck_seconds: float = DEFAULT_RECHECK_SECONDS):
+        self.root_dir = os.path.join(root_dir, f"v{STORE_VERSION}")
+        self.backfill_period = backfill_period
+        self.recheck_seconds = recheck_seconds
+        os.makedirs(self.root_dir, exist_ok=True)
+
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._last_checked: Dict[str, float] = {}
+        self._backfilled_from: Dict[str, date] = {}
+        self._listeners: List[Callable[[str, np.ndarray, bool], None]] = []
+
+    def add_listener(self, listener: Callable[[str, np.ndarray, bool], None]) -> None:
+        """Call `listener(symbol, bars, rewritten)` whenever stored bars change"""
+        self._listeners.append(listener)
+
+    def get_history(self, symbol: str, period: str, backend) -> pd.DataFrame:
+        """Return daily bars covering `period` as a yfinance-style DataFrame"""
+        bars = self.get_bars(symbol, period, backend)
+        frame = pd.DataFrame({
+            'Open': bars['open'],
+            'High': bars['high'],
+            'Low': bars['low'],
+            'Close': bars['close'],
+            'Volume': bars['volume']
+        }, index=pd.DatetimeIndex(bars['date'].astype('datetime64[ns]'), name='Date'))
+        return frame
+
+    def get_closes(self, symbol: str, period: str, backend) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (dates, closes) arrays covering `period`"""
+        bars = self.get_bars(symbol, period, backend)
+        return bars['date'], bars['close']
+
+    def get_bars(self, symbol: str, period: str, backend) -> np.ndarray:
+        """Sync the symbol with the backend if needed and return the bars for `period`"""
+        bars = self.sync(symbol, period, backend)
+        if bars is None:
+            return np.empty(0, dtype=BAR_DTYPE)
+        first = np.searchsorted(bars['date'], np.datetime64(period_start(period), 'D'))
+        return np.array(bars[first:])
+
+    def sync(self, symbol: str, period: str, backend) -> Optional[np.ndarray]:
+        """Bring the symbol's bars up to date for `period` and return every stored bar (memory-mapped)"""
+        # 'store' unless the sync below has to ask the backend
+        with span('fetch.history', symbol=symbol, source='store'), self._lock_for(symbol):
+            try:
+                self._sync(symbol, period_start(period), backend)
+            except MarketDataUnavailable:
+                # Source is throttling: stored bars, even a few sessions old, beat no answer
+                if self.read(symbol) is None:
+                    raise
+                get_guard()['metrics'].record('stale_served')
+                annotate(source='stale')
+            return self.read(symbol)
+
+    def read(self, symbol: str) -> Optional[np.ndarray]:
+        """Memory-map the stored bars for a symbol (None if nothing is stored)"""
+        path = self._path(symbol)
+        if not os.path.exists(path) or os.path.getsize(path) < BAR_DTYPE.itemsize:
+            return None
+        count = os.path.getsize(path) // BAR_DTYPE.itemsize
+        return np.memmap(path, dtype=BAR_DTYPE, mode='r', shape=(count,))
+
+    def _sync(self, symbol: str, start: date, backend) -> None:
+        bars = self.read(symbol)
+        last_session = last_complete_session()
+
+        if bars is None or bars['date'][0] > np.datetime64(start, 'D'):
+            # Symbols listed after `start` never cover it; backfill once per start date
+            attempted = self._backfilled_from.get(symbol)
+            if attempted is None or start < attempted:
+                self._backfill(symbol, start, backend)
+                return
+            if bars is None:
+                return
+
+        last_stored = bars['date'][-1]
+        if last_stored >= np.datetime64(last_session, 'D'):
+            return
+        if time.time() - self._last_checked.get(symbol, 0.0) < self.recheck_seconds:
+            return
+
+        # Re-request the last stored bar too, to detect re-adjusted history
+        last_stored_date = last_stored.astype(date)
+        annotate(source='network')
+        new_bars = _to_records(backend.get_history(symbol, start=last_stored_date), last_session)
+        self._last_checked[symbol] = time.time()
+
+        if len(new_bars) == 0:
+            return
+        if new_bars['date'][0] == last_stored:
+            overlap_close = new_bars['close'][0]
+            stored_close = bars['close'][-1]
+            if abs(overlap_close - stored_close) > ADJUSTMENT_TOLERANCE * abs(stored_close):
+                self._backfill(symbol, bars['date'][0].astype(date), backend)
+                return
+        new_bars = new_bars[new_bars['date'] > last_stored]
+        if len(new_bars):
+            with open(self._path(symbol), 'ab') as f:
+                f.write(new_bars.tobytes())
+            self._notify(symbol, new_bars, rewritten=False)
+
+    def _backfill(self, symbol: str, start: date, backend) -> None:
+        """Download full history from `start` (at least the backfill period) and rewrite the file"""
+        start = min(start, period_start(self.backfill_period))
+        annotate(source='network')
+        bars = _to_records(backend.get_history(symbol, start=start), last_complete_session())
+        self._last_checked[symbol] = time.time()
+        self._backfilled_from[symbol] = start
+        if len(bars) == 0:
+            return
+
+        path = self._path(symbol)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(bars.tobytes())
+        os.replace(tmp_path, path)
+        self._notify(symbol, bars, rewritten=True)
+
+    def _notify(self, symbol: str, bars: np.ndarray, rewritten: bool) -> None:
+        for listener in self._listeners:
+            listener(symbol, bars, rewritten)
+
+    def _path(self, symbol: str) -> str:
+        safe = symbol.upper().replace('/', '_')
+        return os.path.join(self.root_dir, f"{safe}.bars")
+
+    def _lock_for(self, symbol: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(symbol)
+            if lock is None:
+                lock = self._locks[symbol] = threading.Lock()
+            return lock
+
+
+def period_start(period: str, today: Optional[date] = None) -> date:
+    """First calendar date covered by a yfinance-style period string ('3mo', '1y', ...)"""
+    today = today or date.today()
+    for unit, name in _PERIOD_UNITS.items():
+        if period.endswith(unit) and period[:-len(unit)].isdigit():
+            offset = pd.DateOffset(**{name: int(period[:-len(unit)])})
+            return (pd.Timestamp(today) - offset).date()
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def last_complete_session(now: Optional[datetime] = None) -> date:
+    """Most recent weekday whose regular session has closed (holidays not modelled)"""
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp.now(tz=MARKET_TIMEZONE)
+    if now.tzinfo is None:
+        now = now.tz_localize(MARKET_TIMEZONE)
+    else:
+        now = now.tz_convert(MARKET_TIMEZONE)
+
+    session = now.date()
+    if (now.hour, now.minute) < SESSION_CLOSE:
+        session -= timedelta(days=1)
+    while session.weekday() >= 5:
+        session -= timedelta(days=1)
+    return session
+
+
+def _to_records(hist: pd.DataFrame, last_session: date) -> np.ndarray:
+    """Convert a yfinance history frame into completed-bar records"""
+    if hist is None or len(hist) == 0:
+        return np.empty(0, dtype=BAR_DTYPE)
+
+    index = hist.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    dates = index.normalize().values.astype('datetime64[D]')
+
+    bars = np.empty(len(hist), dtype=BAR_DTYPE)
+    bars['date'] = dates
+    bars['open'] = hist['Open'].to_numpy(dtype='f8')
+    bars['high'] = hist['High'].to_numpy(dtype='f8')
+    bars['low'] = hist['Low'].to_numpy(dtype='f8')
+    bars['close'] = hist['Close'].to_numpy(dtype='f8')
+    bars['volume'] = hist['Volume'].to_numpy(dtype='f8') if 'Volume' in hist else 0.0
+
+    bars = bars[bars['date'] <= np.datetime64(last_session, 'D')]
+    _, unique_index = np.unique(bars['date'], return_index=True)
+    return bars[unique_index]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_store() -> PriceHistoryStore:
+    """Return the process-wide price store rooted at PRICE_STORE_DIR"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                root_dir = os.environ.get(
+                    'PRICE_STORE_DIR',
+                    os.path.join(tempfile.gettempdir(), 'investment_price_store')
+                )
+                _store = PriceHistoryStore(root_dir)
+    return _store
@@ -1,103 +1,171 @@
-# src/utils/query_parser_fixed.py - Fixed with between pattern
+# src/utils/query_parser_fixed.py - Single-pass query parser with memoized results
 import re
-from typing import Dict, List, Any
+from functools import lru_cache
+from typing import Dict, List, Any, Tuple
+
+from utils.screening_engine import UniverseSnapshot, screen
+
+# Flag criteria: a flag is set when any keyword appears anywhere in the query
+KEYWORD_CRITERIA = {
+    'dividend': ['dividend', 'yield', 'income'],
+    'growth': ['growth', 'growing', 'expanding'],
+    'value': ['value', 'cheap', 'undervalued'],
+    'large_cap': ['large cap', 'big', 'established', 'blue chip'],
+    'tech': ['tech', 'technology', 'software', 'ai', 'artificial intelligence'],
+    'financial': ['bank', 'financial', 'finance', 'insurance'],
+    'healthcare': ['health', 'pharma', 'medical', 'biotech'],
+    'energy': ['energy', 'oil', 'gas', 'renewable']
+}
+
+# Numeric criteria: alternatives are tried left to right, first match wins
+NUMERIC_CRITERIA = {
+    'price_under': [r'price under \$?(\d+)', r'under \$(\d+)', r'below \$(\d+)', r'less than \$(\d+)'],
+    'price_over': [r'price over \$?(\d+)', r'over \$(\d+)', r'above \$(\d+)', r'more than \$(\d+)'],
+    'price_between': [r'between \$?(\d+) and \$?(\d+)'],
+    'pe_under': [r'pe under (\d+)', r'p/e under (\d+)', r'pe below (\d+)', r'p/e below (\d+)'],
+    'yield_over': [r'yield over (\d+)', r'yield above (\d+)', r'dividend over (\d+)'],
+    'count': [r'top (\d+)', r'show (\d+)', r'(\d+) stocks']
+}
+
+# Phrases that pick the screener's sort order and universe
+SORT_HINTS = {
+    'dividend_yield': ['dividend', 'yield'],
+    'pe_ratio': ['lowest pe', 'value']
+}
+UNIVERSE_HINTS = {
+    'dividend': ['dividend', 'yield'],
+    'tech': ['tech']
+}
+
+# Kept for callers that inspect the raw patterns
+CRITERIA_PATTERNS = dict(
+    {name: '|'.join(words) for name, words in KEYWORD_CRITERIA.items()},
+    **{name: '|'.join(patterns) for name, patterns in NUMERIC_CRITERIA.items() if name != 'count'}
+)
+
+DEFAULT_REQUESTED_COUNT = 8
+PARSE_CACHE_SIZE = 1024
+
+# Opening parenthesis of an unnamed capturing group
+_CAPTURE_GROUP = re.compile(r'\((?!\?)')
+_DIGIT = re.compile(r'\d')
+
+
+def _keyword_tags(phrase: str) -> Tuple[frozenset, frozenset, frozenset]:
+    """Flags, sort hints and universe hints implied by `phrase` as a substring match"""
+    flags = frozenset(name for name, words in KEYWORD_CRITERIA.items() if any(w in phrase for w in words))
+    sorts = frozenset(name for name, words in SORT_HINTS.items() if any(w in phrase for w in words))
+    universes = frozenset(name for name, words in UNIVERSE_HINTS.items() if any(w in phrase for w in words))
+    return flags, sorts, universes
+
+
+def _build_scanner():
+    """Compile every numeric criterion into one alternation with named value groups.
+
+    The alternation sits inside a lookahead, so one left-to-right scan sees
+    a match at every position and overlapping phrases ('lowest pe under 20')
+    are all found, as with the old per-pattern searches.
+    """
+    branches = []
+    numeric_groups = {}
+    for criterion, patterns in NUMERIC_CRITERIA.items():
+        for i, pattern in enumerate(patterns):
+            group = f"{criterion}__{i}"
+            value_groups = []
+
+            def name_value_group(match, group=group, value_groups=value_groups):
+                value_group = f"{group}__v{len(value_groups)}"
+                value_groups.append(value_group)
+                return f"(?P<{value_group}>"
+
+            # Branches stay non-capturing so the regex engine keeps its literal-prefix
+            # fast path; the last value group to close identifies the branch
+            named_pattern = _CAPTURE_GROUP.sub(name_value_group, pattern)
+            branches.append(f"(?:{named_pattern})")
+            numeric_groups[value_groups[-1]] = (criterion, value_groups)
+
+    return re.compile(f"(?=(?:{'|'.join(branches)}))"), numeric_groups
+
+
+def _build_keyword_table() -> Tuple[Tuple[str, Tuple[frozenset, frozenset, frozenset]], ...]:
+    """Every distinct keyword with the flags and hints it implies, checked once per query"""
+    keywords = {word for words in KEYWORD_CRITERIA.values() for word in words}
+    keywords |= {word for hints in (SORT_HINTS, UNIVERSE_HINTS) for words in hints.values() for word in words}
+    return tuple((word, _keyword_tags(word)) for word in sorted(keywords))
+
+
+_SCANNER, _NUMERIC_GROUPS = _build_scanner()
+_KEYWORD_TABLE = _build_keyword_table()
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace; the memoization key for parsing"""
+    return ' '.join(query.lower().split())
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_normalized(query_lower: str) -> Tuple[Tuple[str, Any], ...]:
+    flags, sorts, universes = set(), set(), set()
+    numbers = {}
+
+    for word, (word_flags, word_sorts, word_universes) in _KEYWORD_TABLE:
+        if word in query_lower:
+            flags |= word_flags
+            sorts |= word_sorts
+            universes |= word_universes
+
+    # Numeric patterns all need a digit, so most plain-keyword queries skip the scan
+    if _DIGIT.search(query_lower):
+        for match in _SCANNER.finditer(query_lower):
+            criterion, value_groups = _NUMERIC_GROUPS[match.lastgroup]
+            numbers.setdefault(criterion, [match.group(g) for g in value_groups])
+
+    criteria = {name: True for name in KEYWORD_CRITERIA if name in flags}
+
+    # Later criteria override earlier ones, matching the original pattern order
+    if 'price_under' in numbers:
+        criteria['max_price'] = float(numbers['price_under'][0])
+    if 'price_over' in numbers:
+        criteria['min_price'] = float(numbers['price_over'][0])
+    if 'price_between' in numbers:
+        low, high = numbers['price_between']
+        criteria['min_price'] = float(low)
+        criteria['max_price'] = float(high)
+    if 'pe_under' in numbers:
+        criteria['max_pe'] = float(numbers['pe_under'][0])
+    if 'yield_over' in numbers:
+        criteria['min_dividend_yield'] = float(numbers['yield_over'][0])
+
+    criteria['requested_count'] = int(numbers['count'][0]) if 'count' in numbers else DEFAULT_REQUESTED_COUNT
+    criteria['sort_by'] = next((name for name in SORT_HINTS if name in sorts), 'market_cap')
+    criteria['universe'] = next((name for name in UNIVERSE_HINTS if name in universes), 'default')
+
+    return tuple(criteria.items())
+
+
+def parse_query(query: str) -> Dict[str, Any]:
+    """Parse natural language query into structured criteria (memoized)"""
+    criteria = dict(_parse_normalized(normalize_query(query)))
+    criteria['original_query'] = query
+    return criteria
+
+
+def parse_cache_info():
+    """Hit/miss statistics of the parse memo"""
+    return _parse_normalized.cache_info()
+
 
 class QueryParser:
     """Parse natural language investment queries into screening criteria"""
-    
+
     def __init__(self):
-        self.criteria_patterns = {
-            'dividend': r'dividend|yield|income',
-            'growth': r'growth|growing|expanding',
-            'value': r'value|cheap|undervalued',
-            'large_cap': r'large cap|big|established|blue chip',
-            'tech': r'tech|technology|software|ai|artificial intelligence',
-            'financial': r'bank|financial|finance|insurance',
-            'healthcare': r'health|pharma|medical|biotech',
-            'energy': r'energy|oil|gas|renewable',
-            'price_under': r'price under \$?(\d+)|under \$(\d+)|below \$(\d+)|less than \$(\d+)',
-            'price_over': r'price over \$?(\d+)|over \$(\d+)|above \$(\d+)|more than \$(\d+)',
-            'price_between': r'between \$?(\d+) and \$?(\d+)',
-            'pe_under': r'pe under (\d+)|p/e under (\d+)|pe below (\d+)|p/e below (\d+)',
-            'yield_over': r'yield over (\d+)|yield above (\d+)|dividend over (\d+)'
-        }
-    
+        self.criteria_patterns = CRITERIA_PATTERNS
+
     def parse_query(self, query: str) -> Dict[str, Any]:
         """Parse natural language query into structured criteria"""
-        query_lower = query.lower()
-        criteria = {}
-        
-        for criterion, pattern in self.criteria_patterns.items():
-            if re.search(pattern, query_lower):
-                if criterion == 'price_under':
-                    match = re.search(pattern, query_lower)
-                    if match:
-                        price = next((group for group in match.groups() if group), None)
-                        criteria['max_price'] = float(price) if price else None
-                elif criterion == 'price_over':
-                    match = re.search(pattern, query_lower)
-                    if match:
-                        price = next((group for group in match.groups() if group), None)
-                        criteria['min_price'] = float(price) if price else None
-                elif criterion == 'price_between':
-                    match = re.search(pattern, query_lower)
-                    if match:
-                        min_price = match.group(1)
-                        max_price = match.group(2)
-                        criteria['min_price'] = float(min_price) if min_price else None
-                        criteria['max_price'] = float(max_price) if max_price else None
-                elif criterion == 'pe_under':
-                    match = re.search(pattern, query_lower)
-                    if match:
-                        pe = next((group for group in match.groups() if group), None)
-                        criteria['max_pe'] = float(pe) if pe else None
-                elif criterion == 'yield_over':
-                    match = re.search(pattern, query_lower)
-                    if match:
-                        yield_val = next((group for group in match.groups() if group), None)
-                        criteria['min_dividend_yield'] = float(yield_val) if yield_val else None
-                else:
-                    criteria[criterion] = True
-        
-        criteria['original_query'] = query
-        return criteria
-    
+        return parse_query(query)
+
     def apply_filters(self, stocks: List[Dict], criteria: Dict) -> List[Dict]:
         """Apply parsed criteria to filter stock list"""
-        filtered_stocks = []
-        
-        for stock in stocks:
-            include_stock = True
-            
-            if criteria.get('max_price') and stock.get('price'):
-                if stock['price'] > criteria['max_price']:
-                    include_stock = False
-            
-            if criteria.get('min_price') and stock.get('price'):
-                if stock['price'] < criteria['min_price']:
-                    include_stock = False
-            
-            if criteria.get('max_pe') and stock.get('pe_ratio'):
-                if stock['pe_ratio'] > criteria['max_pe']:
-                    include_stock = False
-            
-            if criteria.get('min_dividend_yield') and stock.get('dividend_yield'):
-                if stock['dividend_yield'] < criteria['min_dividend_yield']:
-                    include_stock = False
-            
-            if criteria.get('dividend'):
-                if not stock.get('dividend_yield') or stock['dividend_yield'] < 1:
-                    include_stock = False
-            
-            sector = stock.get('sector', '').lower()
-            if criteria.get('tech') and 'technology' not in sector:
-                include_stock = False
-            if criteria.get('financial') and 'financial' not in sector:
-                include_stock = False
-            if criteria.get('healthcare') and 'healthcare' not in sector:
-                include_stock = False
-            
-            if include_stock:
-                filtered_stocks.append(stock)
-        
-        return filtered_stocks
+        snapshot = UniverseSnapshot(stocks)
+        return snapshot.select(screen(snapshot, criteria, sort_by=None))
@@ -0,0 +1,331 @@
+# src/utils/quote_stream.py - Live last-price board kept current by a background quote feed
+"""In-memory last prices for the active universe, streamed in the background.
+
+`QuoteBoard` holds one slot per tracked symbol in NumPy arrays (last price,
+time of the update), so a screen reads hundreds of prices with one
+vectorized freshness check instead of refetching `.info` payloads.
+`QuoteStream` runs a feed on a daemon thread that writes into the board:
+
+  - ReplayFeed: plays a local JSON-lines file of {"t", "symbol", "price"}
+    records with their original spacing (tests, demos, benchmarks)
+  - PollingFeed: asks the market data backend's `get_quotes` every
+    interval (MARKET_DATA_BACKEND=http)
+  - WebSocketFeed: a JSON quote websocket (needs the `websockets` package)
+
+QUOTE_FEED selects the feed ('off' by default, 'replay', 'poll' or
+'websocket'); see `get_quote_stream`. Prices older than QUOTE_MAX_AGE
+seconds are not served, so callers fall back to the fundamentals payload.
+"""
+import importlib.util
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+FEEDS = ('off', 'replay', 'poll', 'websocket')
+
+# Board prices older than this are treated as missing
+DEFAULT_MAX_AGE = 1.0
+DEFAULT_POLL_INTERVAL = 0.5
+
+# Pause before restarting a feed that failed or disconnected
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+# Quote payload keys holding the last trade price, in order of preference
+PRICE_KEYS = ('regularMarketPrice', 'currentPrice', 'price', 'lastPrice')
+
+
+class QuoteBoard:
+    """Last price and update time per tracked symbol, as parallel NumPy arrays"""
+
+    def __init__(self, symbols: Iterable[str] = ()):
+        self._index: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        self.prices = np.empty(0, dtype=np.float64)
+        self.updated_at = np.empty(0, dtype=np.float64)
+        self.updates = 0
+        self._lock = threading.Lock()
+        # Bumped whenever symbols are added, so feeds know to (re)subscribe
+        self.version = 0
+        self._listeners: List[Callable[[str, float], None]] = []
+        self.track(symbols)
+
+    def add_listener(self, listener: Callable[[str, float], None]) -> None:
+        """Call `listener(symbol, price)` after every update"""
+        self._listeners.append(listener)
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    @property
+    def symbols(self) -> List[str]:
+        with self._lock:
+            return list(self._symbols)
+
+    def track(self, symbols: Iterable[str]) -> List[str]:
+        """Add slots for symbols not on the board yet; returns the ones added"""
+        with self._lock:
+            added = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self._index]
+            if not added:
+                return []
+            for symbol in added:
+                self._index[symbol] = len(self._symbols)
+                self._symbols.append(symbol)
+            # Grow by copy so readers holding the old arrays never see a partial resize
+            self.prices = np.concatenate([self.prices, np.full(len(added), np.nan)])
+            self.updated_at = np.concatenate([self.updated_at, np.zeros(len(added))])
+            self.version += 1
+            return added
+
+    def update(self, symbol: str, price: float, timestamp: Optional[float] = None) -> None:
+        """Record a trade price; untracked symbols are added"""
+        slot = self._index.get(symbol)
+        if slot is None:
+            self.track([symbol])
+            slot = self._index[symbol]
+        with self._lock:
+            self.prices[slot] = price
+            self.updated_at[slot] = timestamp if timestamp is not None else time.time()
+            self.updates += 1
+        for listener in self._listeners:
+            listener(symbol, price)
+
+    def fresh_prices(self, symbols: Iterable[str], max_age: float, now: Optional[float] = None) -> Dict[str, float]:
+        """Prices of `symbols` updated within `max_age` seconds (stale and unknown symbols omitted)"""
+        symbols = list(symbols)
+        now = now if now is not None else time.time()
+        with self._lock:
+            prices, updated_at = self.prices, self.updated_at
+            slots = np.array([self._index.get(symbol, -1) for symbol in symbols], dtype=np.intp)
+        known = slots >= 0
+        fresh = np.zeros(len(symbols), dtype=bool)
+        fresh[known] = (now - updated_at[slots[known]] <= max_age) & (prices[slots[known]] > 0)
+        return {symbols[i]: float(prices[slots[i]]) for i in np.flatnonzero(fresh)}
+
+    def stats(self, max_age: float) -> Dict[str, float]:
+        with self._lock:
+            updated_at, updates = self.updated_at, self.updates
+        now = time.time()
+        seen = updated_at > 0
+        return {
+            'symbols': len(updated_at),
+            'fresh': int(np.count_nonzero(seen & (now - updated_at <= max_age))),
+            'updates': updates,
+            'oldest_age_s': round(float(now - updated_at[seen].min()), 3) if seen.any() else None
+        }
+
+
+class ReplayFeed:
+    """Replays recorded quotes from a JSON-lines file, stamped with the current time.
+
+    Each line is {"t": seconds, "symbol": ..., "price": ...}; `t` only sets
+    the spacing between records (divided by `speed`). With `loop`, the file
+    starts over when it ends.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+
+    def run(self, board: QuoteBoard, stop: threading.Event) -> None:
+        records = self._load()
+        if not records:
+            raise ValueError(f"No quotes in replay file {self.path}")
+        while not stop.is_set():
+            previous = records[0]['t']
+            for record in records:
+                delay = (record['t'] - previous) / self.speed if self.speed else 0.0
+                previous = record['t']
+                if delay > 0 and stop.wait(delay):
+                    return
+                board.update(record['symbol'], float(record['price']))
+            if not self.loop:
+                stop.wait()
+                return
+
+    def _load(self) -> List[Dict]:
+        with open(self.path) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        return sorted(records, key=lambda record: record['t'])
+
+
+class PollingFeed:
+    """Pulls quotes for every tracked symbol from `backend.get_quotes` each interval"""
+
+    def __init__(self, backend, interval: float = DEFAULT_POLL_INTERVAL):
+        if not callable(getattr(backend, 'get_quotes', None)):
+            raise ValueError("The polling quote feed needs a backend with get_quotes (MARKET_DATA_BACKEND=http)")
+        self.backend = backend
+        self.interval = interval
+
+    def run(self, board: QuoteBoard, stop: threading.Event) -> None:
+        while not stop.is_set():
+            started = time.monotonic()
+            symbols = board.symbols
+            if symbols:
+                now = time.time()
+                for symbol, quote in self.backend.get_quotes(symbols).items():
+                    price = quote_price(quote)
+                    if price is not None:
+                        board.update(symbol, price, now)
+            stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+
+class WebSocketFeed:
+    """Streams JSON quotes from a websocket.
+
+    On connect, and whenever symbols are added to the board, it sends
+    {"subscribe": [symbols]}. Each incoming message is one quote object or a
+    list of them, with "symbol" and a price under one of PRICE_KEYS.
+    """
+
+    def __init__(self, url: str, receive_timeout: float = 1.0):
+        if importlib.util.find_spec('websockets') is None:
+            raise ImportError("QUOTE_FEED=websocket needs the 'websockets' package")
+        self.url = url
+        self.receive_timeout = receive_timeout
+
+    def run(self, board: QuoteBoard, stop: threading.Event) -> None:
+        from websockets.sync.client import connect
+
+        with connect(self.url) as socket:
+            subscribed_version = -1
+            while not stop.is_set():
+                if board.version != subscribed_version:
+                    subscribed_version = board.version
+                    socket.send(json.dumps({'subscribe': board.symbols}))
+                try:
+                    message = socket.recv(timeout=self.receive_timeout)
+                except TimeoutError:
+                    continue
+                now = time.time()
+                payload = json.loads(message)
+                for quote in payload if isinstance(payload, list) else [payload]:
+                    price = quote_price(quote)
+                    if quote.get('symbol') and price is not None:
+                        board.update(quote['symbol'], price, now)
+
+
+class QuoteStream:
+    """A QuoteBoard kept current by `feed` on a background thread; restarts the feed if it fails"""
+
+    def __init__(self, feed, max_age: float = DEFAULT_MAX_AGE, board: Optional[QuoteBoard] = None):
+        self.feed = feed
+        self.max_age = max_age
+        self.board = board or QuoteBoard()
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'QuoteStream':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='quote-stream', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def track(self, symbols: Iterable[str]) -> None:
+        """Add symbols to the streamed universe"""
+        self.board.track(symbols)
+
+    def live_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        """Fresh board prices for `symbols` (tracking any not yet streamed)"""
+        symbols = list(symbols)
+        self.track(symbols)
+        return self.board.fresh_prices(symbols, self.max_age)
+
+    def status(self) -> Dict:
+        return dict(
+            self.board.stats(self.max_age),
+            feed=type(self.feed).__name__,
+            running=self._thread is not None and self._thread.is_alive(),
+            errors=self.errors,
+            last_error=self.last_error
+        )
+
+    def _run(self) -> None:
+        delay = RECONNECT_DELAY
+        while not self._stop.is_set():
+            try:
+                self.feed.run(self.board, self._stop)
+                delay = RECONNECT_DELAY
+            except Exception as e:
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Quote feed failed, restarting in {delay:.0f}s: {self.last_error}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+def quote_price(quote: Dict) -> Optional[float]:
+    """Last trade price of a quote payload (None if it has none)"""
+    for key in PRICE_KEYS:
+        value = quote.get(key)
+        if isinstance(value, (int, float)) and value > 0:
+            return float(value)
+    return None
+
+
+def live_prices(symbols: Iterable[str]) -> Dict[str, float]:
+    """Fresh streamed prices for `symbols`; empty when no quote feed is configured"""
+    stream = get_quote_stream()
+    if stream is None:
+        return {}
+    return stream.live_prices(symbols)
+
+
+def create_feed(name: str):
+    """Build the QUOTE_FEED feed from its environment variables"""
+    if name == 'replay':
+        path = os.environ.get('QUOTE_REPLAY_FILE')
+        if not path:
+            raise ValueError("QUOTE_FEED=replay needs QUOTE_REPLAY_FILE")
+        return ReplayFeed(path, speed=float(os.environ.get('QUOTE_REPLAY_SPEED', '1.0')))
+    if name == 'poll':
+        from utils.market_data import get_provider
+        return PollingFeed(get_provider().backend, float(os.environ.get('QUOTE_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)))
+    if name == 'websocket':
+        url = os.environ.get('QUOTE_FEED_URL')
+        if not url:
+            raise ValueError("QUOTE_FEED=websocket needs QUOTE_FEED_URL")
+        return WebSocketFeed(url)
+    raise ValueError(f"Unknown quote feed: {name} (expected one of {', '.join(FEEDS)})")
+
+
+_stream = None
+_stream_configured = False
+_stream_lock = threading.Lock()
+
+
+def get_quote_stream() -> Optional[QuoteStream]:
+    """Return the process-wide quote stream (None while QUOTE_FEED is 'off' or unset)"""
+    global _stream, _stream_configured
+    if not _stream_configured:
+        with _stream_lock:
+            if not _stream_configured:
+                name = os.environ.get('QUOTE_FEED', 'off').lower() or 'off'
+                if name != 'off':
+                    max_age = float(os.environ.get('QUOTE_MAX_AGE', DEFAULT_MAX_AGE))
+                    _stream = QuoteStream(create_feed(name), max_age=max_age).start()
+                _stream_configured = True
+    return _stream
+
+
+def set_quote_stream(stream: Optional[QuoteStream]) -> None:
+    """Replace the process-wide quote stream (e.g. with a replay in tests); None disables it"""
+    global _stream, _stream_configured
+    with _stream_lock:
+        if _stream is not None and _stream is not stream:
+            _stream.stop()
+        _stream = stream
+        _stream_configured = True
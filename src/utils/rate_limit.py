@@ -0,0 +1,334 @@
+# src/utils/rate_limit.py - Adaptive rate limiting, circuit breaking and per-agent fetch metrics
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+# Requests per second the limiter starts at and may recover to
+DEFAULT_RATE = 8.0
+DEFAULT_BURST = 16
+MIN_RATE = 0.5
+
+# AIMD: halve the rate on throttling, add this much per successful request
+BACKOFF_FACTOR = 0.5
+RECOVERY_STEP = 0.1
+
+# Longest a request waits for a token before failing fast
+DEFAULT_MAX_WAIT = 10.0
+
+# Consecutive throttled/failed upstream calls that trip the breaker, and how long it stays open
+FAILURE_THRESHOLD = 5
+COOLDOWN_SECONDS = 30.0
+
+THROTTLE_STATUSES = {429}
+
+UNATTRIBUTED = 'unattributed'
+
+_current_agent: ContextVar[str] = ContextVar('market_data_agent', default=UNATTRIBUTED)
+
+
+class MarketDataUnavailable(Exception):
+    """The upstream is throttling or the breaker is open; cached data may be served instead"""
+
+
+class CircuitOpenError(MarketDataUnavailable):
+    pass
+
+
+class RateLimitTimeout(MarketDataUnavailable):
+    pass
+
+
+class UpstreamThrottled(MarketDataUnavailable):
+    pass
+
+
+@contextmanager
+def agent_scope(name: str):
+    """Attribute market data requests made inside the block to agent `name`"""
+    token = _current_agent.set(name)
+    try:
+        yield
+    finally:
+        _current_agent.reset(token)
+
+
+def current_agent() -> str:
+    return _current_agent.get()
+
+
+def classify_error(error: BaseException) -> str:
+    """'throttled' for 429/rate-limit errors, 'server' for 5xx, 'other' otherwise.
+
+    Works across backends: httpx and requests errors carry a response with
+    a status code, and yfinance raises YFRateLimitError.
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'status_code', None)
+    if status in THROTTLE_STATUSES or 'RateLimit' in type(error).__name__ or 'Too Many Requests' in str(error):
+        return 'throttled'
+    if isinstance(status, int) and status >= 500:
+        return 'server'
+    return 'other'
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate backs off on throttling and creeps back up.
+
+    `acquire` reserves a token and sleeps until it is due, so concurrent
+    callers are spaced out in arrival order. `throttled` halves the rate
+    (down to `min_rate`) and can pause everyone for a Retry-After period;
+    each `succeeded` call adds `recovery_step` back, up to `max_rate`.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST, min_rate: float = MIN_RATE,
+                 max_wait: float = DEFAULT_MAX_WAIT):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_wait = max_wait
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+
+    def acquire(self, abort: Optional[Callable[[], bool]] = None) -> float:
+        """Wait for a token; returns seconds waited.
+
+        Raises RateLimitTimeout if the token is more than `max_wait` away.
+        Waiters re-check `abort` whenever `wake()` is called and, if it
+        returns True, hand their token back and raise RateLimitTimeout.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1.0
+            wait = max(0.0, -self._tokens / self.rate, self._paused_until - now)
+            if wait > self.max_wait:
+                self._tokens += 1.0
+                raise RateLimitTimeout(f"Market data rate limit: next slot in {wait:.1f}s")
+
+        deadline = now + wait
+        with self._wakeup:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return wait
+                if abort is not None and abort():
+                    with self._lock:
+                        self._tokens += 1.0
+                    raise RateLimitTimeout("Market data request abandoned while waiting for a token")
+                self._wakeup.wait(remaining)
+
+    def wake(self) -> None:
+        """Make waiting callers re-check their abort condition"""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def throttled(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate * BACKOFF_FACTOR)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def succeeded(self) -> None:
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + RECOVERY_STEP)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive upstream failures.
+
+    While open every call fails fast. After `cooldown` seconds one probe is
+    let through (half-open); its success closes the breaker, a failure
+    re-opens it for another cooldown. A probe that never reached the
+    upstream hands its slot back with `abort_probe`.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, cooldown: float = COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def abort_probe(self) -> None:
+        """Release the half-open probe slot of a call that never reached the upstream"""
+        with self._lock:
+            if self.state == 'half_open':
+                self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if this one tripped the breaker"""
+        with self._lock:
+            self.failures += 1
+            if self.state != 'half_open' and self.failures < self.failure_threshold:
+                return False
+            tripped = self.state != 'open'
+            if tripped:
+                self.trips += 1
+            self.state = 'open'
+            self._opened_at = time.monotonic()
+            self._probing = False
+            return tripped
+
+
+class FetchMetrics:
+    """Per-agent counters of upstream requests, throttling and degraded responses"""
+
+    COUNTERS = ('requests', 'throttled', 'server_errors', 'rejected', 'stale_served', 'wait_seconds')
+
+    def __init__(self):
+        self._agents: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, counter: str, amount: float = 1, agent: Optional[str] = None) -> None:
+        agent = agent or current_agent()
+        with self._lock:
+            counters = self._agents.get(agent)
+            if counters is None:
+                counters = self._agents[agent] = dict.fromkeys(self.COUNTERS, 0)
+            counters[counter] += amount
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {agent: dict(counters) for agent, counters in self._agents.items()}
+
+
+class GuardedBackend:
+    """Wraps a market data backend with the limiter, breaker and metrics.
+
+    Every backend method goes through `call`: it fails fast with
+    CircuitOpenError while the breaker is open, waits for a rate-limit
+    token, and turns throttling and 5xx responses into UpstreamThrottled
+    after backing the limiter off. Other errors (e.g. an unknown symbol)
+    pass through untouched and do not count against the breaker.
+    """
+
+    def __init__(self, backend, limiter: AdaptiveRateLimiter, breaker: CircuitBreaker, metrics: FetchMetrics):
+        self.backend = backend
+        self.limiter = limiter
+        self.breaker = breaker
+        self.metrics = metrics
+
+    def get_info(self, symbol: str) -> Dict:
+        return self.call(self.backend.get_info, symbol)
+
+    def get_history(self, symbol: str, period: Optional[str] = None, start=None):
+        return self.call(self.backend.get_history, symbol, period=period, start=start)
+
+    def __getattr__(self, name: str):
+        # Optional backend methods (e.g. get_quotes) are guarded the same way
+        method = getattr(self.backend, name)
+        if not callable(method):
+            return method
+        return lambda *args, **kwargs: self.call(method, *args, **kwargs)
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        if not self.breaker.allow():
+            self.metrics.record('rejected')
+            raise CircuitOpenError("Market data source unavailable; circuit breaker is open")
+        try:
+            # Queued calls give up as soon as the breaker trips
+            waited = self.limiter.acquire(abort=lambda: self.breaker.state == 'open')
+        except RateLimitTimeout:
+            # Neither outcome will be recorded, so a half-open probe must give its slot back
+            self.breaker.abort_probe()
+            self.metrics.record('rejected')
+            raise
+        self.metrics.record('wait_seconds', waited)
+        self.metrics.record('requests')
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            kind = classify_error(e)
+            if kind == 'other':
+                self.breaker.record_success()
+                raise
+            self.metrics.record('throttled' if kind == 'throttled' else 'server_errors')
+            self.limiter.throttled(_retry_after(e))
+            if self.breaker.record_failure():
+                self.limiter.wake()
+            raise UpstreamThrottled(f"Market data source {kind}: {e}") from e
+
+        self.limiter.succeeded()
+        self.breaker.record_success()
+        return result
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+_guard = None
+_guard_lock = threading.Lock()
+
+
+def get_guard() -> Dict[str, Any]:
+    """Process-wide limiter, breaker and metrics (MARKET_DATA_RATE_LIMIT sets requests/second)"""
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                rate = float(os.environ.get('MARKET_DATA_RATE_LIMIT', DEFAULT_RATE))
+                _guard = {
+                    'limiter': AdaptiveRateLimiter(rate=rate, burst=max(1, int(rate * 2))),
+                    'breaker': CircuitBreaker(),
+                    'metrics': FetchMetrics()
+                }
+    return _guard
+
+
+def guard_backend(backend) -> GuardedBackend:
+    """Wrap `backend` with the process-wide limiter, breaker and metrics"""
+    guard = get_guard()
+    return GuardedBackend(backend, guard['limiter'], guard['breaker'], guard['metrics'])
+
+
+def guard_status() -> Dict[str, Any]:
+    """Limiter rate, breaker state and per-agent metrics, for health endpoints"""
+    guard = get_guard()
+    return {
+        'rate_limit': round(guard['limiter'].rate, 3),
+        'circuit': guard['breaker'].state,
+        'circuit_trips': guard['breaker'].trips,
+        'agents': guard['metrics'].snapshot()
+    }
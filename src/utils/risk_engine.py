@@ -0,0 +1,198 @@
+# src/utils/risk_engine.py - Return-based portfolio risk: covariance, risk contributions, VaR/CVaR
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from utils.tracing import span
+
+TRADING_DAYS = 252
+DEFAULT_PERIOD = '1y'
+DEFAULT_CONFIDENCE = 0.95
+
+# Holdings with fewer aligned daily returns than this are left out of the matrix
+MIN_OBSERVATIONS = 60
+
+# Holdings whose history starts more than this many days after the period
+# start (e.g. recent listings) are left out rather than truncating the window
+MAX_START_LAG_DAYS = 10
+
+
+class ReturnsMatrix:
+    """Daily simple returns of several symbols on their common trading dates.
+
+    `returns` is a (dates x symbols) float64 matrix on the dates every kept
+    symbol traded. Symbols that could not be loaded, have too little history
+    or only start trading well into the period are listed in `missing` with
+    a reason instead of shrinking everyone else's window.
+    """
+
+    def __init__(self, symbols: List[str], dates: np.ndarray, returns: np.ndarray, missing: Dict[str, str]):
+        self.symbols = symbols
+        self.dates = dates
+        self.returns = returns
+        self.missing = missing
+
+    def __len__(self) -> int:
+        return self.returns.shape[0]
+
+
+def load_returns(symbols: Iterable[str], period: str = DEFAULT_PERIOD, provider=None) -> ReturnsMatrix:
+    """Fetch closes for every symbol and align them into one returns matrix"""
+    if provider is None:
+        from utils.market_data import get_provider
+        provider = get_provider()
+
+    from utils.price_store import period_start
+
+    closes = provider.fetch_closes(symbols, period)
+    latest_start = np.datetime64(period_start(period), 'D') + np.timedelta64(MAX_START_LAG_DAYS, 'D')
+    missing = {}
+    series = {}
+    for symbol, result in closes.items():
+        if isinstance(result, Exception):
+            missing[symbol] = str(result)
+        elif len(result[0]) <= MIN_OBSERVATIONS:
+            missing[symbol] = f"only {len(result[0])} days of history"
+        elif result[0][0] > latest_start:
+            missing[symbol] = f"history only starts on {result[0][0]}"
+        else:
+            series[symbol] = result
+
+    symbols = list(series)
+    if not symbols:
+        return ReturnsMatrix([], np.empty(0, dtype='datetime64[D]'), np.empty((0, 0)), missing)
+
+    # Inner join on dates: every row is a day on which all holdings traded
+    dates = series[symbols[0]][0]
+    for symbol in symbols[1:]:
+        dates = np.intersect1d(dates, series[symbol][0], assume_unique=True)
+
+    prices = np.empty((len(dates), len(symbols)))
+    for column, symbol in enumerate(symbols):
+        symbol_dates, symbol_closes = series[symbol]
+        prices[:, column] = symbol_closes[np.searchsorted(symbol_dates, dates)]
+
+    returns = prices[1:] / prices[:-1] - 1.0
+    return ReturnsMatrix(symbols, dates[1:], returns, missing)
+
+
+def covariance(returns: np.ndarray, halflife: Optional[float] = None,
+               shrinkage: Union[float, str, None] = None) -> np.ndarray:
+    """Daily covariance matrix of a (dates x assets) returns matrix.
+
+    `halflife` (in days) weights recent returns exponentially more, as in
+    RiskMetrics-style EWMA. `shrinkage` blends the sample estimate towards a
+    scaled identity: a float is the blend weight, 'ledoit_wolf' estimates it
+    (Ledoit & Wolf, 2004), which keeps the matrix well conditioned when there
+    are many holdings relative to the number of days.
+    """
+    observations = returns.shape[0]
+    if halflife:
+        ages = np.arange(observations - 1, -1, -1, dtype=np.float64)
+        weights = 0.5 ** (ages / halflife)
+    else:
+        weights = np.ones(observations)
+    weights /= weights.sum()
+
+    centered = returns - weights @ returns
+    cov = (centered * weights[:, None]).T @ centered
+    # Reliability-weights correction; equals T/(T-1) when unweighted
+    cov /= 1.0 - np.sum(weights ** 2)
+
+    if shrinkage == 'ledoit_wolf':
+        shrinkage = ledoit_wolf_intensity(returns)
+    if shrinkage:
+        target = np.eye(cov.shape[0]) * (np.trace(cov) / cov.shape[0])
+        cov = (1.0 - shrinkage) * cov + shrinkage * target
+    return cov
+
+
+def ledoit_wolf_intensity(returns: np.ndarray) -> float:
+    """Optimal shrinkage weight towards a scaled identity (Ledoit & Wolf, 2004)"""
+    observations, assets = returns.shape
+    centered = returns - returns.mean(axis=0)
+    sample = centered.T @ centered / observations
+    mu = np.trace(sample) / assets
+
+    d2 = np.sum((sample - mu * np.eye(assets)) ** 2) / assets
+    if d2 == 0:
+        return 0.0
+    # sum_t ||x_t x_t' - S||^2 expands to sum_t ||x_t||^4 - T ||S||^2
+    row_norms = np.sum(centered ** 2, axis=1)
+    b2_bar = (np.sum(row_norms ** 2) - observations * np.sum(sample ** 2)) / (observations ** 2 * assets)
+    return float(min(b2_bar, d2) / d2)
+
+
+def portfolio_risk(weights: np.ndarray, cov: np.ndarray, returns: Optional[np.ndarray] = None,
+                   confidence: float = DEFAULT_CONFIDENCE, horizon_days: int = 1) -> Dict:
+    """Volatility, risk contributions and VaR/CVaR of a weight vector.
+
+    VaR and CVaR are positive loss fractions over `horizon_days`. The
+    parametric figures assume normal returns with the sample mean; the
+    historical ones need `returns` and scale the daily quantile by
+    sqrt(horizon). Component contributions sum to the daily volatility.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    variance = float(weights @ cov @ weights)
+    daily_vol = np.sqrt(variance)
+
+    if daily_vol > 0:
+        marginal = cov @ weights / daily_vol
+    else:
+        marginal = np.zeros_like(weights)
+    component = weights * marginal
+
+    normal = NormalDist()
+    z = normal.inv_cdf(confidence)
+    mean = float(returns.mean(axis=0) @ weights) if returns is not None and len(returns) else 0.0
+    horizon_vol = daily_vol * np.sqrt(horizon_days)
+    horizon_mean = mean * horizon_days
+
+    risk = {
+        'daily_volatility': float(daily_vol),
+        'annual_volatility': float(daily_vol * np.sqrt(TRADING_DAYS)),
+        'marginal_contribution': marginal,
+        'component_contribution': component,
+        'percent_contribution': component / daily_vol if daily_vol > 0 else np.zeros_like(weights),
+        'confidence': confidence,
+        'horizon_days': horizon_days,
+        'parametric_var': float(z * horizon_vol - horizon_mean),
+        'parametric_cvar': float(horizon_vol * normal.pdf(z) / (1.0 - confidence) - horizon_mean)
+    }
+
+    if returns is not None and len(returns):
+        portfolio_returns = returns @ weights
+        cutoff = np.quantile(portfolio_returns, 1.0 - confidence)
+        scale = np.sqrt(horizon_days)
+        risk['historical_var'] = float(-cutoff * scale)
+        risk['historical_cvar'] = float(-portfolio_returns[portfolio_returns <= cutoff].mean() * scale)
+    return risk
+
+
+def analyze_portfolio(holdings: Dict[str, float], period: str = DEFAULT_PERIOD, halflife: Optional[float] = None,
+                      shrinkage: Union[float, str, None] = None, confidence: float = DEFAULT_CONFIDENCE,
+                      horizon_days: int = 1, provider=None) -> Dict:
+    """Load returns for `holdings` ({symbol: weight}) and compute their risk.
+
+    Weights are renormalised over the holdings that have enough history.
+    The result holds everything `portfolio_risk` returns plus 'symbols',
+    'weights', 'cov', 'returns' (the ReturnsMatrix) and 'missing'.
+    """
+    matrix = load_returns(holdings, period, provider)
+    if not matrix.symbols:
+        raise ValueError("No holdings have enough price history for risk analysis")
+
+    weights = np.array([holdings[symbol] for symbol in matrix.symbols], dtype=np.float64)
+    weights /= weights.sum()
+    with span('score.covariance_risk', assets=len(matrix.symbols)):
+        cov = covariance(matrix.returns, halflife, shrinkage)
+        risk = portfolio_risk(weights, cov, matrix.returns, confidence, horizon_days)
+    risk.update({
+        'symbols': matrix.symbols,
+        'weights': weights,
+        'cov': cov,
+        'returns': matrix,
+        'missing': matrix.missing
+    })
+    return risk
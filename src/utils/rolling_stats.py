@@ -0,0 +1,147 @@
+# src/utils/rolling_stats.py - Per-symbol rolling momentum and volatility, updated bar by bar
+"""Rolling-window statistics kept in step with the price store.
+
+A RollingWindow holds the closes since a period-relative start date
+(the same bars `PriceHistoryStore.get_bars(symbol, period)` returns) and a
+Welford running mean / variance of their daily returns. Appending a new
+bar or dropping bars that fell out of the window is O(1) per bar, so
+momentum and volatility no longer need a full history DataFrame:
+
+  - momentum(price) == (price - hist['Close'].iloc[0]) / hist['Close'].iloc[0] * 100
+  - volatility()    == hist['Close'].pct_change().dropna().std() * sqrt(252)
+
+RollingStats registers as a listener on one price store: bars the store
+appends are pushed into that symbol's windows, and a rewritten (backfilled)
+symbol is re-seeded from disk on its next read.
+"""
+import math
+import threading
+from collections import deque
+from datetime import date
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.price_store import PriceHistoryStore, period_start
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class RollingWindow:
+    """Closes in a sliding date window with running statistics of their daily returns"""
+
+    def __init__(self):
+        # (date, close, return from the previous bar); the first bar's return is outside the window
+        self._bars: Deque[Tuple[np.datetime64, float, Optional[float]]] = deque()
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self) -> int:
+        return len(self._bars)
+
+    @property
+    def start_close(self) -> Optional[float]:
+        """Close of the first bar in the window (None if empty)"""
+        return self._bars[0][1] if self._bars else None
+
+    @property
+    def last_date(self) -> Optional[np.datetime64]:
+        return self._bars[-1][0] if self._bars else None
+
+    def extend(self, bars: np.ndarray) -> None:
+        """Append price store bars (BAR_DTYPE records); bars not newer than the last one are ignored"""
+        for day, close in zip(bars['date'], bars['close']):
+            self.append(day, float(close))
+
+    def append(self, day: np.datetime64, close: float) -> None:
+        if self._bars and day <= self._bars[-1][0]:
+            return
+        daily_return = None
+        if self._bars:
+            daily_return = _return(self._bars[-1][1], close)
+            if daily_return is not None:
+                self._add(daily_return)
+        self._bars.append((day, close, daily_return))
+
+    def roll(self, start: date) -> None:
+        """Drop bars dated before `start`"""
+        first = np.datetime64(start, 'D')
+        while self._bars and self._bars[0][0] < first:
+            self._bars.popleft()
+            if self._bars and self._bars[0][2] is not None:
+                # The new first bar's return was measured from the bar just dropped
+                day, close, daily_return = self._bars[0]
+                self._remove(daily_return)
+                self._bars[0] = (day, close, None)
+
+    def momentum(self, price: float) -> float:
+        """Percent change from the window's first close to `price` (0 if unknown)"""
+        start = self.start_close
+        if not start or start <= 0:
+            return 0
+        return (price - start) / start * 100
+
+    def volatility(self, periods_per_year: int = TRADING_DAYS_PER_YEAR) -> float:
+        """Annualized sample standard deviation of daily returns (NaN under two returns)"""
+        if self._count < 2:
+            return float('nan')
+        return math.sqrt(max(self._m2, 0.0) / (self._count - 1)) * math.sqrt(periods_per_year)
+
+    def _add(self, value: float) -> None:
+        self._count += 1
+        delta = value - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (value - self._mean)
+
+    def _remove(self, value: float) -> None:
+        if self._count <= 1:
+            self._count, self._mean, self._m2 = 0, 0.0, 0.0
+            return
+        self._count -= 1
+        delta = value - self._mean
+        self._mean -= delta / self._count
+        self._m2 -= delta * (value - self._mean)
+
+
+class RollingStats:
+    """RollingWindows per (symbol, period) over one price store, fed by its appends"""
+
+    def __init__(self, store: PriceHistoryStore):
+        self.store = store
+        self._windows: Dict[Tuple[str, str], RollingWindow] = {}
+        self._lock = threading.Lock()
+        store.add_listener(self._on_bars)
+
+    def window(self, symbol: str, period: str) -> RollingWindow:
+        """The `period` window of `symbol` as of today, seeded from the stored bars on first use.
+
+        Call after the store has synced the symbol (see MarketDataProvider.fetch_fundamentals_with_windows).
+        """
+        start = period_start(period)
+        key = (symbol, period)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = RollingWindow()
+                bars = self.store.read(symbol)
+                if bars is not None:
+                    window.extend(bars[np.searchsorted(bars['date'], np.datetime64(start, 'D')):])
+            window.roll(start)
+            return window
+
+    def _on_bars(self, symbol: str, bars: np.ndarray, rewritten: bool) -> None:
+        with self._lock:
+            for key in [key for key in self._windows if key[0] == symbol]:
+                if rewritten:
+                    # History was re-adjusted; re-seed from disk on the next read
+                    del self._windows[key]
+                else:
+                    self._windows[key].extend(bars)
+
+
+def _return(previous: float, close: float) -> Optional[float]:
+    # pct_change().dropna() drops undefined returns; they are left out of the statistics too
+    if previous == 0 or not (math.isfinite(previous) and math.isfinite(close)):
+        return None
+    return close / previous - 1
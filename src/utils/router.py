@@ -0,0 +1,165 @@
+# src/utils/router.py - Keyword routing of queries to agents with one compiled word-boundary scan
+"""Shared query router.
+
+Every entry point routes with its own keyword table (the root platform's
+priority list, the orchestrator's fan-out rules, each agent's own gate),
+but all of their keywords are compiled into a single regex and a query is
+scanned once: the set of keywords it contains is memoized, and each table
+lookup is a set intersection.
+
+Keywords match whole words (an optional plural 's'/'es' is allowed), so
+'pe' no longer matches inside 'open' nor 'ai' inside 'retail'.
+"""
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+ROUTE_CACHE_SIZE = 1024
+
+# table -> agent -> keywords; agents are listed in the table's priority order
+ROUTING_TABLES: Dict[str, Dict[str, List[str]]] = {
+    # AdaptiveInvestmentPlatform.run: first matching agent wins, style queries first
+    'platform': {
+        'style_theme': [
+            'classify', 'style', 'growth', 'value', 'momentum', 'theme',
+            'ai', 'ev', 'fintech', 'healthcare', 'sector', 'analysis',
+            'by investment style', 'by style', 'investment style'
+        ],
+        'portfolio_risk': [
+            'risk', 'portfolio', 'stress', 'factor', 'concentration',
+            'attribution', 'analyze risk'
+        ],
+        'multi_strategy': ['manager', 'overlap', 'correlation', 'multi', 'strategy'],
+        'stock_screener': [
+            'find', 'show', 'search', 'screen', 'dividend', 'pe', 'p/e', 'price',
+            'nasdaq', 'tech', 'companies', 'filter', 'lowest', 'highest',
+            'stocks', 'under', 'over', 'yield'
+        ]
+    },
+    # Multi-agent coordination: every matching agent is engaged
+    'orchestrator': {
+        'stock_screener': [
+            'find', 'screen', 'stocks', 'companies', 'search', 'filter', 'dividend',
+            'pe', 'p/e', 'price', 'nasdaq', 'tech'
+        ],
+        'style_theme': ['style', 'theme', 'growth', 'value', 'momentum', 'ai', 'ev', 'fintech', 'classify'],
+        'portfolio_risk': ['risk', 'attribution', 'portfolio', 'stress', 'factor', 'concentration', 'scenario']
+    },
+    # Each agent's own `run`: queries outside its keywords go to the LLM instead
+    'agent': {
+        'stock_screener': [
+            'stock', 'find', 'show', 'screen', 'search', 'dividend', 'pe', 'p/e', 'price',
+            'nasdaq', 'tech', 'companies', 'filter', 'lowest', 'highest', 'value'
+        ],
+        'style_theme': [
+            # Style words
+            'classify', 'style', 'growth', 'value', 'momentum', 'blend',
+            # Sector words
+            'healthcare', 'health', 'pharma', 'biotech',
+            'tech', 'technology', 'software', 'hardware',
+            'financial', 'finance', 'bank', 'insurance',
+            'energy', 'oil', 'gas', 'renewable',
+            'consumer', 'retail', 'discretionary', 'staples',
+            'industrial', 'manufacturing', 'aerospace',
+            'material', 'chemical', 'mining',
+            'communication', 'media', 'telecom',
+            'utility', 'utilities', 'electric',
+            'real estate', 'reit', 'property',
+            # Theme words
+            'ai', 'artificial intelligence', 'machine learning',
+            'ev', 'electric vehicle', 'clean energy',
+            'fintech', 'digital payment', 'cryptocurrency',
+            'cloud', 'saas', 'infrastructure',
+            'cyber', 'security', 'cybersecurity',
+            # General words
+            'sector', 'stocks', 'analysis', 'investment', 'nasdaq', 'market',
+            'analyze', 'show', 'display', 'list', 'categorize'
+        ],
+        'portfolio_risk': ['risk', 'attribution', 'stress', 'portfolio', 'factor', 'concentration', 'scenario'],
+        'multi_strategy': [
+            'multi', 'manager', 'managers', 'strategy', 'strategies', 'portfolio', 'portfolios',
+            'overlap', 'redundant', 'correlation', 'correlated', 'concentration', 'risk',
+            'sector', 'allocation', 'diversification', 'performance', 'compare', 'comparison',
+            'institutional', 'platform', 'consolidated', 'oversight', 'monitor', 'monitoring',
+            'cross', 'across', 'multiple', 'different', 'various'
+        ]
+    }
+}
+
+
+class KeywordRouter:
+    """Maps queries to agents through keyword tables sharing one compiled scanner"""
+
+    def __init__(self, tables: Dict[str, Dict[str, List[str]]], cache_size: int = ROUTE_CACHE_SIZE):
+        self.tables = tables
+        keywords = sorted({k for table in tables.values() for words in table.values() for k in words},
+                          key=lambda keyword: (-len(keyword), keyword))
+
+        # Longest keyword first, inside a lookahead: one scan tries every start position,
+        # so 'analyze risk' and the 'risk' inside it are both found
+        alternation = '|'.join(_keyword_pattern(keyword) for keyword in keywords)
+        self._scanner = re.compile(rf"(?=\b({alternation})(?:e?s)?\b)")
+        self._canonical = {_normalize(keyword): keyword for keyword in keywords}
+
+        # A multi-word keyword also counts as the shorter keywords inside it
+        self._implied: Dict[str, FrozenSet[str]] = {}
+        for keyword in keywords:
+            contained = {k for k in keywords if k != keyword and re.search(rf"\b{_keyword_pattern(k)}\b", keyword)}
+            self._implied[keyword] = frozenset(contained | {keyword})
+
+        self._agent_keywords = {
+            name: {agent: frozenset(words) for agent, words in table.items()}
+            for name, table in tables.items()
+        }
+        self._scan = lru_cache(maxsize=cache_size)(self._scan_uncached)
+
+    def keywords(self, query: str) -> FrozenSet[str]:
+        """Every routing keyword present in `query` as a whole word (memoized)"""
+        return self._scan(_normalize(query))
+
+    def agents(self, query: str, table: str) -> Tuple[str, ...]:
+        """Agents of `table` with at least one keyword in `query`, in priority order"""
+        found = self.keywords(query)
+        return tuple(agent for agent, words in self._agent_keywords[table].items() if found & words)
+
+    def first(self, query: str, table: str, default: Optional[str] = None) -> Optional[str]:
+        """Highest-priority matching agent of `table`, or `default`"""
+        matched = self.agents(query, table)
+        return matched[0] if matched else default
+
+    def matches(self, query: str, table: str, agent: str) -> bool:
+        return bool(self.keywords(query) & self._agent_keywords[table][agent])
+
+    def cache_info(self):
+        """Hit/miss statistics of the routing memo"""
+        return self._scan.cache_info()
+
+    def _scan_uncached(self, query: str) -> FrozenSet[str]:
+        found = set()
+        for match in self._scanner.finditer(query):
+            found |= self._implied[self._canonical[match.group(1)]]
+        return frozenset(found)
+
+
+def _normalize(text: str) -> str:
+    # Lowercase and collapse whitespace so spacing variants share a memo entry
+    return ' '.join(text.lower().split())
+
+
+def _keyword_pattern(keyword: str) -> str:
+    return r'\s'.join(re.escape(word) for word in keyword.split())
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> KeywordRouter:
+    """Return the process-wide router over ROUTING_TABLES"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = KeywordRouter(ROUTING_TABLES)
+    return _router
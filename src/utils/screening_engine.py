@@ -0,0 +1,126 @@
+# src/utils/screening_engine.py - Vectorized screening over a columnar universe snapshot
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Sector flags from the query parser and the Yahoo sector names they accept
+SECTOR_FILTERS = {
+    'tech': ['Technology', 'Communication Services', 'Consumer Cyclical'],
+    'healthcare': ['Healthcare', 'Biotechnology'],
+    'financial': ['Financial Services', 'Financials'],
+    'energy': ['Energy']
+}
+
+# Supported sort orders: column name -> descending?
+SORT_ORDERS = {
+    'dividend_yield': True,
+    'pe_ratio': False,
+    'market_cap': True
+}
+
+# Missing P/E ratios sort after every real value when ranking cheapest first
+MISSING_PE_RANK = 999.0
+
+
+class UniverseSnapshot:
+    """Columnar (NumPy) view over a list of screened stock records.
+
+    Numeric columns hold 0.0 where the source value is missing, mirroring the
+    `value or 0` convention used when the records are built. Sectors are
+    dictionary-encoded so sector filters are evaluated once per distinct name.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.records = records
+        self.symbols = np.array([record.get('symbol', '') for record in records], dtype=object)
+        self.price = _numeric_column(records, 'price')
+        self.pe_ratio = _numeric_column(records, 'pe_ratio')
+        self.dividend_yield = _numeric_column(records, 'dividend_yield')
+        self.market_cap = _numeric_column(records, 'market_cap')
+
+        sectors = [record.get('sector') or '' for record in records]
+        self.sector_names, codes = np.unique(np.array(sectors, dtype=object), return_inverse=True)
+        self.sector_codes = codes.astype(np.int32)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def select(self, indices: np.ndarray) -> List[Dict[str, Any]]:
+        """Return the original records at `indices`, in order"""
+        return [self.records[i] for i in indices]
+
+
+def build_mask(snapshot: UniverseSnapshot, criteria: Dict[str, Any]) -> np.ndarray:
+    """AND together the boolean mask of every criterion present in `criteria`"""
+    mask = np.ones(len(snapshot), dtype=bool)
+
+    # Price and P/E bounds only apply where the value is known (> 0)
+    if criteria.get('max_price'):
+        mask &= ~((snapshot.price > 0) & (snapshot.price > criteria['max_price']))
+    if criteria.get('min_price'):
+        mask &= ~((snapshot.price > 0) & (snapshot.price < criteria['min_price']))
+    if criteria.get('max_pe'):
+        mask &= ~((snapshot.pe_ratio > 0) & (snapshot.pe_ratio > criteria['max_pe']))
+
+    if criteria.get('min_dividend_yield'):
+        mask &= snapshot.dividend_yield >= criteria['min_dividend_yield']
+
+    for flag, sectors in SECTOR_FILTERS.items():
+        if criteria.get(flag):
+            mask &= sector_mask(snapshot, sectors)
+
+    if criteria.get('dividend'):
+        mask &= snapshot.dividend_yield > 0
+
+    return mask
+
+
+def sector_mask(snapshot: UniverseSnapshot, sectors: List[str]) -> np.ndarray:
+    """Rows whose sector name contains any of `sectors`"""
+    accepted = np.array(
+        [any(sector in name for sector in sectors) for name in snapshot.sector_names],
+        dtype=bool
+    )
+    if len(accepted) == 0:
+        return np.zeros(len(snapshot), dtype=bool)
+    return accepted[snapshot.sector_codes]
+
+
+def rank(snapshot: UniverseSnapshot, indices: np.ndarray, sort_by: str) -> np.ndarray:
+    """Order `indices` by `sort_by`; ties keep their universe order"""
+    if sort_by not in SORT_ORDERS:
+        raise ValueError(f"Unsupported sort key: {sort_by}")
+
+    keys = getattr(snapshot, sort_by)[indices]
+    if sort_by == 'pe_ratio':
+        keys = np.where(keys == 0, MISSING_PE_RANK, keys)
+    if SORT_ORDERS[sort_by]:
+        keys = -keys
+    return indices[np.argsort(keys, kind='stable')]
+
+
+def screen(snapshot: UniverseSnapshot, criteria: Dict[str, Any], sort_by: Optional[str] = 'market_cap',
+           rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Indices of every row matching `criteria`, ranked by `sort_by` (None keeps universe order).
+
+    `rows` restricts the screen to those row indices, taken in the given
+    order, so one snapshot of a union of universes can serve every query.
+    """
+    mask = build_mask(snapshot, criteria)
+    indices = np.flatnonzero(mask) if rows is None else rows[mask[rows]]
+    if sort_by is None:
+        return indices
+    return rank(snapshot, indices, sort_by)
+
+
+def _numeric_column(records: List[Dict[str, Any]], key: str) -> np.ndarray:
+    return np.array([_as_float(record.get(key)) for record in records], dtype=np.float64)
+
+
+def _as_float(value: Any) -> float:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(value) else value
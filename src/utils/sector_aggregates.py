@@ -0,0 +1,224 @@
+# src/utils/sector_aggregates.py - Per-sector and per-theme style aggregates, kept current from the factor store
+"""Materialized style aggregates for every sector and theme of the universe.
+
+Each group keeps its members' latest style record (style, P/E, revenue
+growth, 3-month momentum) and a running count per style. Rows come from
+two places:
+
+  - the factor snapshot: every row is applied when a new generation is
+    mapped (see `sync`)
+  - `factor_snapshot.publish_records`: records scored in this process (the
+    snapshot job, live refreshes in the style agent) update only the
+    groups that hold those symbols
+
+A record only replaces a member's row if it is at least as new
+(`updated_at`). Medians and the momentum distribution are recomputed on
+read, and only for groups whose members changed since the last read, so a
+cross-sector summary over the whole universe is a dictionary lookup.
+
+Readers never score members themselves: `refresh_stale` rescoring missing
+or aged members runs on a background thread (at most one at a time, and
+no more often than every STALE_REFRESH_INTERVAL seconds), and its records
+arrive through the same listener as everything else.
+"""
+import contextvars
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.factor_snapshot import FactorSnapshot, add_record_listener, build_records, get_factor_snapshot
+from utils.style_scoring import STYLES
+
+GROUP_KINDS = ('sector', 'theme')
+
+# Momentum distribution quantiles reported per group
+MOMENTUM_QUANTILES = (0.25, 0.5, 0.75)
+
+# Shortest gap between background rescoring passes over stale members
+STALE_REFRESH_INTERVAL = 300.0
+
+
+class GroupAggregate:
+    """Latest style rows of one sector or theme with running style counts"""
+
+    def __init__(self, kind: str, name: str, members: List[str]):
+        self.kind = kind
+        self.name = name
+        self.members = members
+        # symbol -> (style, pe_ratio, revenue_growth, momentum_3m, updated_at)
+        self._rows: Dict[str, Tuple[str, float, float, float, float]] = {}
+        self._style_counts = dict.fromkeys(STYLES, 0)
+        self._summary: Optional[Dict] = None
+
+    def update(self, symbol: str, row: Tuple[str, float, float, float, float]) -> bool:
+        """Replace `symbol`'s row unless the stored one is newer; True if it changed"""
+        current = self._rows.get(symbol)
+        if current is not None:
+            if current[4] > row[4] or current == row:
+                return False
+            self._style_counts[current[0]] -= 1
+        self._rows[symbol] = row
+        self._style_counts[row[0]] += 1
+        self._summary = None
+        return True
+
+    def stale_members(self, max_age: float, now: float) -> List[str]:
+        """Members without a row or with one older than `max_age` seconds"""
+        return [symbol for symbol in self.members
+                if symbol not in self._rows or now - self._rows[symbol][4] > max_age]
+
+    def summary(self) -> Dict:
+        if self._summary is None:
+            rows = list(self._rows.values())
+            pe = np.array([row[1] for row in rows], dtype=np.float64)
+            growth = np.array([row[2] for row in rows], dtype=np.float64)
+            momentum = np.array([row[3] for row in rows], dtype=np.float64)
+            # A zero P/E means no (or negative) earnings; leave those out of the median
+            pe = pe[pe > 0]
+            self._summary = {
+                'kind': self.kind,
+                'name': self.name,
+                'members': len(self.members),
+                'covered': len(rows),
+                'styles': dict(self._style_counts),
+                'median_pe': float(np.median(pe)) if len(pe) else None,
+                'median_growth': float(np.median(growth)) if len(growth) else None,
+                'momentum': _distribution(momentum),
+                'updated_at': max((row[4] for row in rows), default=None)
+            }
+        return self._summary
+
+
+class SectorAggregates:
+    """GroupAggregates for every sector and theme, fed by the factor store"""
+
+    def __init__(self, universe):
+        self._groups: Dict[Tuple[str, str], GroupAggregate] = {}
+        for sector, symbols in universe.sectors.items():
+            self._add_group('sector', sector, symbols)
+        for theme, definition in universe.themes.items():
+            self._add_group('theme', theme, definition.get('core_stocks', []) + definition.get('related_stocks', []))
+
+        self._groups_by_symbol: Dict[str, List[GroupAggregate]] = {}
+        for group in self._groups.values():
+            for symbol in group.members:
+                self._groups_by_symbol.setdefault(symbol, []).append(group)
+
+        self.generation: Optional[str] = None
+        self.updates = 0
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self._last_refresh = 0.0
+        add_record_listener(self.update)
+
+    def symbols(self) -> List[str]:
+        """Every sector or theme member"""
+        return list(self._groups_by_symbol)
+
+    def update(self, records: Iterable[Dict]) -> int:
+        """Apply style records to the groups holding their symbols; returns the rows that changed"""
+        changed = 0
+        now = time.time()
+        with self._lock:
+            for record in records:
+                groups = self._groups_by_symbol.get(record['ticker'])
+                if not groups:
+                    continue
+                row = (record['style'], float(record['pe_ratio']), float(record['revenue_growth']),
+                       float(record['momentum_3m']), float(record.get('updated_at') or now))
+                for group in groups:
+                    changed += group.update(record['ticker'], row)
+            self.updates += changed
+        return changed
+
+    def load_snapshot(self, snapshot: FactorSnapshot) -> int:
+        """Apply every tracked row of `snapshot`; returns the rows that changed"""
+        changed = self.update(snapshot.records(self._groups_by_symbol))
+        self.generation = snapshot.generation
+        return changed
+
+    def sync(self) -> None:
+        """Apply the current factor snapshot if its generation has not been loaded yet"""
+        snapshot = get_factor_snapshot()
+        if snapshot is not None and snapshot.generation != self.generation:
+            self.load_snapshot(snapshot)
+
+    def stale_symbols(self, max_age: float) -> List[str]:
+        """Members of any group without a row younger than `max_age` seconds"""
+        now = time.time()
+        with self._lock:
+            stale = {}
+            for group in self._groups.values():
+                stale.update(dict.fromkeys(group.stale_members(max_age, now)))
+        return list(stale)
+
+    @property
+    def refreshing(self) -> bool:
+        return self._refresher is not None and self._refresher.is_alive()
+
+    def refresh_stale(self, max_age: float) -> int:
+        """Rescore stale members on a background thread; returns how many were queued"""
+        with self._lock:
+            if self.refreshing or time.monotonic() - self._last_refresh < STALE_REFRESH_INTERVAL:
+                return 0
+            self._last_refresh = time.monotonic()
+        stale = self.stale_symbols(max_age)
+        if not stale:
+            return 0
+        context = contextvars.copy_context()
+        self._refresher = threading.Thread(target=context.run, args=(self._rescore, stale),
+                                           name='sector-aggregates', daemon=True)
+        self._refresher.start()
+        return len(stale)
+
+    def summaries(self, kind: str) -> List[Dict]:
+        """Aggregates of every group of `kind` ('sector' or 'theme'), in universe order"""
+        if kind not in GROUP_KINDS:
+            raise ValueError(f"Unknown group kind: {kind} (expected one of {', '.join(GROUP_KINDS)})")
+        with self._lock:
+            return [group.summary() for (group_kind, _), group in self._groups.items() if group_kind == kind]
+
+    def get(self, kind: str, name: str) -> Optional[Dict]:
+        with self._lock:
+            group = self._groups.get((kind, name))
+            return group.summary() if group is not None else None
+
+    def _rescore(self, symbols: List[str]) -> None:
+        try:
+            # Scored records reach update() through the record listener
+            build_records(symbols)
+        except Exception as e:
+            print(f"Sector aggregate refresh failed: {e}")
+
+    def _add_group(self, kind: str, name: str, symbols: List[str]) -> None:
+        self._groups[(kind, name)] = GroupAggregate(kind, name, list(dict.fromkeys(symbols)))
+
+
+def _distribution(values: np.ndarray) -> Optional[Dict]:
+    if not len(values):
+        return None
+    quantiles = np.quantile(values, MOMENTUM_QUANTILES)
+    return {
+        'p25': float(quantiles[0]),
+        'median': float(quantiles[1]),
+        'p75': float(quantiles[2]),
+        'positive': int(np.count_nonzero(values > 0))
+    }
+
+
+_aggregates = None
+_aggregates_lock = threading.Lock()
+
+
+def get_sector_aggregates() -> SectorAggregates:
+    """Return the process-wide sector/theme aggregates, synced to the latest factor snapshot"""
+    global _aggregates
+    if _aggregates is None:
+        with _aggregates_lock:
+            if _aggregates is None:
+                from utils.universe import get_universe
+                _aggregates = SectorAggregates(get_universe())
+    _aggregates.sync()
+    return _aggregates
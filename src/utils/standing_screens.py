@@ -0,0 +1,274 @@
+# src/utils/standing_screens.py - Registered screens re-evaluated incrementally as data changes
+"""Standing screens: a query registered once, with entered/exited deltas as data changes.
+
+Registering parses the query and screens its whole universe once. After
+that, the fundamentals cache and the live quote board (see
+utils.quote_stream) report every symbol they update; `refresh()` re-checks
+only those symbols against the screens that watch them and records a
+delta per screen whose match set changed:
+
+    {"screen_id", "version", "entered": [records], "exited": [symbols], "at"}
+
+Subscribers get deltas through a callback (`StandingScreen.subscribe`) or
+by polling `catch_up(since=version)`. A background thread calls `refresh()`
+every STANDING_SCREEN_INTERVAL seconds while screens are registered. Each
+refresh also asks the provider for the watched universe, which only
+reaches the network for payloads that have expired, so cached
+fundamentals keep changing on their own TTLs, and re-checks symbols whose
+streamed quote went stale since the last refresh (their records fall back
+to the payload price).
+"""
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.screening_engine import UniverseSnapshot, build_mask, screen
+
+DEFAULT_REFRESH_INTERVAL = 1.0
+
+# Deltas kept per screen for pollers
+DEFAULT_HISTORY = 256
+
+MAX_STANDING_SCREENS = 1000
+
+
+class StandingScreen:
+    """One registered query: its parsed criteria, universe and current matches"""
+
+    def __init__(self, query: str, criteria: Dict, symbols: List[str], history: int = DEFAULT_HISTORY):
+        self.id = uuid.uuid4().hex[:12]
+        self.query = query
+        self.criteria = criteria
+        self.symbols = symbols
+        self.matches: Dict[str, Dict] = {}
+        self.version = 0
+        self.created_at = time.time()
+        self._deltas: Deque[Dict] = deque(maxlen=history)
+        self._subscribers: List[Callable[[Dict], None]] = []
+        self._lock = threading.Lock()
+
+    def ranked_matches(self) -> List[Dict]:
+        """Current matches in the screen's sort order"""
+        with self._lock:
+            records = [self.matches[symbol] for symbol in self.symbols if symbol in self.matches]
+        snapshot = UniverseSnapshot(records)
+        return snapshot.select(screen(snapshot, {}, self.criteria['sort_by']))
+
+    def apply(self, records: Dict[str, Optional[Dict]]) -> Optional[Dict]:
+        """Re-evaluate the given symbols (None = no data, so not matching); returns the delta, if any"""
+        present = [record for record in records.values() if record is not None]
+        snapshot = UniverseSnapshot(present)
+        matching = {present[i]['symbol']: present[i] for i in np.flatnonzero(build_mask(snapshot, self.criteria))}
+
+        with self._lock:
+            entered = [matching[symbol] for symbol in records if symbol in matching and symbol not in self.matches]
+            exited = [symbol for symbol in records if symbol in self.matches and symbol not in matching]
+            for symbol in exited:
+                del self.matches[symbol]
+            # Still-matching symbols keep their latest values
+            self.matches.update(matching)
+
+            if not entered and not exited:
+                return None
+            self.version += 1
+            delta = {
+                'screen_id': self.id,
+                'version': self.version,
+                'entered': entered,
+                'exited': exited,
+                'at': time.time()
+            }
+            self._deltas.append(delta)
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber(delta)
+            except Exception as e:
+                print(f"Standing screen subscriber failed: {e}")
+        return delta
+
+    def changes(self, since: int = 0) -> List[Dict]:
+        """Deltas newer than version `since` that are still in the history"""
+        with self._lock:
+            return [delta for delta in self._deltas if delta['version'] > since]
+
+    def catch_up(self, since: int = 0) -> Tuple[List[Dict], bool]:
+        """Deltas newer than `since`, and whether they are all of them (older ones may have rolled off)"""
+        with self._lock:
+            deltas = [delta for delta in self._deltas if delta['version'] > since]
+            oldest = self._deltas[0]['version'] if self._deltas else self.version + 1
+            return deltas, since >= oldest - 1
+
+    def subscribe(self, callback: Callable[[Dict], None]) -> Callable[[], None]:
+        """Call `callback(delta)` on every change; returns a function that unsubscribes"""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def describe(self) -> Dict:
+        return {
+            'id': self.id,
+            'query': self.query,
+            'version': self.version,
+            'universe': len(self.symbols),
+            'matches': len(self.matches),
+            'created_at': self.created_at
+        }
+
+
+class StandingScreens:
+    """Registry of standing screens, fed dirty symbols by the fundamentals cache and quote board"""
+
+    def __init__(self, provider=None, quote_stream=None, refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
+        from utils.market_data import get_provider
+        from utils.quote_stream import get_quote_stream
+
+        self.provider = provider or get_provider()
+        self.refresh_interval = refresh_interval
+        self._screens: Dict[str, StandingScreen] = {}
+        self._watchers: Dict[str, Set[str]] = {}  # symbol -> ids of the screens watching it
+        self._dirty: Set[str] = set()
+        # Watched symbols that had a fresh streamed price at the last refresh
+        self._live: Set[str] = set()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        self.provider.cache.add_listener(self._on_fundamentals)
+        quote_stream = quote_stream if quote_stream is not None else get_quote_stream()
+        if quote_stream is not None:
+            quote_stream.board.add_listener(self._on_quote)
+
+    def register(self, query: str) -> StandingScreen:
+        """Parse `query`, screen its universe once and keep it standing"""
+        from agents.stock_screener_final import fetch_screen_records
+        from utils.query_parser_fixed import parse_query
+        from utils.universe import get_universe
+
+        with self._lock:
+            self._check_capacity()
+        criteria = parse_query(query)
+        symbols = list(dict.fromkeys(get_universe().screen_symbols(criteria['universe'])))
+        standing = StandingScreen(query, criteria, symbols)
+
+        records = {record['symbol']: record for record in fetch_screen_records(symbols)}
+        standing.apply({symbol: records.get(symbol) for symbol in symbols})
+        with self._lock:
+            # Re-checked here: other registrations may have filled the registry while this one screened
+            self._check_capacity()
+            self._screens[standing.id] = standing
+            for symbol in symbols:
+                self._watchers.setdefault(symbol, set()).add(standing.id)
+        self._ensure_refresher()
+        return standing
+
+    def unregister(self, screen_id: str) -> bool:
+        with self._lock:
+            standing = self._screens.pop(screen_id, None)
+            if standing is None:
+                return False
+            for symbol in standing.symbols:
+                watchers = self._watchers.get(symbol)
+                if watchers is not None:
+                    watchers.discard(screen_id)
+                    if not watchers:
+                        del self._watchers[symbol]
+            return True
+
+    def get(self, screen_id: str) -> Optional[StandingScreen]:
+        return self._screens.get(screen_id)
+
+    def screens(self) -> List[StandingScreen]:
+        with self._lock:
+            return list(self._screens.values())
+
+    def mark_dirty(self, symbols: Iterable[str]) -> None:
+        with self._lock:
+            self._dirty.update(symbol for symbol in symbols if symbol in self._watchers)
+
+    def refresh(self) -> List[Dict]:
+        """Refetch expired payloads of watched symbols and re-evaluate every changed symbol"""
+        from agents.stock_screener_final import SCREEN_INFO_FIELDS, fetch_screen_records
+        from utils.quote_stream import live_prices
+
+        with self._refresh_lock:
+            watched = list(self._watchers)
+            if not watched:
+                return []
+            # Cached payloads come straight back; expired ones are refetched and mark themselves dirty
+            live = live_prices(watched)
+            self.provider.fetch_fundamentals([symbol for symbol in watched if symbol in live], fields=SCREEN_INFO_FIELDS)
+            self.provider.fetch_fundamentals([symbol for symbol in watched if symbol not in live])
+
+            with self._lock:
+                # A quote that aged out changes the record's price without any update event
+                self._dirty.update(symbol for symbol in self._live if symbol not in live and symbol in self._watchers)
+                self._live = set(live)
+                dirty, self._dirty = self._dirty, set()
+                affected: Dict[str, List[str]] = {}
+                for symbol in dirty:
+                    for screen_id in self._watchers.get(symbol, ()):
+                        affected.setdefault(screen_id, []).append(symbol)
+            if not affected:
+                return []
+
+            records = {record['symbol']: record for record in fetch_screen_records(list(dirty))}
+            deltas = []
+            for screen_id, symbols in affected.items():
+                standing = self._screens.get(screen_id)
+                if standing is None:
+                    continue
+                delta = standing.apply({symbol: records.get(symbol) for symbol in symbols})
+                if delta is not None:
+                    deltas.append(delta)
+            return deltas
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _check_capacity(self) -> None:
+        # Called with self._lock held
+        if len(self._screens) >= MAX_STANDING_SCREENS:
+            raise ValueError(f"At most {MAX_STANDING_SCREENS} standing screens")
+
+    def _ensure_refresher(self) -> None:
+        with self._lock:
+            if self._thread is None and self.refresh_interval > 0:
+                self._thread = threading.Thread(target=self._run, name='standing-screens', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Standing screen refresh failed: {e}")
+
+    def _on_fundamentals(self, symbol: str, payload: Dict) -> None:
+        if symbol in self._watchers:
+            with self._lock:
+                self._dirty.add(symbol)
+
+    def _on_quote(self, symbol: str, price: float) -> None:
+        if symbol in self._watchers:
+            with self._lock:
+                self._dirty.add(symbol)
+
+
+_standing = None
+_standing_lock = threading.Lock()
+
+
+def get_standing_screens() -> StandingScreens:
+    """Return the process-wide standing screen registry (STANDING_SCREEN_INTERVAL sets the refresh period)"""
+    global _standing
+    if _standing is None:
+        with _standing_lock:
+            if _standing is None:
+                interval = float(os.environ.get('STANDING_SCREEN_INTERVAL', DEFAULT_REFRESH_INTERVAL))
+                _standing = StandingScreens(refresh_interval=interval)
+    return _standing
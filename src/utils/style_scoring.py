@@ -0,0 +1,109 @@
+# src/utils/style_scoring.py - Growth / value / momentum style scores for one stock
+from typing import Any, Dict, Optional
+
+STYLES = ['Growth', 'Value', 'Momentum', 'Blend']
+
+# A stock whose best style score is below this is classified as Blend
+MIN_STYLE_SCORE = 40
+
+# Lookback of the momentum score
+MOMENTUM_PERIOD = '3mo'
+
+
+def score_stock(ticker: str, info: Dict[str, Any], window, price: Optional[float] = None) -> Dict[str, Any]:
+    """Style metrics, scores and primary style from `.info` and the 3-month RollingWindow.
+
+    `price` (e.g. a streamed quote) overrides the payload's current price.
+
+    Returns the record that `generate_rationale` and the style report read,
+    plus 'style' (one of STYLES).
+    """
+    price = price or info.get('currentPrice', 0) or info.get('regularMarketPrice', 0)
+    pe_ratio = info.get('trailingPE', 0) or 0
+    revenue_growth = (info.get('revenueGrowth', 0) or 0) * 100
+    dividend_yield = (info.get('dividendYield', 0) or 0) * 100
+    pb_ratio = info.get('priceToBook', 0) or 0
+    roe = (info.get('returnOnEquity', 0) or 0) * 100
+    market_cap = info.get('marketCap', 0) or 0
+
+    # Calculate momentum from the first close of the window
+    momentum_3m = window.momentum(price)
+
+    growth_score = 0
+    value_score = 0
+    momentum_score = 0
+
+    # Growth scoring
+    if revenue_growth > 25:
+        growth_score += 40
+    elif revenue_growth > 15:
+        growth_score += 30
+    elif revenue_growth > 10:
+        growth_score += 20
+
+    if pe_ratio > 35:
+        growth_score += 30
+    elif pe_ratio > 25:
+        growth_score += 20
+
+    if roe > 20:
+        growth_score += 30
+    elif roe > 15:
+        growth_score += 20
+
+    # Value scoring
+    if 0 < pe_ratio < 12:
+        value_score += 40
+    elif pe_ratio < 18:
+        value_score += 25
+
+    if dividend_yield > 3.5:
+        value_score += 40
+    elif dividend_yield > 2:
+        value_score += 25
+
+    if 0 < pb_ratio < 2:
+        value_score += 20
+    elif pb_ratio < 3:
+        value_score += 10
+
+    # Momentum scoring
+    if momentum_3m > 20:
+        momentum_score += 50
+    elif momentum_3m > 10:
+        momentum_score += 35
+    elif momentum_3m > 5:
+        momentum_score += 20
+
+    if pe_ratio > 40:  # High PE can indicate momentum
+        momentum_score += 30
+
+    return {
+        'ticker': ticker,
+        'price': price,
+        'pe_ratio': pe_ratio,
+        'revenue_growth': revenue_growth,
+        'dividend_yield': dividend_yield,
+        'pb_ratio': pb_ratio,
+        'roe': roe,
+        'momentum_3m': momentum_3m,
+        'market_cap': market_cap,
+        'growth_score': growth_score,
+        'value_score': value_score,
+        'momentum_score': momentum_score,
+        'style': primary_style(growth_score, value_score, momentum_score)
+    }
+
+
+def primary_style(growth_score: float, value_score: float, momentum_score: float) -> str:
+    """Highest-scoring style; ties go Growth, then Value, then Momentum"""
+    max_score = max(growth_score, value_score, momentum_score)
+
+    if max_score < MIN_STYLE_SCORE:
+        return 'Blend'
+    elif growth_score == max_score:
+        return 'Growth'
+    elif value_score == max_score:
+        return 'Value'
+    else:
+        return 'Momentum'
@@ -0,0 +1,200 @@
+# src/utils/tracing.py - Lightweight spans, latency histograms and span export
+"""Per-stage timing of requests across agents.
+
+`span(name, **attributes)` times a block. Spans nest through a ContextVar,
+so work submitted with `contextvars.copy_context().run` (the fan-out and
+market data pools) is parented to the span that submitted it and shares
+its trace id. Every finished span feeds a per-name latency reservoir that
+`latency_summary()` reports as count / mean / p50 / p95 / max.
+
+TRACE_EXPORT chooses where finished spans go as well:
+  - unset or 'none': histograms only
+  - 'json': one JSON line per span on the 'tracing' logger
+  - 'otel': mirrored as OpenTelemetry spans (needs opentelemetry-api and a
+    configured SDK; falls back to 'json' when the package is missing)
+"""
+import importlib.util
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+# Most recent durations kept per span name for the percentiles
+DEFAULT_RESERVOIR_SIZE = 2048
+
+EXPORTERS = ('none', 'json', 'otel')
+
+logger = logging.getLogger('tracing')
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+class Span:
+    """One timed stage; `attributes` can be added while it runs"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start', 'duration', 'attributes', 'error')
+
+    def __init__(self, name: str, parent: Optional['Span'], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class LatencyHistogram:
+    """Durations of the most recent `size` spans of one name, plus lifetime count and total"""
+
+    def __init__(self, size: int = DEFAULT_RESERVOIR_SIZE):
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self._recent: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float, error: bool = False) -> None:
+        self.count += 1
+        self.total += seconds
+        self.errors += error
+        self._recent.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        recent = sorted(self._recent)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(_percentile(recent, 0.50) * 1000, 3),
+            'p95_ms': round(_percentile(recent, 0.95) * 1000, 3),
+            'max_ms': round(recent[-1] * 1000, 3) if recent else 0.0
+        }
+
+
+class Tracer:
+    """Collects finished spans into histograms and hands them to the exporter"""
+
+    def __init__(self, exporter: str = 'none', reservoir_size: int = DEFAULT_RESERVOIR_SIZE):
+        if exporter not in EXPORTERS:
+            raise ValueError(f"Unknown trace exporter: {exporter} (expected one of {', '.join(EXPORTERS)})")
+        self._otel = None
+        if exporter == 'otel':
+            if importlib.util.find_spec('opentelemetry') is not None:
+                from opentelemetry import trace
+                self._otel = trace.get_tracer('intelligent-investment-agents')
+            else:
+                exporter = 'json'
+        if exporter == 'json' and not logger.handlers:
+            # Span lines go to stderr unless the app configured the logger itself
+            logger.addHandler(logging.StreamHandler())
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+        self.exporter = exporter
+        self.reservoir_size = reservoir_size
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        current = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(current)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            otel_span = stack.enter_context(self._otel.start_as_current_span(name)) if self._otel else None
+            try:
+                yield current
+            except BaseException as e:
+                current.error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                current.duration = time.perf_counter() - started
+                _current_span.reset(token)
+                if otel_span is not None:
+                    otel_span.set_attributes({k: v for k, v in current.attributes.items() if _otel_value(v)})
+                self.finish(current)
+
+    def finish(self, span: Span) -> None:
+        with self._lock:
+            histogram = self._histograms.get(span.name)
+            if histogram is None:
+                histogram = self._histograms[span.name] = LatencyHistogram(self.reservoir_size)
+            histogram.add(span.duration, span.error is not None)
+        if self.exporter == 'json':
+            logger.info(json.dumps(span.to_dict(), default=str))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: self._histograms[name].summary() for name in sorted(self._histograms)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def _otel_value(value: Any) -> bool:
+    return isinstance(value, (str, bool, int, float))
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer (TRACE_EXPORT picks the exporter)"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer(os.environ.get('TRACE_EXPORT', 'none').lower() or 'none')
+    return _tracer
+
+
+def span(name: str, **attributes):
+    """Time the enclosed block as a child of the current span"""
+    return get_tracer().span(name, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def annotate(**attributes) -> None:
+    """Add attributes to the current span, if there is one"""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def latency_summary() -> Dict[str, Dict[str, float]]:
+    """Per-span-name latency percentiles, for the /metrics endpoint"""
+    return get_tracer().summary()
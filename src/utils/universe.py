@@ -0,0 +1,116 @@
+# src/utils/universe.py - Symbol universe loaded from a data file, with inverted indexes
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Set
+
+DEFAULT_UNIVERSE_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'universe.json')
+
+# Allocation bucket for symbols outside every allocation sector
+OTHER_SECTOR = 'Other'
+
+
+class UniverseRegistry:
+    """Sector, theme, screen and factor membership for every tracked symbol.
+
+    The file's tables are kept as-is (ordered lists, used wherever an agent
+    walks a universe) and indexed by symbol once at load, so membership
+    lookups are dictionary hits regardless of universe size. A symbol listed
+    under several sectors belongs to the first one, as with the old linear
+    scans. The returned lists and dicts are shared; callers must not mutate
+    them.
+
+    File layout (see src/data/universe.json):
+        sectors             sector -> [symbols]        (style/theme analysis)
+        themes              theme -> {core_stocks, related_stocks, description}
+        screens             screen universe -> [symbols] (stock screener)
+        allocation_sectors  sector -> [symbols]        (multi-manager allocation)
+        factors             factor -> {description, stocks, weight}
+        model_portfolios    portfolio -> {symbol: weight}
+    """
+
+    def __init__(self, data: Dict):
+        self.sectors: Dict[str, List[str]] = data.get('sectors', {})
+        self.themes: Dict[str, Dict] = data.get('themes', {})
+        self.screens: Dict[str, List[str]] = data.get('screens', {})
+        self.allocation_sectors: Dict[str, List[str]] = data.get('allocation_sectors', {})
+        self.factors: Dict[str, Dict] = data.get('factors', {})
+        self.model_portfolios: Dict[str, Dict[str, float]] = data.get('model_portfolios', {})
+
+        self._sector_by_symbol = _first_membership(self.sectors)
+        self._allocation_sector_by_symbol = _first_membership(self.allocation_sectors)
+
+        self._themes_by_symbol: Dict[str, List[str]] = {}
+        for theme, definition in self.themes.items():
+            for symbol in definition.get('core_stocks', []) + definition.get('related_stocks', []):
+                themes = self._themes_by_symbol.setdefault(symbol, [])
+                if theme not in themes:
+                    themes.append(theme)
+
+        self._factors_by_symbol: Dict[str, Set[str]] = {}
+        for factor, definition in self.factors.items():
+            for symbol in definition.get('stocks', []):
+                self._factors_by_symbol.setdefault(symbol, set()).add(factor)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'UniverseRegistry':
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def sector_of(self, symbol: str) -> Optional[str]:
+        """Sector of `symbol` in the style/theme universe (None if untracked)"""
+        return self._sector_by_symbol.get(symbol)
+
+    def sector_symbols(self, sector: str) -> List[str]:
+        """Symbols of a sector, in universe order"""
+        return self.sectors.get(sector, [])
+
+    def themes_of(self, symbol: str) -> List[str]:
+        """Themes listing `symbol` as a core or related stock"""
+        return self._themes_by_symbol.get(symbol, [])
+
+    def screen_symbols(self, name: str) -> List[str]:
+        """Symbols the screener scans for a universe hint ('dividend', 'tech', 'default')"""
+        return self.screens.get(name) or self.screens.get('default', [])
+
+    def allocation_sector_of(self, symbol: str) -> str:
+        """Allocation bucket of `symbol` for multi-manager analysis ('Other' if unlisted)"""
+        return self._allocation_sector_by_symbol.get(symbol, OTHER_SECTOR)
+
+    def has_factor(self, symbol: str, factor: str) -> bool:
+        """True if `symbol` is a designated member of `factor`"""
+        return factor in self._factors_by_symbol.get(symbol, ())
+
+    def all_symbols(self) -> List[str]:
+        """Every symbol in any table, in first-seen order"""
+        symbols = dict.fromkeys(self._sector_by_symbol)
+        symbols.update(dict.fromkeys(self._themes_by_symbol))
+        for table in (self.screens, self.allocation_sectors):
+            for members in table.values():
+                symbols.update(dict.fromkeys(members))
+        symbols.update(dict.fromkeys(self._factors_by_symbol))
+        for holdings in self.model_portfolios.values():
+            symbols.update(dict.fromkeys(holdings))
+        return list(symbols)
+
+
+def _first_membership(groups: Dict[str, List[str]]) -> Dict[str, str]:
+    index = {}
+    for group, symbols in groups.items():
+        for symbol in symbols:
+            index.setdefault(symbol, group)
+    return index
+
+
+_universe = None
+_universe_lock = threading.Lock()
+
+
+def get_universe() -> UniverseRegistry:
+    """Return the process-wide universe (UNIVERSE_FILE overrides the bundled file)"""
+    global _universe
+    if _universe is None:
+        with _universe_lock:
+            if _universe is None:
+                _universe = UniverseRegistry.from_file(os.environ.get('UNIVERSE_FILE', DEFAULT_UNIVERSE_FILE))
+    return _universe